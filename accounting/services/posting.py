@@ -5,8 +5,8 @@ from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 
-from accounting.models import JournalEntry, JournalLine, Account, Currency, BankAccount
-from sales.models import Invoice
+from accounting.models import JournalEntry, JournalLine, Account, Currency, BankAccount, NumberSequence
+from sales.models import DocumentLine, Invoice
 from accounting.models import Expense, TaxRate
 
 
@@ -148,6 +148,89 @@ def post_cogs_for_invoice(invoice_id: int) -> JournalEntry | None:
     return entry
 
 
+def _journal_numbers(count: int) -> list[str]:
+    """Take ``count`` consecutive journal numbers from the JE sequence in one locked update."""
+    seq, _ = NumberSequence.objects.select_for_update().get_or_create(company=None, key="JE", defaults={"prefix": "JE-"})
+    start = seq.next_number
+    seq.next_number += count
+    seq.save(update_fields=["next_number"])
+    return [f"{seq.prefix}{n:05d}" for n in range(start, start + count)]
+
+
+@transaction.atomic
+def post_payments_bulk(payments, actor=None) -> int:
+    """Batched counterpart of the payment signal for payments saved with ``bulk_create``.
+
+    Posts revenue and (with COGS on PAYMENT) cost of sales once per invoice
+    that has no invoice entry yet, plus one receipt per payment, using a
+    fixed number of queries. Returns the number of entries created.
+    """
+    payments = list(payments)
+    invoice_ids = sorted({payment.invoice_id for payment in payments})
+    if not invoice_ids:
+        return 0
+    cur = _base_currency()
+    accounts = {code: _get_account(code) for code in ("1200", "4000", "2100", "5000", "1300")}
+    bank = _default_bank().account
+    numbers, dates = {}, {}
+    for invoice_id, number, date in Invoice.objects.filter(pk__in=invoice_ids).values_list("id", "number", "date"):
+        numbers[invoice_id], dates[invoice_id] = number, date
+    posted = set(
+        JournalEntry.objects.filter(source="INVOICE", source_id__in=invoice_ids, is_posted=True).values_list("source_id", flat=True)
+    )
+    post_cogs = getattr(settings, "ACCOUNTING_POST_COGS_ON", "PAYMENT") == "PAYMENT"
+
+    net, tax, cogs = {}, {}, {}
+    rows = DocumentLine.objects.filter(invoice_id__in=[i for i in invoice_ids if i not in posted]).values_list(
+        "invoice_id", "product_id", "quantity", "line_total", "tax_rate_percent", "product__avg_cost", "product__price",
+    )
+    for invoice_id, product_id, quantity, line_total, rate, avg_cost, price in rows:
+        net[invoice_id] = net.get(invoice_id, Decimal("0")) + line_total
+        tax[invoice_id] = tax.get(invoice_id, Decimal("0")) + (line_total * (rate or 0) / 100).quantize(Decimal("0.01"))
+        if product_id:
+            cogs[invoice_id] = cogs.get(invoice_id, Decimal("0")) + (avg_cost or price) * quantity
+
+    now = timezone.now()
+    entries, legs = [], []
+
+    def add(date, memo, source, source_id, *lines):
+        entries.append(JournalEntry(
+            date=date, memo=memo, currency=cur, fx_rate=Decimal("1.0"), is_posted=True,
+            posted_at=now, source=source, source_id=source_id, created_by=actor,
+        ))
+        legs.append(lines)
+
+    for invoice_id in invoice_ids:
+        if invoice_id in posted:
+            continue
+        n, t = net.get(invoice_id, Decimal("0")), tax.get(invoice_id, Decimal("0"))
+        if n + t:
+            # Dr A/R gross, Cr Sales net, Cr VAT Output tax
+            add(dates[invoice_id], f"Invoice {numbers[invoice_id]}", "INVOICE", invoice_id,
+                (accounts["1200"], n + t, 0), (accounts["4000"], 0, n), (accounts["2100"], 0, t))
+        if post_cogs and cogs.get(invoice_id):
+            add(dates[invoice_id], f"COGS for {numbers[invoice_id]}", "INVOICE", invoice_id,
+                (accounts["5000"], cogs[invoice_id], 0), (accounts["1300"], 0, cogs[invoice_id]))
+    for payment in payments:
+        amount = Decimal(payment.amount)
+        # Dr Bank, Cr A/R
+        add(payment.date, f"Receipt for {numbers[payment.invoice_id]}", "PAYMENT", payment.invoice_id,
+            (bank, amount, 0), (accounts["1200"], 0, amount))
+
+    if not entries:
+        return 0
+    for entry, number in zip(entries, _journal_numbers(len(entries))):
+        entry.number = number
+    JournalEntry.objects.bulk_create(entries, batch_size=500)
+    JournalLine.objects.bulk_create([
+        JournalLine(entry=entry, account=account, debit=debit, credit=credit, debit_base=debit, credit_base=credit)
+        for entry, lines in zip(entries, legs)
+        for account, debit, credit in lines
+        if debit or credit
+    ], batch_size=1000)
+    return len(entries)
+
+
 @transaction.atomic
 def post_expense(expense_id: int) -> JournalEntry:
     exp = Expense.objects.select_related('category', 'tax').get(pk=expense_id)
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
     'website',
     'shop',
     'payments',
+    'search',
+    'pos',
 ]
 
 MIDDLEWARE = [
@@ -185,6 +187,14 @@ X_FRAME_OPTIONS = 'DENY'
 
 CACHE_TTL_HOME = int(os.environ.get('CACHE_TTL_HOME', '300'))
 CACHE_TTL_CATALOG = int(os.environ.get('CACHE_TTL_CATALOG', '120'))
+CACHE_TTL_COMBO_AVAILABILITY = int(os.environ.get('CACHE_TTL_COMBO_AVAILABILITY', '300'))
+CACHE_TTL_PRICE_RULES = int(os.environ.get('CACHE_TTL_PRICE_RULES', '60'))
+
+PRODUCT_IMAGE_RENDITION_WIDTHS = (160, 320, 480, 640, 960, 1280)
+IMAGE_RENDITIONS_ASYNC = os.environ.get('IMAGE_RENDITIONS_ASYNC', '1') == '1'
+IMAGE_RENDITION_WORKERS = int(os.environ.get('IMAGE_RENDITION_WORKERS', '2'))
+STOCK_MOVEMENT_RETENTION_DAYS = int(os.environ.get('STOCK_MOVEMENT_RETENTION_DAYS', '365'))
+STOCK_BALANCE_STRIPES = int(os.environ.get('STOCK_BALANCE_STRIPES', '4'))
 
 # -----------------------------Development======================================
 # SECURE_SSL_REDIRECT =  False 
@@ -208,6 +218,8 @@ DEFAULT_TAX_RATE_ID = os.environ.get('DEFAULT_TAX_RATE_ID')
 PERIOD_CLOSE_ENFORCED = os.environ.get('PERIOD_CLOSE_ENFORCED', '1') == '1'
 SHIPMENT_INVENTORY_ACCOUNT = os.environ.get('SHIPMENT_INVENTORY_ACCOUNT', '1300')
 SHIPMENT_CLEARING_ACCOUNT = os.environ.get('SHIPMENT_CLEARING_ACCOUNT', '2000')
+STOCK_COUNT_INVENTORY_ACCOUNT = os.environ.get('STOCK_COUNT_INVENTORY_ACCOUNT', '1300')
+STOCK_COUNT_ADJUSTMENT_ACCOUNT = os.environ.get('STOCK_COUNT_ADJUSTMENT_ACCOUNT', '5000')
 
 if DEBUG:
     SECURE_SSL_REDIRECT = False
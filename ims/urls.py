@@ -12,4 +12,6 @@ urlpatterns = [
     path('sales/', include(('sales.urls', 'sales'), namespace='sales')),
     path('accounting/', include(('accounting.urls', 'accounting'), namespace='accounting')),
     path('legal/', include(('legal.urls', 'legal'), namespace='legal')),
+    path('search/', include(('search.urls', 'search'), namespace='search')),
+    path('pos/', include(('pos.urls', 'pos'), namespace='pos')),
 ]
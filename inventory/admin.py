@@ -6,6 +6,7 @@ from .models import (
     Supplier,
     Product,
     StockMovement,
+    StockCheckpoint,
     Combo,
     ComboItem,
     Shipment,
@@ -13,6 +14,11 @@ from .models import (
     ShipmentItem,
     ShipmentEventLog,
     ProductUnit,
+    ProductUnitEvent,
+    SupplierScorecard,
+    CountSession,
+    StockLocation,
+    StockBalance,
 )
 
 
@@ -27,6 +33,28 @@ class SupplierAdmin(admin.ModelAdmin):
     search_fields = ['name', 'email', 'phone']
 
 
+@admin.register(SupplierScorecard)
+class SupplierScorecardAdmin(admin.ModelAdmin):
+    list_display = (
+        'supplier',
+        'total_units',
+        'faulty_units',
+        'fault_rate',
+        'average_delay_days',
+        'on_time_pct',
+        'landed_cost_overhead_pct',
+        'updated_at',
+    )
+    list_select_related = ('supplier',)
+    search_fields = ('supplier__name',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'sku', 'price', 'quantity', 'thumbnail', 'is_active')
@@ -47,9 +75,16 @@ class ProductAdmin(admin.ModelAdmin):
         ('created_at', 'updated_at'),
     )
 
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            # Quantity and reserved are edited as absolute figures against the stock ledger.
+            obj.load_stock_from_ledger()
+        return obj
+
     def thumbnail(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="height:40px;" />', obj.image.url)
+            return format_html('<img src="{}" style="height:40px;" loading="lazy" />', obj.image_thumbnail_url)
         if obj.image_url:
             return format_html('<img src="{}" style="height:40px;" />', obj.image_url)
         return '-'
@@ -72,22 +107,34 @@ class ComboItemInline(admin.TabularInline):
 
 @admin.register(Combo)
 class ComboAdmin(admin.ModelAdmin):
-    list_display = ('name', 'code', 'is_active', '_price')
+    list_display = ('name', 'code', 'is_active', 'components_total', 'final_price')
     list_filter = ('is_active',)
     search_fields = ('name', 'code')
     inlines = [ComboItemInline]
 
-    def _price(self, obj):
-        return obj.compute_price()
-
-    _price.short_description = 'Computed Price'
-
 
 
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
     list_display = ('product', 'movement_type', 'quantity', 'timestamp', 'user')
     list_filter = ('movement_type',)
+    list_select_related = ('product', 'user')
+    ordering = ('-timestamp', '-id')
+    raw_id_fields = ('product',)
+    show_full_result_count = False
+
+
+@admin.register(StockCheckpoint)
+class StockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('product', 'as_of', 'quantity_in', 'quantity_out', 'balance', 'movement_count', 'archive_name')
+    list_select_related = ('product',)
+    search_fields = ('product__sku', 'product__name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 class ShipmentItemInline(admin.TabularInline):
@@ -155,12 +202,26 @@ class ShipmentAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_rollups().select_related('supplier')
+
     def total_cost_display(self, obj):
         return obj.total_cost_base
 
     total_cost_display.short_description = 'Total Cost (Base)'
 
 
+class ProductUnitEventInline(admin.TabularInline):
+    model = ProductUnitEvent
+    extra = 0
+    can_delete = False
+    fields = ('created_at', 'event_type', 'status', 'sale_line', 'landed_cost', 'note', 'actor')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ProductUnit)
 class ProductUnitAdmin(admin.ModelAdmin):
     list_display = ('serial_number', 'product', 'shipment', 'status', 'landed_cost', 'sale_line')
@@ -168,6 +229,7 @@ class ProductUnitAdmin(admin.ModelAdmin):
     list_filter = ('status', 'product__category')
     autocomplete_fields = ['product', 'shipment']
     readonly_fields = ('created_at', 'updated_at', 'sold_at', 'fault_reported_at')
+    inlines = [ProductUnitEventInline]
 
 
 @admin.register(ShipmentEventLog)
@@ -175,3 +237,35 @@ class ShipmentEventLogAdmin(admin.ModelAdmin):
     list_display = ('shipment', 'event_type', 'previous_status', 'new_status', 'actor', 'created_at')
     list_filter = ('event_type', 'new_status')
     search_fields = ('shipment__shipment_code', 'actor__username')
+
+
+@admin.register(CountSession)
+class CountSessionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'status', 'line_count', 'lines_adjusted', 'adjustment_value', 'created_at', 'posted_at')
+    list_filter = ('status',)
+    search_fields = ('name',)
+    readonly_fields = ('category', 'status', 'line_count', 'lines_adjusted', 'adjustment_value', 'journal_entry_id', 'created_by', 'posted_by', 'posted_at')
+
+    def has_add_permission(self, request):
+        # Sessions freeze expected stock when started, so they are opened through the API.
+        return False
+
+
+@admin.register(StockLocation)
+class StockLocationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'is_default', 'is_active')
+    prepopulated_fields = {'code': ('name',)}
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'location', 'stripe', 'quantity', 'reserved', 'updated_at')
+    list_filter = ('location',)
+    list_select_related = ('product', 'location')
+    search_fields = ('product__sku', 'product__name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,20 +1,217 @@
-from django.db.models import F
+import hashlib
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, quote_etag
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.parsers import FormParser, MultiPartParser, JSONParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from inventory.services import receive_shipment, ShipmentServiceError
+from inventory.services import (
+    CycleCountError,
+    ProductImportError,
+    SerialConflictError,
+    ShipmentServiceError,
+    cancel_count_session,
+    clean_counts,
+    combo_availability,
+    find_serial_conflicts,
+    import_products,
+    parse_count_rows,
+    parse_serial_upload,
+    parse_serials,
+    plan_landed_cost_allocation,
+    post_count_session,
+    read_product_rows,
+    receive_shipment,
+    record_counts,
+    serial_trace,
+    start_count_session,
+    variance_summary,
+)
+
+from .models import Product, ProductUnit, Combo, CountLine, CountSession, Shipment, StockMovement
+from .serializers import (
+    ProductSerializer,
+    ComboSerializer,
+    CountLineSerializer,
+    CountSessionSerializer,
+    ShipmentSerializer,
+    ShipmentItemSerializer,
+    StockMovementSerializer,
+    requested_fields,
+)
+
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'off'}
+
+
+def parse_bool_param(name: str, value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValidationError({name: 'Use true or false.'})
+
+
+def parse_since_param(name: str, value: str) -> datetime:
+    """Accept an ISO 8601 datetime or date; naive values are read in the current timezone."""
+    value = value.strip().replace(' ', '+')
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: 'Use an ISO 8601 date or datetime.'})
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class ProductCursorPagination(CursorPagination):
+    ordering = ('name', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ShipmentCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class MovementCursorPagination(CursorPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+def filter_movements(queryset, params):
+    movement_type = params.get('type')
+    if movement_type:
+        movement_type = movement_type.upper()
+        if movement_type not in (StockMovement.IN, StockMovement.OUT):
+            raise ValidationError({'type': 'Use IN or OUT.'})
+        queryset = queryset.filter(movement_type=movement_type)
+    since = params.get('since')
+    if since:
+        queryset = queryset.filter(timestamp__gte=parse_since_param('since', since))
+    until = params.get('until')
+    if until:
+        queryset = queryset.filter(timestamp__lt=parse_since_param('until', until))
+    return queryset
+
+
+class ConditionalGetMixin:
+    """Answer unchanged list and detail polls with 304 Not Modified.
 
-from .models import Product, Combo, Shipment
-from .serializers import ProductSerializer, ComboSerializer, ShipmentSerializer, ShipmentItemSerializer
+    List validators come from one aggregate (latest ``updated_at`` and row
+    count) over the filtered queryset, so deletions change the ETag too.
+    """
 
+    def get_validator_queryset(self):
+        return self.filter_rows(self.queryset.model.objects.all())
 
-class ProductViewSet(ModelViewSet):
+    def filter_rows(self, queryset):
+        return queryset
+
+    def conditional_response(self, request, latest, count, render):
+        stamp = latest.isoformat() if latest else ''
+        digest = hashlib.md5(f'{request.get_full_path()}|{stamp}|{count}'.encode()).hexdigest()
+        etag = quote_etag(digest)
+        last_modified = int(latest.timestamp()) if latest else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = render()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        stats = self.get_validator_queryset().order_by().aggregate(latest=Max('updated_at'), count=Count('pk'))
+        return self.conditional_response(
+            request, stats['latest'], stats['count'], lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        def render():
+            return Response(self.get_serializer(instance).data)
+
+        return self.conditional_response(request, instance.updated_at, 1, render)
+
+
+class ProductViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Product.objects.all().order_by('name')
     serializer_class = ProductSerializer
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    pagination_class = ProductCursorPagination
+
+    def get_queryset(self):
+        return self.filter_rows(super().get_queryset())
+
+    def filter_rows(self, queryset):
+        params = self.request.query_params
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category_id=category) if category.isdigit() else queryset.filter(category__slug=category)
+        supplier = params.get('supplier')
+        if supplier:
+            if not supplier.isdigit():
+                raise ValidationError({'supplier': 'Use a supplier id.'})
+            queryset = queryset.filter(supplier_id=supplier)
+        active = params.get('active')
+        if active:
+            queryset = queryset.filter(is_active=parse_bool_param('active', active))
+        updated_since = params.get('updated_since')
+        if updated_since:
+            queryset = queryset.filter(updated_at__gte=parse_since_param('updated_since', updated_since))
+        return queryset
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[permissions.IsAdminUser],
+        parser_classes=[MultiPartParser],
+        url_path='import',
+    )
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'detail': 'Upload a CSV or XLSX file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = parse_bool_param('dry_run', request.data.get('dry_run') or 'false')
+        try:
+            result = import_products(read_product_rows(upload, filename=upload.name), dry_run=dry_run)
+        except ProductImportError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def movements(self, request, pk=None):
+        product = self.get_object()
+        queryset = filter_movements(
+            StockMovement.objects.filter(product=product).select_related('product'), request.query_params,
+        )
+        paginator = MovementCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(StockMovementSerializer(page, many=True).data)
 
     def perform_update(self, serializer):
         instance = serializer.instance
@@ -37,14 +234,23 @@ class ComboViewSet(ReadOnlyModelViewSet):
     serializer_class = ComboSerializer
     lookup_field = 'code'
 
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        index = combo_availability()
+        combos = self.get_queryset().prefetch_related(None).values_list('id', 'code')
+        return Response([
+            {'id': combo_id, 'code': code, 'available': index.get(combo_id, 0)}
+            for combo_id, code in combos
+        ])
+
     @action(detail=True, methods=['get'])
     def price(self, request, code=None):
         combo = self.get_object()
         qty = int(request.query_params.get('qty', 1))
         if qty < 1:
             qty = 1
-        components_total = combo.components_total() * qty
-        computed_price = combo.compute_price() * qty
+        components_total = combo.components_total * qty
+        computed_price = combo.final_price * qty
         return Response({
             'quantity': qty,
             'components_total': components_total,
@@ -52,18 +258,132 @@ class ComboViewSet(ReadOnlyModelViewSet):
         })
 
 
-class ShipmentViewSet(ReadOnlyModelViewSet):
-    queryset = Shipment.objects.select_related('supplier').prefetch_related('items__product').order_by('-created_at')
+class StockMovementViewSet(ReadOnlyModelViewSet):
+    """Stock movement history across all products, newest first."""
+
+    queryset = StockMovement.objects.select_related('product')
+    serializer_class = StockMovementSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MovementCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        product = self.request.query_params.get('product')
+        if product:
+            if not product.isdigit():
+                raise ValidationError({'product': 'Use a product id.'})
+            queryset = queryset.filter(product_id=product)
+        return filter_movements(queryset, self.request.query_params)
+
+
+class CountLineCursorPagination(CursorPagination):
+    ordering = ('id',)
+    page_size = 200
+    page_size_query_param = 'page_size'
+    max_page_size = 2000
+
+
+class CountSessionViewSet(ReadOnlyModelViewSet):
+    """Cycle counts: open a session, upload scanner or CSV counts, review variances and post."""
+
+    queryset = CountSession.objects.select_related('category')
+    serializer_class = CountSessionSerializer
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = start_count_session(
+            serializer.validated_data['name'],
+            category=serializer.validated_data.get('category'),
+            user=request.user,
+        )
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+
+    def _count_error(self, exc):
+        return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'])
+    def counts(self, request, pk=None):
+        session = self.get_object()
+        upload = request.FILES.get('file')
+        try:
+            if upload:
+                counts = parse_count_rows(upload)
+            else:
+                counts = request.data.get('counts')
+                if not isinstance(counts, dict):
+                    raise ValidationError({'counts': 'Send a file or a mapping of sku to counted quantity.'})
+                counts = clean_counts(counts)
+            replace = parse_bool_param('replace', str(request.data.get('replace') or 'false'))
+            result = record_counts(session, counts, replace=replace)
+        except CycleCountError as exc:
+            return self._count_error(exc)
+        return Response(result.as_dict())
+
+    @action(detail=True, methods=['get'])
+    def variances(self, request, pk=None):
+        session = self.get_object()
+        lines = (
+            CountLine.objects.filter(session=session, counted_quantity__isnull=False)
+            .annotate(current_variance=F('counted_quantity') - F('expected_quantity'))
+            .exclude(current_variance=0)
+            .select_related('product')
+        )
+        paginator = CountLineCursorPagination()
+        page = paginator.paginate_queryset(lines, request, view=self)
+        return paginator.get_paginated_response(CountLineSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path='post')
+    def post_session(self, request, pk=None):
+        session = self.get_object()
+        zero_uncounted = parse_bool_param('zero_uncounted', str(request.data.get('zero_uncounted') or 'false'))
+        try:
+            session = post_count_session(session, user=request.user, zero_uncounted=zero_uncounted)
+        except CycleCountError as exc:
+            return self._count_error(exc)
+        data = self.get_serializer(session).data
+        data['summary'] = variance_summary(session)
+        return Response(data)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        try:
+            session = cancel_count_session(self.get_object())
+        except CycleCountError as exc:
+            return self._count_error(exc)
+        return Response(self.get_serializer(session).data)
+
+
+class ShipmentViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
+    queryset = Shipment.objects.with_rollups().select_related('supplier').order_by('-created_at')
     serializer_class = ShipmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ShipmentCursorPagination
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        status_param = self.request.query_params.get('status')
-        if status_param:
-            qs = qs.filter(status=status_param)
+        qs = self.filter_rows(super().get_queryset())
+        fields = requested_fields(self.request)
+        if self.action in ('list', 'retrieve') and (fields is None or 'items' in fields):
+            qs = qs.prefetch_related('items__product')
         return qs
 
+    def filter_rows(self, queryset):
+        params = self.request.query_params
+        status_param = params.get('status')
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+        supplier = params.get('supplier')
+        if supplier:
+            if not supplier.isdigit():
+                raise ValidationError({'supplier': 'Use a supplier id.'})
+            queryset = queryset.filter(supplier_id=supplier)
+        updated_since = params.get('updated_since')
+        if updated_since:
+            queryset = queryset.filter(updated_at__gte=parse_since_param('updated_since', updated_since))
+        return queryset
+
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated], url_path='pending-items')
     def pending_items(self, request, pk=None):
         shipment = self.get_object()
@@ -71,6 +391,33 @@ class ShipmentViewSet(ReadOnlyModelViewSet):
         serializer = ShipmentItemSerializer(items, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated], url_path='landed-cost-preview')
+    def landed_cost_preview(self, request, pk=None):
+        shipment = self.get_object()
+        basis = request.query_params.get('basis') or shipment.allocation_basis
+        if basis not in dict(Shipment.COST_BASIS_CHOICES):
+            return Response({'detail': 'Unknown allocation basis.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            plan = plan_landed_cost_allocation(shipment, basis=basis)
+        except ShipmentServiceError as exc:
+            message = exc.messages[0] if isinstance(exc.messages, list) else str(exc)
+            return Response({'detail': message}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'basis': basis,
+            'total_cost_base': sum((row.share for row in plan), Decimal('0.0000')),
+            'items': [
+                {
+                    'item_id': row.item.id,
+                    'product_sku': row.item.product.sku,
+                    'weight': row.weight,
+                    'share': row.share,
+                    'landed_total_cost': row.landed_total_cost,
+                    'landed_unit_cost': row.landed_unit_cost,
+                }
+                for row in plan
+            ],
+        })
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated], parser_classes=[JSONParser])
     def receive(self, request, pk=None):
         shipment = self.get_object()
@@ -83,10 +430,52 @@ class ShipmentViewSet(ReadOnlyModelViewSet):
                 receipts=receipts,
                 received_by=request.user,
             )
+        except SerialConflictError as exc:
+            return Response(
+                {'detail': 'Serial numbers conflict.', 'conflicts': [c.as_dict() for c in exc.conflicts]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except ShipmentServiceError as exc:
             message = exc.messages[0] if isinstance(exc.messages, list) else str(exc)
             return Response({'detail': message}, status=status.HTTP_400_BAD_REQUEST)
         serializer = self.get_serializer(self.get_object())
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[permissions.IsAuthenticated],
+        parser_classes=[JSONParser, MultiPartParser],
+        url_path='validate-serials',
+    )
+    def validate_serials(self, request, pk=None):
+        shipment = self.get_object()
+        upload = request.FILES.get('file')
+        serials = parse_serial_upload(upload) if upload else parse_serials(request.data.get('serials'))
+        item_id = request.data.get('item_id')
+        if item_id not in (None, ''):
+            try:
+                item_id = int(item_id)
+            except (TypeError, ValueError):
+                return Response({'detail': 'item_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            if not shipment.items.filter(pk=item_id).exists():
+                return Response({'detail': 'Item does not belong to this shipment.'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            item_id = None
+        conflicts = find_serial_conflicts({item_id: serials})
+        return Response({
+            'count': len(serials),
+            'serials': serials,
+            'conflicts': [conflict.as_dict() for conflict in conflicts],
+        })
 
+
+class SerialTraceAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, serial_number):
+        try:
+            trace = serial_trace(serial_number.strip())
+        except ProductUnit.DoesNotExist:
+            return Response({'detail': 'Serial number not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(trace)
@@ -2,6 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from PIL import Image
 
+from inventory.services.serials import parse_serial_upload, parse_serials
 from .models import (
     Product,
     StockMovement,
@@ -40,6 +41,10 @@ class ProductForm(forms.ModelForm):
         }
 
     def __init__(self, *args, **kwargs):
+        instance = kwargs.get('instance')
+        if instance is not None and instance.pk:
+            # The stock fields are set as absolute figures against the ledger.
+            instance.load_stock_from_ledger()
         super().__init__(*args, **kwargs)
         for field in self.fields.values():
             widget = field.widget
@@ -183,6 +188,12 @@ class ShipmentItemReceiptForm(forms.Form):
     item_id = forms.IntegerField(widget=forms.HiddenInput)
     quantity = forms.IntegerField(min_value=0)
     serials = forms.CharField(widget=forms.Textarea(attrs={'rows': 2}), required=False)
+    serial_file = forms.FileField(
+        required=False,
+        label='Serial file',
+        help_text='Optional CSV or scanner export; combined with any serials typed above.',
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.txt'}),
+    )
 
     def __init__(self, *args, item: ShipmentItem, **kwargs):
         self.item = item
@@ -192,6 +203,7 @@ class ShipmentItemReceiptForm(forms.Form):
         if not item.requires_serials:
             self.fields['serials'].widget = forms.HiddenInput()
             self.fields['serials'].required = False
+            del self.fields['serial_file']
 
     def clean(self):
         cleaned = super().clean()
@@ -199,8 +211,9 @@ class ShipmentItemReceiptForm(forms.Form):
         remaining = max(self.item.quantity_expected - self.item.quantity_received, 0)
         if quantity > remaining:
             raise ValidationError(f'Cannot receive more than {remaining} units for {self.item.product}.')
-        serials_raw = cleaned.get('serials') or ''
-        serials = [s.strip() for s in serials_raw.replace(',', '\n').splitlines() if s.strip()]
+        serials = parse_serials(cleaned.get('serials') or '')
+        if cleaned.get('serial_file'):
+            serials += parse_serial_upload(cleaned['serial_file'])
         if self.item.requires_serials:
             if quantity == 0:
                 serials = []
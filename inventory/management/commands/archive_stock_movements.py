@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.services.stock_history import ARCHIVE_BATCH_SIZE, archive_stock_movements, movement_retention_days
+
+
+class Command(BaseCommand):
+    help = "Checkpoint stock totals and move old stock movements into a compressed archive file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Keep this many days of movements (default STOCK_MOVEMENT_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else movement_retention_days()
+        if days < 1:
+            raise CommandError('--days must be at least 1.')
+        result = archive_stock_movements(
+            before=timezone.now() - timedelta(days=days),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if result.dry_run:
+            self.stdout.write(
+                f"Dry run: {result.movements} movements across {result.checkpoints} products before {result.cutoff:%Y-%m-%d}."
+            )
+            return
+        if not result.movements:
+            self.stdout.write(f"No movements before {result.cutoff:%Y-%m-%d}.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result.movements} movements to {result.archive_name} and wrote {result.checkpoints} checkpoints."
+        ))
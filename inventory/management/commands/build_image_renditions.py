@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Product
+from inventory.services.images import generate_product_renditions
+
+
+class Command(BaseCommand):
+    help = "Generate WebP/JPEG renditions for product images that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild renditions for every product image')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_renditions')
+        built = 0
+        for product in products.iterator(chunk_size=200):
+            if not options['all'] and product.get_image_renditions():
+                continue
+            if generate_product_renditions(product.pk):
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built renditions for {built} product image(s)."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.services.product_import import IMPORT_CHUNK_SIZE, ProductImportError, import_products, read_product_rows
+
+
+class Command(BaseCommand):
+    help = "Create or update products by SKU from a CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row and a sku column')
+        parser.add_argument('--images', dest='image_dir', help='Directory of images named after the sku or the image column')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate rows without writing anything')
+
+    def handle(self, *args, **options):
+        try:
+            result = import_products(
+                read_product_rows(options['path']),
+                image_dir=options['image_dir'],
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+            )
+        except (OSError, ProductImportError) as exc:
+            raise CommandError(str(exc))
+        for error in result.errors[:50]:
+            self.stderr.write(f"Row {error.row} ({error.sku or '-'}): {error.message}")
+        if len(result.errors) > 50:
+            self.stderr.write(f"... and {len(result.errors) - 50} more errors")
+        prefix = 'Dry run: ' if result.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{result.created} created, {result.updated} updated, {result.images} images, {len(result.errors)} errors."
+        ))
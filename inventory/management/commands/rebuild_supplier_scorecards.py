@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.services import rebuild_supplier_scorecards
+
+
+class Command(BaseCommand):
+    help = "Recompute supplier scorecards from units, shipments and allocated landed costs"
+
+    def handle(self, *args, **options):
+        count = rebuild_supplier_scorecards()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} supplier scorecard(s)."))
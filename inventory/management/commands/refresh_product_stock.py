@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from inventory.services.stock_balances import rebalance_stripes, refresh_product_stock, stripe_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy stock ledger totals onto Product.quantity/reserved and optionally respread stock over stripes; "
+        "schedule it every few minutes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebalance', action='store_true', help='Spread free stock evenly over the configured stripes')
+        parser.add_argument('--product', type=int, action='append', dest='products', help='Limit to these product ids')
+
+    def handle(self, *args, **options):
+        products = options['products']
+        if options['rebalance']:
+            rebalanced = rebalance_stripes(products)
+            self.stdout.write(f"Rebalanced {rebalanced} products over {stripe_count()} stripes.")
+        refreshed = refresh_product_stock(products)
+        self.stdout.write(self.style.SUCCESS(f"Refreshed stock on {refreshed} products."))
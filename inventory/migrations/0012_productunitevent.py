@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_unit_events(apps, schema_editor):
+    ProductUnit = apps.get_model('inventory', 'ProductUnit')
+    ProductUnitEvent = apps.get_model('inventory', 'ProductUnitEvent')
+    events = []
+    units = ProductUnit.objects.only(
+        'id', 'status', 'sale_line_id', 'landed_cost', 'created_at', 'created_by_id',
+        'sold_at', 'fault_reported_at', 'fault_notes',
+    )
+    for unit in units.iterator(chunk_size=2000):
+        events.append(ProductUnitEvent(
+            unit_id=unit.id, event_type='RECEIVED', status='AVAILABLE', landed_cost=unit.landed_cost,
+            actor_id=unit.created_by_id, created_at=unit.created_at,
+        ))
+        if unit.status == 'RESERVED':
+            events.append(ProductUnitEvent(
+                unit_id=unit.id, event_type='RESERVED', status='RESERVED', sale_line_id=unit.sale_line_id,
+                landed_cost=unit.landed_cost, created_at=unit.created_at,
+            ))
+        elif unit.status == 'SOLD':
+            events.append(ProductUnitEvent(
+                unit_id=unit.id, event_type='SOLD', status='SOLD', sale_line_id=unit.sale_line_id,
+                landed_cost=unit.landed_cost, created_at=unit.sold_at or unit.created_at,
+            ))
+        elif unit.status in ('FAULTY', 'RETURNED'):
+            events.append(ProductUnitEvent(
+                unit_id=unit.id, event_type=unit.status, status=unit.status, sale_line_id=unit.sale_line_id,
+                landed_cost=unit.landed_cost, note=(unit.fault_notes or '')[:255],
+                created_at=unit.fault_reported_at or unit.created_at,
+            ))
+        if len(events) >= 2000:
+            ProductUnitEvent.objects.bulk_create(events)
+            events = []
+    if events:
+        ProductUnitEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_shipmentcost_supporting_document'),
+        ('sales', '0005_remove_comboitem_combo_alter_documentline_combo_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductUnitEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('RECEIVED', 'Received'), ('RESERVED', 'Reserved'), ('RELEASED', 'Released'), ('SOLD', 'Sold'), ('FAULTY', 'Faulty'), ('RETURNED', 'Returned')], max_length=10)),
+                ('status', models.CharField(choices=[('AVAILABLE', 'Available'), ('RESERVED', 'Reserved'), ('SOLD', 'Sold'), ('FAULTY', 'Faulty'), ('RETURNED', 'Returned')], max_length=12)),
+                ('landed_cost', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('sale_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unit_events', to='sales.documentline')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='inventory.productunit')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['unit', 'created_at'], name='inventory_p_unit_id_f164fd_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_unit_events, migrations.RunPython.noop),
+    ]
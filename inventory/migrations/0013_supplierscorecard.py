@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_productunitevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierScorecard',
+            fields=[
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='scorecard', serialize=False, to='inventory.supplier')),
+                ('total_units', models.PositiveIntegerField(default=0)),
+                ('faulty_units', models.PositiveIntegerField(default=0)),
+                ('fault_rate', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=7)),
+                ('shipments_scored', models.PositiveIntegerField(default=0)),
+                ('on_time_shipments', models.PositiveIntegerField(default=0)),
+                ('total_delay_days', models.IntegerField(default=0)),
+                ('average_delay_days', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('on_time_pct', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=6)),
+                ('allocated_shipments', models.PositiveIntegerField(default=0)),
+                ('allocated_item_value', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('allocated_landed_cost', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=16)),
+                ('landed_cost_overhead_pct', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['supplier__name'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:31
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def backfill_combo_prices(apps, schema_editor):
+    Combo = apps.get_model('inventory', 'Combo')
+    ComboItem = apps.get_model('inventory', 'ComboItem')
+    totals = {}
+    for combo_id, price, quantity in ComboItem.objects.values_list('combo_id', 'product__price', 'quantity'):
+        totals[combo_id] = totals.get(combo_id, Decimal('0.00')) + Decimal(str(price or 0)) * quantity
+    combos = list(Combo.objects.all())
+    for combo in combos:
+        base = totals.get(combo.pk, Decimal('0.00')).quantize(Decimal('0.01'))
+        discount = Decimal(str(combo.discount_value or 0))
+        if combo.discount_type == 'fixed':
+            price = base - discount
+        elif combo.discount_type == 'percent':
+            price = base - base * discount / Decimal('100')
+        else:
+            price = base
+        combo.components_total = base
+        combo.final_price = max(price, Decimal('0.00')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    Combo.objects.bulk_update(combos, ['components_total', 'final_price'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_product_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='combo',
+            name='components_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='combo',
+            name='final_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_combo_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_combo_stored_prices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('quantity_in', models.IntegerField(default=0)),
+                ('quantity_out', models.IntegerField(default=0)),
+                ('balance', models.IntegerField(default=0)),
+                ('movement_count', models.PositiveIntegerField(default=0)),
+                ('archive_name', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['product', '-as_of'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'timestamp'], name='inventory_s_product_d287c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['timestamp'], name='inventory_s_timesta_5aa126_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='inventory.product'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockcheckpoint',
+            unique_together={('product', 'as_of')},
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_stock_movement_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('POSTED', 'Posted'), ('CANCELLED', 'Cancelled')], default='OPEN', max_length=10)),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('lines_adjusted', models.PositiveIntegerField(default=0)),
+                ('adjustment_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('journal_entry_id', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('posted_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='count_sessions', to='inventory.category')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='count_sessions_created', to=settings.AUTH_USER_MODEL)),
+                ('posted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='count_sessions_posted', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_quantity', models.IntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('counted_quantity', models.IntegerField(blank=True, null=True)),
+                ('variance', models.IntegerField(blank=True, null=True)),
+                ('counted_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_lines', to='inventory.product')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.countsession')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['session', 'variance'], name='inventory_c_session_eb0fe5_idx')],
+                'unique_together': {('session', 'product')},
+            },
+        ),
+    ]
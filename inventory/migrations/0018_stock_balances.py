@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_stock_balances(apps, schema_editor):
+    StockLocation = apps.get_model('inventory', 'StockLocation')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    Product = apps.get_model('inventory', 'Product')
+    location, _ = StockLocation.objects.get_or_create(code='main', defaults={'name': 'Main warehouse', 'is_default': True})
+    rows = (
+        Product.objects.exclude(quantity=0, reserved=0)
+        .order_by('pk')
+        .values_list('pk', 'quantity', 'reserved')
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for product_id, quantity, reserved in rows:
+        batch.append(StockBalance(product_id=product_id, location=location, stripe=0, quantity=quantity, reserved=reserved))
+        if len(batch) >= 2000:
+            StockBalance.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_cycle_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(max_length=40, unique=True)),
+                ('name', models.CharField(max_length=120)),
+                ('is_default', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ('-is_default', 'name'),
+            },
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe', models.PositiveSmallIntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('reserved', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='inventory.product')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='inventory.stocklocation')),
+            ],
+            options={
+                'unique_together': {('product', 'location', 'stripe')},
+            },
+        ),
+        migrations.RunPython(seed_stock_balances, migrations.RunPython.noop),
+    ]
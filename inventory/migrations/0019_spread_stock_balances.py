@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def spread_stock_balances(apps, schema_editor):
+    """Split the free stock seeded onto stripe 0 evenly over every stripe; reservations stay put."""
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    count = max(1, int(getattr(settings, 'STOCK_BALANCE_STRIPES', 4)))
+    if count == 1:
+        return
+    already_spread = StockBalance.objects.filter(stripe__gt=0).values('product_id')
+    rows = StockBalance.objects.filter(stripe=0).exclude(product_id__in=already_spread).order_by('pk').iterator(chunk_size=2000)
+    updated, created = [], []
+    for row in rows:
+        free = row.quantity - row.reserved
+        if free <= count:
+            continue
+        share, extra = divmod(free, count)
+        row.quantity = row.reserved + share + (1 if extra else 0)
+        updated.append(row)
+        created.extend(
+            StockBalance(
+                product_id=row.product_id, location_id=row.location_id, stripe=stripe,
+                quantity=share + (1 if stripe < extra else 0),
+            )
+            for stripe in range(1, count)
+        )
+        if len(updated) >= 2000:
+            StockBalance.objects.bulk_update(updated, ['quantity'])
+            StockBalance.objects.bulk_create(created)
+            updated, created = [], []
+    if updated:
+        StockBalance.objects.bulk_update(updated, ['quantity'])
+        StockBalance.objects.bulk_create(created)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_stock_balances'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_stock_balances, migrations.RunPython.noop),
+    ]
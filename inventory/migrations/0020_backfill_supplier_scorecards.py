@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def backfill_supplier_scorecards(apps, schema_editor):
+    from inventory.services.shipments import rebuild_supplier_scorecards
+
+    rebuild_supplier_scorecards(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_spread_stock_balances'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_supplier_scorecards, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,12 @@
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.templatetags.static import static
 from django.urls import reverse
 from django.utils import timezone
@@ -16,21 +17,40 @@ def product_image_path(instance, filename):
     return f"products/{instance.sku or 'no-sku'}/{filename}"
 
 
+def allocate_unique_slugs(model_class, values, slug_field_name='slug', max_length=160, exclude_pk=None):
+    """Unique slugs for ``values`` using one prefix query for the slugs already taken."""
+    bases = [slugify(value)[:max_length] or 'item' for value in values]
+    prefixes = Q()
+    for base in set(bases):
+        prefixes |= Q(**{f'{slug_field_name}__startswith': base})
+    existing_qs = model_class.objects.filter(prefixes)
+    if exclude_pk:
+        existing_qs = existing_qs.exclude(pk=exclude_pk)
+    used = set(existing_qs.values_list(slug_field_name, flat=True))
+    slugs = []
+    for base in bases:
+        slug = base
+        counter = 1
+        while slug in used:
+            suffix = f'-{counter}'
+            slug = f'{base[:max_length - len(suffix)]}{suffix}'
+            counter += 1
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
 def _generate_unique_slug(instance, value, slug_field_name='slug', max_length=160):
-    base_slug = slugify(value)[:max_length] or 'item'
-    slug = base_slug
-    model_class = instance.__class__
-    counter = 1
-    existing_qs = model_class.objects.filter(**{slug_field_name: slug})
-    if instance.pk:
-        existing_qs = existing_qs.exclude(pk=instance.pk)
-    while existing_qs.exists():
-        slug = f'{base_slug}-{counter}'[:max_length]
-        counter += 1
-        existing_qs = model_class.objects.filter(**{slug_field_name: slug})
-        if instance.pk:
-            existing_qs = existing_qs.exclude(pk=instance.pk)
-    return slug
+    return allocate_unique_slugs(
+        instance.__class__, [value], slug_field_name=slug_field_name, max_length=max_length, exclude_pk=instance.pk,
+    )[0]
+
+
+IMAGE_RENDITION_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 960,
+}
 
 
 def default_currency_code():
@@ -90,6 +110,7 @@ class Product(models.Model):
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to=product_image_path, blank=True, null=True)
     image_url = models.URLField(blank=True)  # Deprecated: retained temporarily for migration fallback
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     tracking_mode = models.CharField(max_length=10, choices=TRACKING_CHOICES, default=TRACK_QUANTITY)
     created_at = models.DateTimeField(default=timezone.now, editable=False)
@@ -105,16 +126,71 @@ class Product(models.Model):
     def __str__(self):
         return f'{self.name} ({self.sku})'
 
+    def slug_identifier(self) -> str:
+        base = self.name or self.sku
+        return f'{base}-{self.sku}' if self.sku and self.sku not in base else base
+
+    # Fields whose saved value is remembered so save() can react to changes.
+    TRACKED_FIELDS = ('price', 'quantity', 'reserved')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tracked()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_tracked()
+
+    def _remember_tracked(self):
+        self._loaded = {name: self.__dict__[name] for name in self.TRACKED_FIELDS if name in self.__dict__}
+
+    def load_stock_from_ledger(self) -> None:
+        """Replace the derived stock columns with the ledger totals.
+
+        Forms editing ``quantity``/``reserved`` call this first, so the save
+        moves the ledger to the figures entered rather than adding their
+        difference from a column that may lag.
+        """
+        totals = self.stock_balances.aggregate(quantity=Sum('quantity'), reserved=Sum('reserved'))
+        self.quantity = totals['quantity'] or 0
+        self.reserved = totals['reserved'] or 0
+        self._remember_tracked()
+
+    def _changed_since_load(self, name, update_fields=None):
+        """Difference between the current and loaded value of a tracked field, or None if unchanged."""
+        if name not in self.__dict__ or (update_fields is not None and name not in update_fields):
+            return None
+        loaded = getattr(self, '_loaded', {})
+        if self._state.adding or name not in loaded:
+            previous = 0 if self._state.adding else None
+        else:
+            previous = loaded[name]
+        current = self.__dict__[name]
+        if previous is None or current == previous:
+            return None
+        return (current or 0) - (previous or 0)
+
     def save(self, *args, **kwargs):
         if not self.slug and (self.name or self.sku):
-            base = self.name or self.sku
-            identifier = f'{base}-{self.sku}' if self.sku and self.sku not in base else base
-            self.slug = _generate_unique_slug(self, identifier)
+            self.slug = _generate_unique_slug(self, self.slug_identifier())
         if not self.currency:
             self.currency = default_currency_code()
         if not self.tracking_mode:
             self.tracking_mode = self.TRACK_QUANTITY
+        update_fields = kwargs.get('update_fields')
+        price_changed = not self._state.adding and self._changed_since_load('price', update_fields) is not None
+        stock_delta = {
+            name: self._changed_since_load(name, update_fields) or 0 for name in ('quantity', 'reserved')
+        }
         super().save(*args, **kwargs)
+        self._remember_tracked()
+        if any(stock_delta.values()):
+            # Direct edits of the derived columns are mirrored into the stock ledger.
+            StockBalance.apply_deltas({self.pk: (stock_delta['quantity'], stock_delta['reserved'])})
+        if price_changed:
+            Combo.objects.filter(items__product=self).refresh_prices()
 
     def get_absolute_url(self):
         return reverse('shop:product_detail', args=[self.slug])
@@ -133,10 +209,223 @@ class Product(models.Model):
             return self.image_url
         return static('shop/placeholder-product.jpg')
 
+    def get_image_renditions(self) -> dict:
+        renditions = self.image_renditions or {}
+        if not self.image or renditions.get('source') != self.image.name:
+            return {}
+        return renditions.get('widths') or {}
+
+    def get_image_rendition(self, size, fmt: str = 'jpeg') -> str:
+        """URL of the smallest rendition at least ``size`` wide, falling back to the original image.
+
+        ``size`` is a width in pixels or one of ``IMAGE_RENDITION_SIZES``.
+        """
+        width = IMAGE_RENDITION_SIZES.get(size, size)
+        widths = self.get_image_renditions()
+        available = sorted(int(w) for w, formats in widths.items() if fmt in formats)
+        if not available:
+            return self.get_primary_image_url()
+        chosen = next((w for w in available if w >= int(width)), available[-1])
+        return self.image.storage.url(widths[str(chosen)][fmt])
+
+    def get_image_srcset(self, fmt: str = 'jpeg') -> str:
+        widths = self.get_image_renditions()
+        storage = self.image.storage if widths else None
+        return ', '.join(
+            f'{storage.url(formats[fmt])} {width}w'
+            for width, formats in sorted(widths.items(), key=lambda pair: int(pair[0]))
+            if fmt in formats
+        )
+
+    @property
+    def image_srcset(self) -> str:
+        return self.get_image_srcset('jpeg')
+
+    @property
+    def image_webp_srcset(self) -> str:
+        return self.get_image_srcset('webp')
+
+    @property
+    def image_thumbnail_url(self) -> str:
+        return self.get_image_rendition('thumb')
+
+    @property
+    def image_card_url(self) -> str:
+        return self.get_image_rendition('card')
+
     @property
     def is_serial_tracked(self) -> bool:
         return self.tracking_mode == self.TRACK_SERIAL
 
+    def apply_movement(self, movement_type: str, quantity: int, unit_cost=None):
+        """Apply a stock movement to quantity and moving-average cost in memory."""
+        qty = int(quantity)
+        if movement_type == StockMovement.IN:
+            if unit_cost is not None:
+                old_qty = self.quantity or 0
+                old_avg = self.avg_cost or 0
+                new_qty = old_qty + qty
+                if new_qty > 0:
+                    total_cost = (
+                        Decimal(str(old_avg)) * Decimal(str(old_qty))
+                    ) + (Decimal(str(unit_cost)) * Decimal(str(qty)))
+                    self.avg_cost = (total_cost / Decimal(str(new_qty))).quantize(Decimal('0.0001'))
+            self.quantity = (self.quantity or 0) + qty
+        else:
+            self.quantity = (self.quantity or 0) - qty
+        return self
+
+
+class StockLocation(models.Model):
+    code = models.SlugField(max_length=40, unique=True)
+    name = models.CharField(max_length=120)
+    is_default = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+
+    DEFAULT_CODE = 'main'
+    _default_pk = None
+
+    class Meta:
+        ordering = ('-is_default', 'name')
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def default_pk(cls) -> int:
+        """Primary key of the default location, looked up once per process."""
+        if cls._default_pk is None:
+            location = cls.objects.filter(is_default=True).order_by('pk').first()
+            if location is None:
+                location, _ = cls.objects.get_or_create(code=cls.DEFAULT_CODE, defaults={'name': 'Main warehouse', 'is_default': True})
+            cls._default_pk = location.pk
+        return cls._default_pk
+
+
+class StockBalance(models.Model):
+    """Stock of one product at one location, split over stripes.
+
+    The stripes of a product add up to its balance at that location, so
+    concurrent checkouts can each update a different row instead of queueing
+    on one. ``Product.quantity`` and ``Product.reserved`` are the sum over
+    every row and are refreshed from here.
+    """
+
+    product = models.ForeignKey(Product, related_name='stock_balances', on_delete=models.CASCADE)
+    location = models.ForeignKey(StockLocation, related_name='balances', on_delete=models.PROTECT)
+    stripe = models.PositiveSmallIntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    reserved = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('product', 'location', 'stripe'),)
+
+    def __str__(self):
+        return f"{self.product_id}@{self.location_id}#{self.stripe}: {self.quantity}/{self.reserved}"
+
+    @classmethod
+    def total(cls, field: str, product=None):
+        """Ledger total of ``field`` for ``product`` (the outer row's pk by default) as a subquery, 0 without stripes."""
+        totals = cls.objects.filter(product=product or OuterRef('pk')).order_by().values('product').annotate(total=Sum(field))
+        return Coalesce(Subquery(totals.values('total'), output_field=models.IntegerField()), Value(0))
+
+    @classmethod
+    def apply(cls, product_id: int, quantity: int = 0, reserved: int = 0, location_id: int | None = None, stripe: int = 0) -> None:
+        """Add deltas to one stripe, creating the row on first use."""
+        location_id = location_id or StockLocation.default_pk()
+        row = cls.objects.filter(product_id=product_id, location_id=location_id, stripe=stripe)
+        changes = {'quantity': F('quantity') + quantity, 'reserved': F('reserved') + reserved, 'updated_at': timezone.now()}
+        if row.update(**changes):
+            return
+        cls.objects.bulk_create(
+            [cls(product_id=product_id, location_id=location_id, stripe=stripe)], ignore_conflicts=True,
+        )
+        row.update(**changes)
+
+    @staticmethod
+    def stripe_count() -> int:
+        return max(1, int(getattr(settings, 'STOCK_BALANCE_STRIPES', 4)))
+
+    @staticmethod
+    def spread(stripes: dict, count: int, quantity: int = 0, reserved: int = 0) -> None:
+        """Add deltas to one product's stripes in memory and even out their free stock.
+
+        Released reservations come off the stripes holding the most and new
+        ones are dealt out evenly; free stock is then split evenly over the
+        first ``count`` stripes, and stripes beyond that are drained. A
+        shortfall (more reserved than held) sits on stripe 0.
+        """
+        if reserved < 0:
+            remaining = -reserved
+            for row in sorted(stripes.values(), key=lambda row: -row.reserved):
+                taken = min(max(row.reserved, 0), remaining)
+                row.reserved -= taken
+                remaining -= taken
+            stripes[0].reserved -= remaining
+        elif reserved > 0:
+            share, extra = divmod(reserved, count)
+            for stripe in range(count):
+                stripes[stripe].reserved += share + (1 if stripe < extra else 0)
+        total_reserved = sum(row.reserved for row in stripes.values())
+        free = sum(row.quantity for row in stripes.values()) + quantity - total_reserved
+        if free < 0 or any(row.reserved < 0 for row in stripes.values()):
+            for row in stripes.values():
+                row.reserved = total_reserved if row.stripe == 0 else 0
+        share, extra = divmod(max(free, 0), count)
+        for stripe, row in stripes.items():
+            row.quantity = row.reserved + (share + (1 if stripe < extra else 0) if stripe < count else 0)
+        if free < 0:
+            stripes[0].quantity += free
+
+    @classmethod
+    @transaction.atomic
+    def apply_deltas(cls, deltas, location_id: int | None = None) -> None:
+        """Add ``{product_id: (quantity, reserved)}`` deltas, spreading each product over its stripes.
+
+        Every stripe of the products is locked in a fixed order, so this is
+        for receipts, counts and other back-office writes rather than the
+        checkout path, which touches a single stripe.
+        """
+        deltas = {product_id: delta for product_id, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        location_id = location_id or StockLocation.default_pk()
+        count = cls.stripe_count()
+
+        def locked():
+            rows = (
+                cls.objects.select_for_update()
+                .filter(product_id__in=list(deltas), location_id=location_id)
+                .order_by('product_id', 'stripe')
+            )
+            by_product = {product_id: {} for product_id in deltas}
+            for row in rows:
+                by_product[row.product_id][row.stripe] = row
+            return by_product
+
+        by_product = locked()
+        missing = [
+            cls(product_id=product_id, location_id=location_id, stripe=stripe)
+            for product_id, stripes in by_product.items()
+            for stripe in range(count)
+            if stripe not in stripes
+        ]
+        if missing:
+            # Rows cannot be locked before they exist; create them empty, then lock them all.
+            cls.objects.bulk_create(missing, ignore_conflicts=True, batch_size=500)
+            by_product = locked()
+
+        now = timezone.now()
+        rows = []
+        for product_id, (quantity, reserved) in deltas.items():
+            stripes = by_product[product_id]
+            cls.spread(stripes, count, quantity, reserved)
+            for row in stripes.values():
+                row.updated_at = now
+                rows.append(row)
+        cls.objects.bulk_update(rows, ['quantity', 'reserved', 'updated_at'], batch_size=500)
+
 
 class StockMovement(models.Model):
     IN = 'IN'
@@ -150,26 +439,74 @@ class StockMovement(models.Model):
     note = models.CharField(max_length=255, blank=True, null=True)
     user = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         product = self.product
-        qty = int(self.quantity)
-        if self.movement_type == self.IN:
-            if self.unit_cost is not None:
-                old_qty = product.quantity or 0
-                old_avg = product.avg_cost or 0
-                new_qty = old_qty + qty
-                if new_qty > 0:
-                    total_cost = (
-                        Decimal(str(old_avg)) * Decimal(str(old_qty))
-                    ) + (Decimal(str(self.unit_cost)) * Decimal(str(qty)))
-                    product.avg_cost = (total_cost / Decimal(str(new_qty))).quantize(Decimal('0.0001'))
-            product.quantity = (product.quantity or 0) + qty
-        else:
-            product.quantity = (product.quantity or 0) - qty
+        product.apply_movement(self.movement_type, self.quantity, self.unit_cost)
         product.save()
 
 
+class StockCheckpoint(models.Model):
+    """Running stock totals for a product up to ``as_of``, written before older movements are archived.
+
+    ``balance`` is cumulative over every archived movement, so the balance
+    at any later moment is the latest checkpoint plus the hot movements.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    as_of = models.DateTimeField()
+    quantity_in = models.IntegerField(default=0)
+    quantity_out = models.IntegerField(default=0)
+    balance = models.IntegerField(default=0)
+    movement_count = models.PositiveIntegerField(default=0)
+    archive_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['product', '-as_of']
+        unique_together = (('product', 'as_of'),)
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.as_of:%Y-%m-%d}: {self.balance}"
+
+
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+class ComboQuerySet(models.QuerySet):
+    def refresh_prices(self) -> int:
+        """Recompute the stored components total and final price of every combo in the queryset.
+
+        Runs as two UPDATE statements regardless of how many combos are
+        affected, plus one read and one batched write for percentage
+        discounts, which are rounded by ``apply_discount`` in Python because
+        SQL ``ROUND`` does not round halves like ``Decimal`` on every backend.
+        """
+        components = (
+            ComboItem.objects.filter(combo=OuterRef('pk'))
+            .values('combo')
+            .annotate(total=Sum(F('product__price') * F('quantity'), output_field=PRICE_FIELD))
+            .values('total')
+        )
+        self.update(components_total=Coalesce(Subquery(components, output_field=PRICE_FIELD), Value(Decimal('0.00'))))
+        updated = self.exclude(discount_type=Combo.DISCOUNT_PERCENT).update(final_price=Combo.final_price_expression())
+        percent = list(
+            self.filter(discount_type=Combo.DISCOUNT_PERCENT)
+            .only('id', 'discount_type', 'discount_value', 'components_total')
+        )
+        for combo in percent:
+            combo.final_price = combo.apply_discount(combo.components_total)
+        if percent:
+            Combo.objects.bulk_update(percent, ['final_price'], batch_size=500)
+        return updated + len(percent)
+
+
 class Combo(models.Model):
     DISCOUNT_NONE = 'none'
     DISCOUNT_FIXED = 'fixed'
@@ -186,31 +523,60 @@ class Combo(models.Model):
     is_active = models.BooleanField(default=True)
     discount_type = models.CharField(max_length=10, choices=DISCOUNT_CHOICES, default=DISCOUNT_NONE)
     discount_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Denormalised from the components; kept current by ComboQuerySet.refresh_prices().
+    components_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    final_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ComboQuerySet.as_manager()
+
     class Meta:
         ordering = ('name',)
 
     def __str__(self):
         return self.name
 
-    def components_total(self):
-        total = Decimal('0.00')
-        for item in self.items.select_related('product').all():
-            price = Decimal(str(item.product.price or Decimal('0.00')))
-            qty = Decimal(str(item.quantity))
-            total += price * qty
-        return total.quantize(Decimal('0.01'))
+    def save(self, *args, **kwargs):
+        self.final_price = self.apply_discount(self.components_total)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'discount_type', 'discount_value'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'final_price'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def final_price_expression(cls):
+        """SQL equivalent of ``apply_discount`` for combos without a percentage discount."""
+        base = F('components_total')
+        zero = Value(Decimal('0.00'))
+        return Case(
+            When(discount_type=cls.DISCOUNT_FIXED, then=Greatest(base - F('discount_value'), zero)),
+            default=base,
+            output_field=PRICE_FIELD,
+        )
 
-    def compute_price(self):
-        base = self.components_total()
+    def apply_discount(self, base):
+        base = Decimal(str(base or Decimal('0.00')))
         if self.discount_type == self.DISCOUNT_FIXED:
             return max(base - Decimal(str(self.discount_value)), Decimal('0.00')).quantize(Decimal('0.01'))
         if self.discount_type == self.DISCOUNT_PERCENT:
             percent = Decimal(str(self.discount_value)) / Decimal('100')
-            return max(base - (base * percent), Decimal('0.00')).quantize(Decimal('0.01'))
+            return max(base - (base * percent), Decimal('0.00')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
         return base.quantize(Decimal('0.01'))
 
+    def compute_components_total(self, items=None):
+        """Live components total; pass already-loaded items to avoid a query."""
+        if items is None:
+            items = self.items.select_related('product').all()
+        total = Decimal('0.00')
+        for item in items:
+            price = Decimal(str(item.product.price or Decimal('0.00')))
+            qty = Decimal(str(item.quantity))
+            total += price * qty
+        return total.quantize(Decimal('0.01'))
+
+    def compute_price(self, items=None):
+        return self.apply_discount(self.compute_components_total(items))
+
 
 class ComboItem(models.Model):
     combo = models.ForeignKey(Combo, related_name='items', on_delete=models.CASCADE)
@@ -223,6 +589,40 @@ class ComboItem(models.Model):
     def __str__(self):
         return f"{self.product} x{self.quantity}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Combo.objects.filter(pk=self.combo_id).refresh_prices()
+
+    def delete(self, *args, **kwargs):
+        combo_id = self.combo_id
+        result = super().delete(*args, **kwargs)
+        Combo.objects.filter(pk=combo_id).refresh_prices()
+        return result
+
+
+class ShipmentQuerySet(models.QuerySet):
+    def with_rollups(self):
+        """Annotate cost and item rollups so the matching properties need no extra queries."""
+        costs = ShipmentCost.objects.filter(shipment=OuterRef('pk'))
+        items = ShipmentItem.objects.filter(shipment=OuterRef('pk'))
+
+        def _item_sum(expression, output_field):
+            total = items.order_by().values('shipment').annotate(total=Sum(expression)).values('total')
+            return Coalesce(Subquery(total, output_field=output_field), Value(0), output_field=output_field)
+
+        cost_total = costs.order_by().values('shipment').annotate(total=Sum('amount_base')).values('total')
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        value = models.DecimalField(max_digits=18, decimal_places=4)
+        return self.annotate(
+            rollup_total_cost_base=Coalesce(Subquery(cost_total, output_field=money), Value(Decimal('0.00')), output_field=money),
+            rollup_total_item_value=_item_sum(F('quantity_expected') * F('unit_purchase_price'), value),
+            rollup_total_quantity_expected=_item_sum('quantity_expected', models.IntegerField()),
+            rollup_total_quantity_received=_item_sum('quantity_received', models.IntegerField()),
+            rollup_has_items=Exists(items),
+            rollup_has_pending_items=Exists(items.filter(quantity_received__lt=F('quantity_expected'))),
+            rollup_has_unallocated_costs=Exists(costs.filter(allocated=False)),
+        )
+
 
 class Shipment(models.Model):
     INCOTERM_FOB = 'FOB'
@@ -295,6 +695,8 @@ class Shipment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShipmentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -335,10 +737,14 @@ class Shipment(models.Model):
 
     @property
     def total_cost_base(self) -> Decimal:
+        if hasattr(self, 'rollup_total_cost_base'):
+            return self.rollup_total_cost_base
         return self.costs.aggregate(total=Sum('amount_base'))['total'] or Decimal('0.00')
 
     @property
     def total_item_value(self) -> Decimal:
+        if hasattr(self, 'rollup_total_item_value'):
+            return self.rollup_total_item_value
         total = Decimal('0.00')
         for item in self.items.all():
             total += item.expected_value
@@ -346,14 +752,20 @@ class Shipment(models.Model):
 
     @property
     def total_quantity_expected(self) -> int:
+        if hasattr(self, 'rollup_total_quantity_expected'):
+            return self.rollup_total_quantity_expected
         return sum(item.quantity_expected for item in self.items.all())
 
     @property
     def total_quantity_received(self) -> int:
+        if hasattr(self, 'rollup_total_quantity_received'):
+            return self.rollup_total_quantity_received
         return sum(item.quantity_received for item in self.items.all())
 
     @property
     def is_fully_received(self) -> bool:
+        if hasattr(self, 'rollup_has_items'):
+            return self.rollup_has_items and not self.rollup_has_pending_items
         items = self.items.all()
         if not items.exists():
             return False
@@ -361,6 +773,8 @@ class Shipment(models.Model):
 
     @property
     def are_costs_allocated(self) -> bool:
+        if hasattr(self, 'rollup_has_unallocated_costs'):
+            return not self.rollup_has_unallocated_costs
         return not self.costs.filter(allocated=False).exists()
 
     def ensure_can_close(self):
@@ -402,8 +816,26 @@ class Shipment(models.Model):
             actor=actor,
             note=note or '',
         )
+        if new_status == self.STATUS_RECEIVED:
+            self._score_receipt()
         return self
 
+    def _score_receipt(self):
+        deltas = {'total_units': self.units.count()}
+        if self.eta_date and self.arrival_date:
+            delay_days = (self.arrival_date - self.eta_date).days
+            deltas.update(
+                shipments_scored=1,
+                total_delay_days=delay_days,
+                on_time_shipments=1 if delay_days <= 0 else 0,
+            )
+        SupplierScorecard.apply(self.supplier_id, **deltas)
+
+
+def _touch_shipment(shipment_id):
+    """Bump the parent shipment's ``updated_at`` so API validators see cost and item edits."""
+    Shipment.objects.filter(pk=shipment_id).update(updated_at=timezone.now())
+
 
 class ShipmentCost(models.Model):
     TYPE_FREIGHT = 'FREIGHT'
@@ -442,6 +874,12 @@ class ShipmentCost(models.Model):
         fx = Decimal(str(self.fx_rate or 0))
         self.amount_base = (amount * fx).quantize(Decimal('0.01'))
         super().save(*args, **kwargs)
+        _touch_shipment(self.shipment_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        _touch_shipment(self.shipment_id)
+        return result
 
     def __str__(self):
         return f"{self.shipment.shipment_code} {self.cost_type} {self.amount} {self.currency}"
@@ -466,6 +904,15 @@ class ShipmentItem(models.Model):
     def __str__(self):
         return f"{self.product} ({self.quantity_expected})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        _touch_shipment(self.shipment_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        _touch_shipment(self.shipment_id)
+        return result
+
     @property
     def expected_value(self) -> Decimal:
         return (Decimal(str(self.quantity_expected)) * Decimal(str(self.unit_purchase_price))).quantize(Decimal('0.0001'))
@@ -483,8 +930,8 @@ class ShipmentItem(models.Model):
         if self.quantity_received > self.quantity_expected:
             raise ValidationError("Quantity received cannot exceed quantity expected.")
 
-    def apply_landed_cost(self, allocation_amount: Decimal):
-        """Persist landed cost for this item and sync linked serial units."""
+    def set_landed_cost(self, allocation_amount: Decimal):
+        """Compute landed total and unit cost for an allocated share in memory."""
         allocation_amount = Decimal(str(allocation_amount or 0))
         realized_qty = self.quantity_received or self.quantity_expected or 1
         purchase_total = Decimal(str(realized_qty)) * Decimal(str(self.unit_purchase_price))
@@ -492,9 +939,7 @@ class ShipmentItem(models.Model):
         landed_unit = (landed_total / Decimal(str(realized_qty))).quantize(Decimal('0.0001'))
         self.landed_total_cost = landed_total
         self.landed_unit_cost = landed_unit
-        self.save(update_fields=['landed_total_cost', 'landed_unit_cost'])
-        if self.requires_serials:
-            ProductUnit.objects.filter(shipment_item=self).update(landed_cost=self.landed_unit_cost, purchase_price=self.unit_purchase_price)
+        return self
 
 
 class ProductUnit(models.Model):
@@ -549,17 +994,97 @@ class ProductUnit(models.Model):
             return None
         return Decimal(str(self.sale_line.line_total)) - Decimal(str(self.landed_cost))
 
-    def mark_sold(self, sale_line, timestamp=None):
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            ProductUnitEvent.record([self], ProductUnitEvent.EVENT_RECEIVED, actor=self.created_by)
+
+    def mark_sold(self, sale_line, timestamp=None, actor=None):
         self.sale_line = sale_line
         self.status = self.STATUS_SOLD
         self.sold_at = timestamp or timezone.now()
         self.save(update_fields=['sale_line', 'status', 'sold_at', 'updated_at'])
+        ProductUnitEvent.record([self], ProductUnitEvent.EVENT_SOLD, sale_line=sale_line, actor=actor, at=self.sold_at)
 
-    def mark_faulty(self, notes='', timestamp=None):
+    def mark_faulty(self, notes='', timestamp=None, actor=None):
+        first_report = self.fault_reported_at is None
         self.status = self.STATUS_FAULTY
         self.fault_notes = notes or ''
         self.fault_reported_at = timestamp or timezone.now()
         self.save(update_fields=['status', 'fault_notes', 'fault_reported_at', 'updated_at'])
+        ProductUnitEvent.record([self], ProductUnitEvent.EVENT_FAULTY, note=self.fault_notes, actor=actor, at=self.fault_reported_at)
+        if first_report:
+            SupplierScorecard.apply(self.shipment.supplier_id, faulty_units=1)
+
+    def mark_returned(self, notes='', timestamp=None, actor=None):
+        self.status = self.STATUS_RETURNED
+        self.save(update_fields=['status', 'updated_at'])
+        ProductUnitEvent.record([self], ProductUnitEvent.EVENT_RETURNED, note=notes, actor=actor, at=timestamp)
+
+
+class ProductUnitEvent(models.Model):
+    """Append-only history of a serial unit; rows are never updated."""
+
+    EVENT_RECEIVED = 'RECEIVED'
+    EVENT_RESERVED = 'RESERVED'
+    EVENT_RELEASED = 'RELEASED'
+    EVENT_SOLD = 'SOLD'
+    EVENT_FAULTY = 'FAULTY'
+    EVENT_RETURNED = 'RETURNED'
+    EVENT_CHOICES = [
+        (EVENT_RECEIVED, 'Received'),
+        (EVENT_RESERVED, 'Reserved'),
+        (EVENT_RELEASED, 'Released'),
+        (EVENT_SOLD, 'Sold'),
+        (EVENT_FAULTY, 'Faulty'),
+        (EVENT_RETURNED, 'Returned'),
+    ]
+    EVENT_STATUS = {
+        EVENT_RECEIVED: ProductUnit.STATUS_AVAILABLE,
+        EVENT_RESERVED: ProductUnit.STATUS_RESERVED,
+        EVENT_RELEASED: ProductUnit.STATUS_AVAILABLE,
+        EVENT_SOLD: ProductUnit.STATUS_SOLD,
+        EVENT_FAULTY: ProductUnit.STATUS_FAULTY,
+        EVENT_RETURNED: ProductUnit.STATUS_RETURNED,
+    }
+
+    unit = models.ForeignKey(ProductUnit, related_name='events', on_delete=models.CASCADE)
+    event_type = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    status = models.CharField(max_length=12, choices=ProductUnit.STATUS_CHOICES)
+    sale_line = models.ForeignKey('sales.DocumentLine', related_name='unit_events', on_delete=models.SET_NULL, null=True, blank=True)
+    landed_cost = models.DecimalField(max_digits=12, decimal_places=4, blank=True, null=True)
+    note = models.CharField(max_length=255, blank=True)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['unit', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.unit_id} {self.event_type} {self.created_at:%Y-%m-%d}"
+
+    @classmethod
+    def record(cls, units, event_type: str, *, sale_line=None, note: str = '', actor=None, at=None, batch_size: int = 1000):
+        """Bulk-insert one event per unit."""
+        timestamp = at or timezone.now()
+        events = [
+            cls(
+                unit_id=unit.pk,
+                event_type=event_type,
+                status=cls.EVENT_STATUS[event_type],
+                sale_line_id=sale_line.pk if sale_line is not None else getattr(unit, 'sale_line_id', None),
+                landed_cost=getattr(unit, 'landed_cost', None),
+                note=(note or '')[:255],
+                actor=actor,
+                created_at=timestamp,
+            )
+            for unit in units
+        ]
+        return cls.objects.bulk_create(events, batch_size=batch_size)
 
 
 class ShipmentEventLog(models.Model):
@@ -585,3 +1110,126 @@ class ShipmentEventLog(models.Model):
 
     def __str__(self):
         return f"{self.shipment.shipment_code} {self.event_type} {self.created_at:%Y-%m-%d}"
+
+
+class SupplierScorecard(models.Model):
+    """Running supplier metrics, adjusted in place as units, shipments and costs change."""
+
+    supplier = models.OneToOneField(Supplier, related_name='scorecard', on_delete=models.CASCADE, primary_key=True)
+    total_units = models.PositiveIntegerField(default=0)
+    faulty_units = models.PositiveIntegerField(default=0)
+    fault_rate = models.DecimalField(max_digits=7, decimal_places=4, default=Decimal('0.0000'))
+    shipments_scored = models.PositiveIntegerField(default=0)
+    on_time_shipments = models.PositiveIntegerField(default=0)
+    total_delay_days = models.IntegerField(default=0)
+    average_delay_days = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+    on_time_pct = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal('0.00'))
+    allocated_shipments = models.PositiveIntegerField(default=0)
+    allocated_item_value = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal('0.0000'))
+    allocated_landed_cost = models.DecimalField(max_digits=16, decimal_places=4, default=Decimal('0.0000'))
+    landed_cost_overhead_pct = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = (
+        'total_units',
+        'faulty_units',
+        'shipments_scored',
+        'on_time_shipments',
+        'total_delay_days',
+        'allocated_shipments',
+        'allocated_item_value',
+        'allocated_landed_cost',
+    )
+
+    class Meta:
+        ordering = ['supplier__name']
+
+    def __str__(self):
+        return f"Scorecard for {self.supplier_id}"
+
+    def recalculate(self):
+        """Refresh the derived percentages from the running counters."""
+        hundred = Decimal('100')
+        self.fault_rate = (
+            (Decimal(self.faulty_units) / Decimal(self.total_units)).quantize(Decimal('0.0001'))
+            if self.total_units else Decimal('0.0000')
+        )
+        if self.shipments_scored:
+            self.average_delay_days = (Decimal(self.total_delay_days) / Decimal(self.shipments_scored)).quantize(Decimal('0.01'))
+            self.on_time_pct = (Decimal(self.on_time_shipments) * hundred / Decimal(self.shipments_scored)).quantize(Decimal('0.01'))
+        else:
+            self.average_delay_days = Decimal('0.00')
+            self.on_time_pct = Decimal('0.00')
+        self.landed_cost_overhead_pct = (
+            (self.allocated_landed_cost * hundred / self.allocated_item_value).quantize(Decimal('0.01'))
+            if self.allocated_item_value else Decimal('0.00')
+        )
+        return self
+
+    @classmethod
+    def apply(cls, supplier_id: int, **deltas):
+        """Add ``deltas`` to the supplier's counters under a row lock and refresh derived columns."""
+        unknown = set(deltas) - set(cls.COUNTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown scorecard counters: {', '.join(sorted(unknown))}")
+        with transaction.atomic():
+            card, _ = cls.objects.select_for_update().get_or_create(supplier_id=supplier_id)
+            for field, delta in deltas.items():
+                setattr(card, field, getattr(card, field) + delta)
+            card.recalculate()
+            card.save()
+        return card
+
+
+class CountSession(models.Model):
+    """A stock take: expected quantities are frozen when the session starts."""
+
+    STATUS_OPEN = 'OPEN'
+    STATUS_POSTED = 'POSTED'
+    STATUS_CANCELLED = 'CANCELLED'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_POSTED, 'Posted'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+
+    name = models.CharField(max_length=120)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='count_sessions')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    line_count = models.PositiveIntegerField(default=0)
+    lines_adjusted = models.PositiveIntegerField(default=0)
+    adjustment_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    journal_entry_id = models.IntegerField(null=True, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='count_sessions_created', on_delete=models.SET_NULL, null=True, blank=True)
+    posted_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='count_sessions_posted', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    posted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+    @property
+    def is_open(self) -> bool:
+        return self.status == self.STATUS_OPEN
+
+
+class CountLine(models.Model):
+    session = models.ForeignKey(CountSession, related_name='lines', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='count_lines', on_delete=models.CASCADE)
+    expected_quantity = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    counted_quantity = models.IntegerField(null=True, blank=True)
+    variance = models.IntegerField(null=True, blank=True)
+    counted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (('session', 'product'),)
+        indexes = [
+            models.Index(fields=['session', 'variance']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.counted_quantity}/{self.expected_quantity}"
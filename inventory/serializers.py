@@ -1,10 +1,38 @@
 from rest_framework import serializers
 
-from .models import Product, Combo, ComboItem, Shipment, ShipmentItem
+from .models import Product, Combo, ComboItem, CountLine, CountSession, Shipment, ShipmentItem, StockMovement
 
 
-class ProductSerializer(serializers.ModelSerializer):
+def requested_fields(request):
+    """Field names from a ``?fields=a,b`` query parameter, or None when not given."""
+    if request is None:
+        return None
+    params = getattr(request, 'query_params', None) or request.GET
+    raw = params.get('fields')
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Drop fields the client did not ask for on read requests."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        wanted = requested_fields(request)
+        if wanted is None:
+            return
+        for name in set(self.fields) - wanted:
+            self.fields.pop(name)
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True)
+    image_thumbnail = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -15,6 +43,9 @@ class ProductSerializer(serializers.ModelSerializer):
             'price',
             'quantity',
             'image',
+            'image_thumbnail',
+            'image_srcset',
+            'updated_at',
         ]
 
     def validate_image(self, image):
@@ -25,8 +56,32 @@ class ProductSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError('Image must be 5MB or smaller.')
         return image
 
+    def _absolute(self, url):
+        request = self.context.get('request') if isinstance(self.context, dict) else None
+        return request.build_absolute_uri(url) if request and url.startswith('/') else url
+
+    def get_image_thumbnail(self, obj):
+        if not obj.image:
+            return None
+        return self._absolute(obj.image_thumbnail_url)
+
+    def get_image_srcset(self, obj):
+        widths = obj.get_image_renditions()
+        if not widths:
+            return {}
+        return {
+            fmt: ', '.join(
+                f'{self._absolute(obj.image.storage.url(formats[fmt]))} {width}w'
+                for width, formats in sorted(widths.items(), key=lambda pair: int(pair[0]))
+                if fmt in formats
+            )
+            for fmt in ('webp', 'jpeg')
+        }
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
+        if 'image' not in self.fields:
+            return data
         request = self.context.get('request') if isinstance(self.context, dict) else None
         image_field = instance.image
         if image_field:
@@ -38,6 +93,14 @@ class ProductSerializer(serializers.ModelSerializer):
         return data
 
 
+class StockMovementSerializer(serializers.ModelSerializer):
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'product', 'product_sku', 'movement_type', 'quantity', 'unit_cost', 'timestamp', 'note', 'user']
+
+
 class ComboItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_sku = serializers.CharField(source='product.sku', read_only=True)
@@ -50,8 +113,7 @@ class ComboItemSerializer(serializers.ModelSerializer):
 
 class ComboSerializer(serializers.ModelSerializer):
     items = ComboItemSerializer(many=True, read_only=True)
-    components_total = serializers.SerializerMethodField()
-    computed_price = serializers.SerializerMethodField()
+    computed_price = serializers.DecimalField(source='final_price', max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Combo
@@ -68,12 +130,6 @@ class ComboSerializer(serializers.ModelSerializer):
             'computed_price',
         ]
 
-    def get_components_total(self, obj):
-        return obj.components_total()
-
-    def get_computed_price(self, obj):
-        return obj.compute_price()
-
 
 class ShipmentItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -99,7 +155,7 @@ class ShipmentItemSerializer(serializers.ModelSerializer):
         return max(obj.quantity_expected - obj.quantity_received, 0)
 
 
-class ShipmentSerializer(serializers.ModelSerializer):
+class ShipmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     items = ShipmentItemSerializer(many=True, read_only=True)
     total_cost_base = serializers.SerializerMethodField()
@@ -118,8 +174,45 @@ class ShipmentSerializer(serializers.ModelSerializer):
             'arrival_date',
             'allocation_basis',
             'total_cost_base',
+            'updated_at',
             'items',
         ]
 
     def get_total_cost_base(self, obj):
         return obj.total_cost_base
+
+
+class CountSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CountSession
+        fields = [
+            'id',
+            'name',
+            'category',
+            'status',
+            'line_count',
+            'lines_adjusted',
+            'adjustment_value',
+            'journal_entry_id',
+            'created_at',
+            'posted_at',
+        ]
+        read_only_fields = [
+            'status',
+            'line_count',
+            'lines_adjusted',
+            'adjustment_value',
+            'journal_entry_id',
+            'created_at',
+            'posted_at',
+        ]
+
+
+class CountLineSerializer(serializers.ModelSerializer):
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    variance = serializers.IntegerField(source='current_variance', read_only=True)
+
+    class Meta:
+        model = CountLine
+        fields = ['id', 'product', 'product_sku', 'product_name', 'expected_quantity', 'counted_quantity', 'variance', 'unit_cost']
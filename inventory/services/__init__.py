@@ -1,10 +1,72 @@
 from .shipments import (
     ShipmentServiceError,
+    LandedCostShare,
     allocate_landed_costs,
+    plan_landed_cost_allocation,
     receive_shipment,
     shipment_cost_summary,
     landed_cost_per_product,
     profit_per_serial,
+    serial_trace,
     supplier_defect_rate,
+    supplier_scorecards,
+    rebuild_supplier_scorecards,
     shipment_delay_report,
+    with_cost_breakdown,
+    cost_summary_for,
+)
+from .serials import (
+    SerialConflict,
+    SerialConflictError,
+    find_serial_conflicts,
+    normalise_serial,
+    parse_serial_upload,
+    parse_serials,
+    units_created,
+    validate_serial_batch,
+)
+from .product_import import (
+    ImportRowError,
+    ProductImportError,
+    ProductImportResult,
+    import_products,
+    products_imported,
+    read_product_rows,
+)
+from .combos import (
+    combo_availability,
+    combo_picker_options,
+    compute_combo_availability,
+    invalidate_combo_availability,
+)
+from .stock_history import (
+    MovementArchiveResult,
+    archive_stock_movements,
+    movement_retention_days,
+    read_movement_archive,
+)
+from .cycle_counts import (
+    CountUploadResult,
+    CycleCountError,
+    cancel_count_session,
+    clean_counts,
+    compute_variances,
+    parse_count_rows,
+    post_count_session,
+    record_counts,
+    start_count_session,
+    variance_summary,
+)
+from .stock_balances import (
+    apply_stock_deltas,
+    available_quantity,
+    consume_reserved,
+    rebalance_stripes,
+    refresh_product_stock,
+    release_reserved,
+    reserve_available,
+    schedule_stock_refresh,
+    stock_levels,
+    stripe_count,
+    sync_ledger_from,
 )
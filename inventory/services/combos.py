@@ -1,8 +1,12 @@
 from decimal import Decimal
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import OuterRef, Value
+from django.db.models.functions import Greatest
 
-from inventory.models import Combo
+from inventory.models import Combo, ComboItem, StockBalance
 
 
 TWOPLACES = Decimal('0.01')
@@ -45,7 +49,7 @@ def add_combo_to_document(document, combo_id, quantity=1, note_prefix='Combo: ')
         created_lines.append(line)
         base_total += Decimal(str(line.line_total))
 
-    final_price = (Decimal(str(combo.compute_price())) * qty).quantize(TWOPLACES)
+    final_price = (combo.compute_price(items) * qty).quantize(TWOPLACES)
     discount_amount = (base_total - final_price).quantize(TWOPLACES)
     discount_line = None
 
@@ -85,13 +89,71 @@ def add_combo_to_quotation(quotation, combo_id, quantity=1, note_prefix='Combo:
     return add_combo_to_document(quotation, combo_id, quantity, note_prefix)
 
 
+COMBO_AVAILABILITY_CACHE_KEY = 'inventory:combo_availability:v1'
+COMBO_PICKER_CACHE_KEY = 'inventory:combo_picker:v1'
+
+
+def compute_combo_availability() -> dict[int, int]:
+    """Buildable quantity of every active combo from one query over its components.
+
+    For each combo this is the minimum over its components of
+    ``available_stock // per-combo quantity``, with available stock being
+    the ledger's ``quantity - reserved`` floored at zero. Combos without
+    components are left out and read as 0.
+    """
+    product = OuterRef('product_id')
+    available = Greatest(StockBalance.total('quantity', product) - StockBalance.total('reserved', product), Value(0))
+    rows = (
+        ComboItem.objects.filter(combo__is_active=True, quantity__gt=0)
+        .annotate(available=available)
+        .values_list('combo_id', 'quantity', 'available')
+    )
+    index: dict[int, int] = {}
+    for combo_id, quantity, stock in rows:
+        buildable = int(stock) // quantity
+        index[combo_id] = min(index.get(combo_id, buildable), buildable)
+    return index
+
+
+def combo_availability() -> dict[int, int]:
+    """Cached combo availability index keyed by combo id."""
+    index = cache.get(COMBO_AVAILABILITY_CACHE_KEY)
+    if index is None:
+        index = compute_combo_availability()
+        cache.set(COMBO_AVAILABILITY_CACHE_KEY, index, getattr(settings, 'CACHE_TTL_COMBO_AVAILABILITY', 300))
+    return index
+
+
+def combo_picker_options() -> list[dict]:
+    """Active combos with their stored price and availability, ready for a picker.
+
+    Cached alongside the availability index and dropped with it.
+    """
+    options = cache.get(COMBO_PICKER_CACHE_KEY)
+    if options is None:
+        availability = combo_availability()
+        options = [
+            {'id': pk, 'code': code, 'name': name, 'price': price, 'available': availability.get(pk, 0)}
+            for pk, code, name, price in Combo.objects.filter(is_active=True).order_by('name').values_list('id', 'code', 'name', 'final_price')
+        ]
+        cache.set(COMBO_PICKER_CACHE_KEY, options, getattr(settings, 'CACHE_TTL_COMBO_AVAILABILITY', 300))
+    return options
+
+
+def invalidate_combo_availability() -> None:
+    """Drop the cached index now and again on commit, so no reader caches pre-commit stock."""
+    keys = [COMBO_AVAILABILITY_CACHE_KEY, COMBO_PICKER_CACHE_KEY]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
 def combo_available_quantity(combo):
+    if combo.is_active and combo.pk:
+        return combo_availability().get(combo.pk, 0)
     limits = []
     for item in combo.items.all():
         required = item.quantity
         if required <= 0:
             continue
-        product = item.product
-        stock = getattr(product, 'quantity', 0) or 0
-        limits.append(stock // required if required else 0)
+        limits.append(item.product.available_stock // required)
     return min(limits) if limits else 0
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import csv
+import io
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Mapping
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from accounting.models import JournalEntry, JournalLine
+from inventory.models import Category, CountLine, CountSession, Product, StockBalance, StockMovement
+from inventory.services.combos import invalidate_combo_availability
+from inventory.services.shipments import _base_currency, _get_account
+from inventory.services.stock_balances import apply_stock_deltas
+
+
+COUNT_BATCH_SIZE = 2000
+COUNT_HEADERS = {'sku', 'code', 'barcode'}
+
+
+class CycleCountError(ValidationError):
+    """Raised when a count session cannot accept counts or be posted."""
+
+
+@dataclass
+class CountUploadResult:
+    matched: int = 0
+    units: int = 0
+    unknown: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {'matched': self.matched, 'units': self.units, 'unknown': self.unknown}
+
+
+def _ensure_open(session: CountSession) -> None:
+    if not session.is_open:
+        raise CycleCountError(f'Count session is {session.get_status_display().lower()}.')
+
+
+def count_scope(category: Category | None = None):
+    """Products a session counts: quantity-tracked stock, optionally limited to one category."""
+    products = Product.objects.filter(track_inventory=True, tracking_mode=Product.TRACK_QUANTITY)
+    if category is not None:
+        products = products.filter(category=category)
+    return products
+
+
+@transaction.atomic
+def start_count_session(name: str, *, category: Category | None = None, user=None) -> CountSession:
+    """Open a session and freeze the expected quantity and unit cost of every product in scope.
+
+    Expected quantities come from the stock ledger; ``Product.quantity``
+    may lag it. Serial-tracked products are reconciled unit by unit and
+    are left out.
+    """
+    session = CountSession.objects.create(name=name, category=category, created_by=user)
+    rows = (
+        count_scope(category).annotate(ledger_quantity=StockBalance.total('quantity')).order_by('pk')
+        .values_list('pk', 'ledger_quantity', 'avg_cost').iterator(chunk_size=COUNT_BATCH_SIZE)
+    )
+    batch = []
+    total = 0
+    for product_id, quantity, avg_cost in rows:
+        batch.append(CountLine(session=session, product_id=product_id, expected_quantity=quantity, unit_cost=avg_cost or 0))
+        if len(batch) >= COUNT_BATCH_SIZE:
+            CountLine.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        CountLine.objects.bulk_create(batch)
+        total += len(batch)
+    session.line_count = total
+    session.save(update_fields=['line_count'])
+    return session
+
+
+def _parse_quantity(value, where: str) -> int:
+    try:
+        number = Decimal(str(value).strip())
+    except ArithmeticError:
+        number = None
+    if number is None or not number.is_finite() or number != number.to_integral_value():
+        raise CycleCountError(f'{where}: quantity must be a whole number.')
+    if number < 0:
+        raise CycleCountError(f'{where}: quantity cannot be negative.')
+    return int(number)
+
+
+def clean_counts(mapping: Mapping) -> Counter:
+    """Validate a ``{sku: quantity}`` mapping sent as JSON."""
+    counts = Counter()
+    for sku, value in mapping.items():
+        sku = str(sku).strip()
+        if sku:
+            counts[sku] += _parse_quantity(value, sku)
+    return counts
+
+
+def parse_count_rows(source) -> Counter:
+    """Total counted units per SKU from a scanner dump or CSV.
+
+    Each line is either a bare SKU (one scan of one unit) or ``sku,quantity``;
+    repeated SKUs add up and an optional header row is skipped.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        handle = io.StringIO(source.decode('utf-8-sig'))
+    elif isinstance(source, str):
+        handle = io.StringIO(source)
+    else:
+        handle = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    counts = Counter()
+    for line_number, row in enumerate(csv.reader(handle), start=1):
+        cells = [cell.strip() for cell in row]
+        if not cells or not cells[0]:
+            continue
+        if line_number == 1 and cells[0].lower() in COUNT_HEADERS:
+            continue
+        text = cells[1] if len(cells) > 1 and cells[1] else '1'
+        counts[cells[0]] += _parse_quantity(text, f'Line {line_number}')
+    return counts
+
+
+@transaction.atomic
+def record_counts(session: CountSession, counts: Mapping[str, int], *, replace: bool = False) -> CountUploadResult:
+    """Apply counted quantities by SKU to the session's lines.
+
+    Uploads accumulate so separate zones can be scanned independently; pass
+    ``replace=True`` for a recount that overwrites earlier figures.
+    """
+    session = CountSession.objects.select_for_update().get(pk=session.pk)
+    _ensure_open(session)
+    result = CountUploadResult()
+    skus = list(counts)
+    now = timezone.now()
+    for start in range(0, len(skus), COUNT_BATCH_SIZE):
+        chunk = skus[start:start + COUNT_BATCH_SIZE]
+        lines = {
+            line.product.sku: line
+            for line in CountLine.objects.filter(session=session, product__sku__in=chunk)
+            .select_related('product').only('id', 'counted_quantity', 'product__sku')
+        }
+        changed = []
+        for sku in chunk:
+            line = lines.get(sku)
+            if line is None:
+                result.unknown.append(sku)
+                continue
+            quantity = int(counts[sku])
+            line.counted_quantity = quantity if replace or line.counted_quantity is None else line.counted_quantity + quantity
+            line.counted_at = now
+            changed.append(line)
+            result.units += quantity
+        CountLine.objects.bulk_update(changed, ['counted_quantity', 'counted_at'], batch_size=500)
+        result.matched += len(changed)
+    return result
+
+
+def compute_variances(session: CountSession) -> int:
+    """Set ``variance = counted - expected`` for every counted line in one UPDATE."""
+    return CountLine.objects.filter(session=session, counted_quantity__isnull=False).update(
+        variance=F('counted_quantity') - F('expected_quantity'),
+    )
+
+
+def variance_summary(session: CountSession) -> dict:
+    value = ExpressionWrapper(F('variance') * F('unit_cost'), output_field=DecimalField(max_digits=18, decimal_places=4))
+    lines = CountLine.objects.filter(session=session)
+    return lines.aggregate(
+        lines=Count('id'),
+        counted=Count('id', filter=Q(counted_quantity__isnull=False)),
+        adjusted=Count('id', filter=Q(variance__isnull=False) & ~Q(variance=0)),
+        gain_value=Sum(value, filter=Q(variance__gt=0)),
+        loss_value=Sum(value, filter=Q(variance__lt=0)),
+    )
+
+
+def _post_adjustment_journal(session: CountSession, net_value: Decimal, memo: str, actor=None) -> JournalEntry | None:
+    if not net_value:
+        return None
+    inventory_account = _get_account(getattr(settings, 'STOCK_COUNT_INVENTORY_ACCOUNT', '1300'))
+    adjustment_account = _get_account(getattr(settings, 'STOCK_COUNT_ADJUSTMENT_ACCOUNT', '5000'))
+    entry = JournalEntry.objects.create(
+        date=timezone.now().date(),
+        memo=memo,
+        currency=_base_currency(),
+        fx_rate=Decimal('1.0'),
+        is_posted=True,
+        posted_at=timezone.now(),
+        source='ADJUSTMENT',
+        source_id=session.id,
+        created_by=actor,
+    )
+    amount = abs(net_value)
+    debit, credit = (inventory_account, adjustment_account) if net_value > 0 else (adjustment_account, inventory_account)
+    JournalLine.objects.bulk_create([
+        JournalLine(entry=entry, account=debit, description=memo, debit=amount, debit_base=amount),
+        JournalLine(entry=entry, account=credit, description=memo, credit=amount, credit_base=amount),
+    ])
+    entry.clean()
+    return entry
+
+
+@transaction.atomic
+def post_count_session(session: CountSession, *, user=None, zero_uncounted: bool = False) -> CountSession:
+    """Post every variance of an open session as stock movements and one journal entry.
+
+    Variances are applied as deltas, so sales or receipts recorded while the
+    count was running are kept. Uncounted lines are skipped unless
+    ``zero_uncounted`` treats them as counted at zero.
+    """
+    session = CountSession.objects.select_for_update().get(pk=session.pk)
+    _ensure_open(session)
+    lines = CountLine.objects.filter(session=session)
+    if zero_uncounted:
+        lines.filter(counted_quantity__isnull=True).update(counted_quantity=0, counted_at=timezone.now())
+    compute_variances(session)
+    adjusted = lines.filter(variance__isnull=False).exclude(variance=0)
+
+    note = f'Cycle count #{session.pk}: {session.name}'[:255]
+    batch = []
+    deltas = {}
+    for product_id, variance in adjusted.order_by('product_id').values_list('product_id', 'variance').iterator(chunk_size=COUNT_BATCH_SIZE):
+        deltas[product_id] = (variance, 0)
+        batch.append(StockMovement(
+            product_id=product_id,
+            movement_type=StockMovement.IN if variance > 0 else StockMovement.OUT,
+            quantity=abs(variance),
+            note=note,
+            user=user,
+        ))
+        if len(batch) >= COUNT_BATCH_SIZE:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        StockMovement.objects.bulk_create(batch)
+
+    variance = CountLine.objects.filter(session=session, product=OuterRef('pk')).values('variance')[:1]
+    Product.objects.filter(pk__in=adjusted.values('product_id')).update(
+        quantity=F('quantity') + Subquery(variance),
+        updated_at=timezone.now(),
+    )
+    apply_stock_deltas(deltas)
+
+    summary = variance_summary(session)
+    gains = summary['gain_value'] or Decimal('0')
+    losses = summary['loss_value'] or Decimal('0')
+    net_value = (gains + losses).quantize(Decimal('0.01'))
+    entry = _post_adjustment_journal(
+        session,
+        net_value,
+        f'Cycle count #{session.pk} {session.name}: gains {gains:.2f}, losses {abs(losses):.2f}'[:255],
+        actor=user,
+    )
+
+    session.status = CountSession.STATUS_POSTED
+    session.lines_adjusted = summary['adjusted']
+    session.adjustment_value = net_value
+    session.journal_entry_id = entry.id if entry else None
+    session.posted_by = user
+    session.posted_at = timezone.now()
+    session.save(update_fields=['status', 'lines_adjusted', 'adjustment_value', 'journal_entry_id', 'posted_by', 'posted_at'])
+    if summary['adjusted']:
+        invalidate_combo_availability()
+    return session
+
+
+def cancel_count_session(session: CountSession) -> CountSession:
+    _ensure_open(session)
+    session.status = CountSession.STATUS_CANCELLED
+    session.save(update_fields=['status'])
+    return session
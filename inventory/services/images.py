@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from inventory.models import Product
+
+
+logger = logging.getLogger(__name__)
+
+RENDITION_FORMATS = {
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def rendition_widths() -> tuple[int, ...]:
+    return tuple(sorted(getattr(settings, 'PRODUCT_IMAGE_RENDITION_WIDTHS', (160, 320, 480, 640, 960, 1280))))
+
+
+def rendition_name(source_name: str, width: int, fmt: str) -> str:
+    """Storage name for a rendition, kept in the same folder as the original upload."""
+    folder, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(folder, f'{stem}-{width}w{RENDITION_FORMATS[fmt][1]}')
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    pil_format, _, options = RENDITION_FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_renditions(product: Product) -> dict:
+    """Write WebP and JPEG renditions for ``product.image`` and return the manifest stored on the product."""
+    storage = product.image.storage
+    source = product.image.name
+    with storage.open(source, 'rb') as handle:
+        original = Image.open(handle)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() or original.mode == 'P' else 'RGB')
+
+    widths = [width for width in rendition_widths() if width < original.width] or [original.width]
+    manifest = {}
+    for width in widths:
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        formats = {}
+        for fmt in RENDITION_FORMATS:
+            name = rendition_name(source, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            formats[fmt] = storage.save(name, ContentFile(_encode(resized, fmt)))
+        manifest[str(width)] = formats
+    return {'source': source, 'widths': manifest}
+
+
+def delete_renditions(renditions: dict, storage) -> None:
+    for formats in (renditions or {}).get('widths', {}).values():
+        for name in formats.values():
+            storage.delete(name)
+
+
+def generate_product_renditions(product_id: int) -> dict | None:
+    """Build renditions for one product and record them unless the image changed meanwhile."""
+    product = Product.objects.filter(pk=product_id).only('id', 'sku', 'image', 'image_renditions').first()
+    if product is None or not product.image:
+        return None
+    try:
+        manifest = build_renditions(product)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Could not build renditions for product %s', product_id)
+        # Record the attempt so later saves do not requeue an unreadable upload.
+        manifest = {'source': product.image.name, 'widths': {}}
+    updated = Product.objects.filter(pk=product_id, image=manifest['source']).update(image_renditions=manifest)
+    if not updated:
+        delete_renditions(manifest, product.image.storage)
+        return None
+    return manifest
+
+
+def sync_product_renditions(product: Product) -> None:
+    """Drop renditions of a replaced or removed image and queue new ones for the current upload."""
+    renditions = product.image_renditions or {}
+    current = product.image.name if product.image else ''
+    if renditions.get('source') == current:
+        return
+    if renditions:
+        delete_renditions(renditions, product.image.storage)
+        Product.objects.filter(pk=product.pk).update(image_renditions={})
+        product.image_renditions = {}
+    if current:
+        schedule_product_renditions(product)
+
+
+def _run_in_worker(product_id: int) -> None:
+    try:
+        generate_product_renditions(product_id)
+    except Exception:
+        logger.exception('Image renditions failed for product %s', product_id)
+    finally:
+        connection.close()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 2),
+                thread_name_prefix='image-renditions',
+            )
+    return _executor
+
+
+def schedule_renditions(product_ids) -> None:
+    """Queue rendition generation for ``product_ids`` once the surrounding transaction commits."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    if getattr(settings, 'IMAGE_RENDITIONS_ASYNC', True):
+        def submit():
+            executor = _get_executor()
+            for product_id in product_ids:
+                executor.submit(_run_in_worker, product_id)
+        transaction.on_commit(submit)
+    else:
+        transaction.on_commit(lambda: [generate_product_renditions(product_id) for product_id in product_ids])
+
+
+def schedule_product_renditions(product: Product) -> None:
+    schedule_renditions([product.pk])
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from openpyxl import load_workbook
+
+from inventory.models import Category, Combo, Product, Supplier, allocate_unique_slugs, product_image_path
+from inventory.services.images import delete_renditions, schedule_renditions
+
+
+IMPORT_CHUNK_SIZE = 500
+# Sent inside each chunk's transaction with the ``product_ids`` upserted, since the upsert sends no save signals.
+products_imported = Signal()
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+HEADER_ALIASES = {
+    'active': 'is_active',
+    'product_name': 'name',
+    'unit_price': 'price',
+    'tax': 'tax_rate',
+    'reorder': 'reorder_level',
+    'tracking': 'tracking_mode',
+    'image_file': 'image',
+    'picture': 'image',
+}
+TEXT_LIMITS = {
+    'sku': Product._meta.get_field('sku').max_length,
+    'name': Product._meta.get_field('name').max_length,
+    'currency': Product._meta.get_field('currency').max_length,
+    'category': Category._meta.get_field('name').max_length,
+    'supplier': Supplier._meta.get_field('name').max_length,
+}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+MODEL_COLUMNS = ('name', 'description', 'price', 'currency', 'tax_rate', 'reorder_level', 'is_active', 'track_inventory', 'tracking_mode')
+
+
+class ProductImportError(ValidationError):
+    """Raised when an import file cannot be read at all."""
+
+
+@dataclass
+class ImportRowError:
+    row: int
+    sku: str
+    message: str
+
+    def as_dict(self) -> dict:
+        return {'row': self.row, 'sku': self.sku, 'message': self.message}
+
+
+@dataclass
+class ProductImportResult:
+    created: int = 0
+    updated: int = 0
+    images: int = 0
+    dry_run: bool = False
+    errors: list[ImportRowError] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'images': self.images,
+            'dry_run': self.dry_run,
+            'errors': [error.as_dict() for error in self.errors],
+        }
+
+
+def _normalise_header(value) -> str:
+    key = str(value or '').strip().lower().replace(' ', '_').replace('-', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _read_csv(handle) -> Iterator[dict]:
+    reader = csv.reader(handle)
+    header = next(reader, None)
+    if header is None:
+        return
+    keys = [_normalise_header(cell) for cell in header]
+    for row in reader:
+        yield {key: _cell_text(value) for key, value in zip(keys, row) if key}
+
+
+def _read_xlsx(source) -> Iterator[dict]:
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keys = [_normalise_header(cell) for cell in header]
+        for row in rows:
+            yield {key: _cell_text(value) for key, value in zip(keys, row) if key}
+    finally:
+        workbook.close()
+
+
+def read_product_rows(source, filename: str | None = None) -> Iterator[dict]:
+    """Stream rows from a CSV or XLSX path or uploaded file as dicts keyed by normalised header."""
+    name = (filename or getattr(source, 'name', None) or str(source)).lower()
+    if name.endswith(('.xlsx', '.xlsm')):
+        yield from _read_xlsx(source)
+        return
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline='', encoding='utf-8-sig') as handle:
+            yield from _read_csv(handle)
+        return
+    yield from _read_csv(io.TextIOWrapper(source, encoding='utf-8-sig', newline=''))
+
+
+def _parse_decimal(value: str, column: str) -> Decimal:
+    try:
+        number = Decimal(value.replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f'{column} must be a number.')
+    if number < 0:
+        raise ValueError(f'{column} cannot be negative.')
+    return number
+
+
+def _parse_bool(value: str, column: str) -> bool:
+    lowered = value.lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValueError(f'{column} must be yes or no.')
+
+
+def _parse_tracking(value: str) -> str:
+    lowered = value.lower()
+    if lowered.startswith('serial'):
+        return Product.TRACK_SERIAL
+    if lowered.startswith('quant'):
+        return Product.TRACK_QUANTITY
+    raise ValueError('tracking_mode must be SERIAL or QUANTITY.')
+
+
+def _clean_row(raw: dict) -> dict:
+    """Parse the non-blank cells of one row; blank cells are left out so updates keep current values."""
+    values = {}
+    for column, text in raw.items():
+        if not text:
+            continue
+        limit = TEXT_LIMITS.get(column)
+        if limit and len(text) > limit:
+            raise ValueError(f'{column} is longer than {limit} characters.')
+        if column in ('price', 'tax_rate'):
+            values[column] = _parse_decimal(text, column)
+        elif column == 'reorder_level':
+            try:
+                values[column] = int(text)
+            except ValueError:
+                raise ValueError('reorder_level must be a whole number.')
+        elif column in ('is_active', 'track_inventory'):
+            values[column] = _parse_bool(text, column)
+        elif column == 'tracking_mode':
+            values[column] = _parse_tracking(text)
+        elif column == 'currency':
+            values[column] = text.upper()
+        elif column in ('sku', 'name', 'description', 'category', 'supplier', 'image'):
+            values[column] = text
+    return values
+
+
+def _index_images(image_dir: str | None) -> dict:
+    if not image_dir:
+        return {}
+    index = {}
+    for entry in os.scandir(image_dir):
+        stem, ext = os.path.splitext(entry.name)
+        if entry.is_file() and ext.lower() in IMAGE_EXTENSIONS:
+            index.setdefault(entry.name.lower(), entry.path)
+            index.setdefault(stem.lower(), entry.path)
+    return index
+
+
+def _resolve_lookups(rows: list[dict], dry_run: bool) -> tuple[dict, dict]:
+    """Map category and supplier names in a chunk to ids, creating the missing ones in bulk."""
+    category_names = {row['category'] for row in rows if 'category' in row}
+    supplier_names = {row['supplier'] for row in rows if 'supplier' in row}
+    categories = {}
+    if category_names:
+        for category in Category.objects.filter(Q(name__in=category_names) | Q(slug__in=category_names)):
+            categories[category.name] = category.pk
+            categories.setdefault(category.slug, category.pk)
+        missing = sorted(category_names - set(categories))
+        if missing and not dry_run:
+            slugs = allocate_unique_slugs(Category, missing, max_length=120)
+            for category in Category.objects.bulk_create([Category(name=n, slug=s) for n, s in zip(missing, slugs)]):
+                categories[category.name] = category.pk
+    suppliers = {}
+    if supplier_names:
+        for supplier_id, name in Supplier.objects.filter(name__in=supplier_names).order_by('-id').values_list('id', 'name'):
+            suppliers[name] = supplier_id
+        missing = sorted(supplier_names - set(suppliers))
+        if missing and not dry_run:
+            for supplier in Supplier.objects.bulk_create([Supplier(name=name) for name in missing]):
+                suppliers[supplier.name] = supplier.pk
+    return categories, suppliers
+
+
+def _store_image(product: Product, path: str) -> str:
+    storage = product.image.storage
+    with open(path, 'rb') as handle:
+        return storage.save(product_image_path(product, os.path.basename(path)), File(handle))
+
+
+def _import_chunk(chunk: list[tuple[int, dict]], columns: set, result: ProductImportResult, seen: set, image_index: dict):
+    valid = []
+    for row_number, raw in chunk:
+        sku = raw.get('sku', '')
+        try:
+            values = _clean_row(raw)
+            if not values.get('sku'):
+                raise ValueError('sku is required.')
+            if values['sku'] in seen:
+                raise ValueError('sku appears more than once in this file.')
+        except ValueError as exc:
+            result.errors.append(ImportRowError(row_number, sku, str(exc)))
+            continue
+        seen.add(values['sku'])
+        valid.append((row_number, values))
+    if not valid:
+        return
+
+    model_columns = [column for column in MODEL_COLUMNS if column in columns]
+    existing = {
+        product.sku: product
+        for product in Product.objects.filter(sku__in=[values['sku'] for _, values in valid])
+        .only('id', 'sku', 'slug', 'image', 'image_renditions', 'category_id', 'supplier_id', *model_columns)
+    }
+    categories, suppliers = _resolve_lookups([values for _, values in valid], result.dry_run)
+
+    products = []
+    new_products = []
+    replaced_renditions = []
+    image_skus = []
+    for row_number, values in valid:
+        current = existing.get(values['sku'])
+        if current is None and not values.get('name'):
+            result.errors.append(ImportRowError(row_number, values['sku'], 'name is required for new products.'))
+            continue
+        product = Product(sku=values['sku'])
+        if current is not None:
+            product.slug = current.slug
+            product.category_id = current.category_id
+            product.supplier_id = current.supplier_id
+            product.image = current.image.name or None
+            product.image_renditions = current.image_renditions
+            for column in model_columns:
+                setattr(product, column, getattr(current, column))
+        for column in model_columns:
+            if column in values:
+                setattr(product, column, values[column])
+        if 'category' in values:
+            product.category_id = categories.get(values['category'])
+        if 'supplier' in values:
+            product.supplier_id = suppliers.get(values['supplier'])
+        image_path = image_index.get((values.get('image') or values['sku']).lower()) if image_index else None
+        if image_path:
+            image_skus.append(values['sku'])
+            if not result.dry_run:
+                if current is not None and current.image_renditions:
+                    replaced_renditions.append(current.image_renditions)
+                product.image = _store_image(product, image_path)
+                product.image_renditions = {}
+        products.append(product)
+        if current is None:
+            new_products.append(product)
+
+    if new_products:
+        slugs = allocate_unique_slugs(Product, [product.slug_identifier() for product in new_products])
+        for product, slug in zip(new_products, slugs):
+            product.slug = slug
+    result.created += len(new_products)
+    result.updated += len(products) - len(new_products)
+    result.images += len(image_skus)
+    if result.dry_run or not products:
+        return
+
+    update_fields = list(model_columns) + ['updated_at']
+    if 'category' in columns:
+        update_fields.append('category')
+    if 'supplier' in columns:
+        update_fields.append('supplier')
+    if image_index:
+        update_fields += ['image', 'image_renditions']
+    upserted = Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=['sku'],
+        update_fields=update_fields,
+        batch_size=IMPORT_CHUNK_SIZE,
+    )
+    if 'price' in model_columns and existing:
+        Combo.objects.filter(items__product__sku__in=list(existing)).refresh_prices()
+    products_imported.send(sender=Product, product_ids=[product.pk for product in upserted])
+    if image_skus:
+        storage = Product._meta.get_field('image').storage
+        for renditions in replaced_renditions:
+            transaction.on_commit(lambda renditions=renditions: delete_renditions(renditions, storage))
+        schedule_renditions(Product.objects.filter(sku__in=image_skus).values_list('pk', flat=True))
+
+
+def import_products(
+    rows: Iterable[dict],
+    *,
+    image_dir: str | None = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> ProductImportResult:
+    """Validate and upsert product rows by SKU in chunks, one transaction per chunk.
+
+    Rows with errors are reported and skipped; blank cells leave the current
+    value of an existing product untouched.
+    """
+    result = ProductImportResult(dry_run=dry_run)
+    image_index = _index_images(image_dir)
+    seen = set()
+    numbered = enumerate(rows, start=2)
+    columns = None
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        if columns is None:
+            columns = set().union(*(row.keys() for _, row in chunk))
+            if 'sku' not in columns:
+                raise ProductImportError('The import file needs a sku column.')
+        with transaction.atomic():
+            _import_chunk(chunk, columns, result, seen, image_index)
+    return result
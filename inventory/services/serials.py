@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import csv
+import io
+import re
+from dataclasses import dataclass
+from typing import Iterable, Mapping
+
+from django.core.exceptions import ValidationError
+from django.dispatch import Signal
+
+from inventory.models import ProductUnit
+
+
+SERIAL_MAX_LENGTH = ProductUnit._meta.get_field('serial_number').max_length
+SERIAL_BATCH_SIZE = 1000
+SERIAL_COLUMN_NAMES = {'serial', 'serial_number', 'serial number', 'serial_no', 'sn', 'imei'}
+
+# Sent with the ``units`` created by ``bulk_create_units``, since bulk creation sends no save signals.
+units_created = Signal()
+
+_SEPARATORS = re.compile(r'[\r\n,;\t]+')
+_NON_PRINTABLE = re.compile(r'[\x00-\x1f\x7f]')
+
+
+@dataclass
+class SerialConflict:
+    serial: str
+    reason: str
+    item_id: int | None = None
+
+    REASON_BLANK = 'blank'
+    REASON_TOO_LONG = 'too_long'
+    REASON_DUPLICATE = 'duplicate'
+    REASON_EXISTS = 'exists'
+
+    @property
+    def message(self) -> str:
+        if self.reason == self.REASON_BLANK:
+            return 'Serial numbers cannot be blank.'
+        if self.reason == self.REASON_TOO_LONG:
+            return f'Serial {self.serial} is longer than {SERIAL_MAX_LENGTH} characters.'
+        if self.reason == self.REASON_DUPLICATE:
+            return f'Serial {self.serial} appears more than once in this receipt.'
+        return f'Serial {self.serial} is already recorded.'
+
+    def as_dict(self) -> dict:
+        return {'serial': self.serial, 'reason': self.reason, 'item_id': self.item_id, 'message': self.message}
+
+
+class SerialConflictError(ValidationError):
+    """Raised with every conflict found in a serial batch, not just the first."""
+
+    def __init__(self, conflicts: list[SerialConflict]):
+        self.conflicts = conflicts
+        super().__init__([conflict.message for conflict in conflicts])
+
+
+def normalise_serial(value) -> str:
+    """Strip whitespace, quotes and scanner control characters from a serial."""
+    text = _NON_PRINTABLE.sub('', str(value or ''))
+    return text.strip().strip('"\'').strip()
+
+
+def parse_serials(raw) -> list[str]:
+    """Split scanner output (newline, comma, semicolon or tab separated) or a list into serials."""
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        values = _SEPARATORS.split(raw)
+    else:
+        values = raw
+    serials = [normalise_serial(value) for value in values]
+    return [serial for serial in serials if serial]
+
+
+def parse_serial_upload(upload) -> list[str]:
+    """Read serials from an uploaded CSV, using a serial column when a header is present."""
+    content = upload.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig', errors='replace')
+    rows = [row for row in csv.reader(io.StringIO(content)) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    column = 0
+    header = [cell.strip().lower() for cell in rows[0]]
+    for idx, name in enumerate(header):
+        if name in SERIAL_COLUMN_NAMES:
+            column = idx
+            rows = rows[1:]
+            break
+    return parse_serials(row[column] for row in rows if len(row) > column)
+
+
+def find_serial_conflicts(assignments: Mapping[int | None, Iterable[str]]) -> list[SerialConflict]:
+    """Check serials grouped by item for blanks, batch duplicates and existing units in one query."""
+    conflicts = []
+    first_seen = {}
+    reported = set()
+    for item_id, serials in assignments.items():
+        for serial in serials:
+            if not serial:
+                conflicts.append(SerialConflict('', SerialConflict.REASON_BLANK, item_id))
+            elif len(serial) > SERIAL_MAX_LENGTH:
+                conflicts.append(SerialConflict(serial, SerialConflict.REASON_TOO_LONG, item_id))
+            elif serial in first_seen:
+                if serial not in reported:
+                    conflicts.append(SerialConflict(serial, SerialConflict.REASON_DUPLICATE, item_id))
+                    reported.add(serial)
+            else:
+                first_seen[serial] = item_id
+    if first_seen:
+        existing = ProductUnit.objects.filter(serial_number__in=list(first_seen)).values_list('serial_number', flat=True)
+        for serial in sorted(existing):
+            conflicts.append(SerialConflict(serial, SerialConflict.REASON_EXISTS, first_seen[serial]))
+    return conflicts
+
+
+def validate_serial_batch(assignments: Mapping[int | None, Iterable[str]]) -> None:
+    conflicts = find_serial_conflicts(assignments)
+    if conflicts:
+        raise SerialConflictError(conflicts)
+
+
+def bulk_create_units(units: list[ProductUnit]) -> list[ProductUnit]:
+    created = ProductUnit.objects.bulk_create(units, batch_size=SERIAL_BATCH_SIZE)
+    units_created.send(sender=ProductUnit, units=created)
+    return created
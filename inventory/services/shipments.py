@@ -1,22 +1,37 @@
 from __future__ import annotations
 
-from decimal import Decimal
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import ROUND_DOWN, Decimal
 from typing import Iterable, Mapping
 
+from django.apps import apps as global_apps
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import transaction
-from django.db.models import Sum
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from accounting.models import Account, Currency, JournalEntry, JournalLine
 from inventory.models import (
+    Product,
     Shipment,
+    ShipmentCost,
     ShipmentItem,
     ProductUnit,
+    ProductUnitEvent,
     ShipmentEventLog,
     StockMovement,
+    SupplierScorecard,
 )
+from inventory.services.combos import invalidate_combo_availability
+from inventory.services.serials import bulk_create_units, parse_serials, validate_serial_batch
+from inventory.services.stock_balances import sync_ledger_from
+
+
+RECEIPT_BATCH_SIZE = 1000
+ALLOCATION_QUANTUM = Decimal('0.0001')
 
 
 class ShipmentServiceError(ValidationError):
@@ -32,14 +47,87 @@ def _get_account(code: str) -> Account:
     return Account.objects.get(code=code)
 
 
-def allocate_landed_costs(shipment: Shipment, *, basis: str | None = None) -> Decimal:
-    """Distribute pooled costs across shipment items and persist landed unit costs."""
+@dataclass
+class LandedCostShare:
+    item: ShipmentItem
+    weight: Decimal
+    share: Decimal
+    landed_total_cost: Decimal
+    landed_unit_cost: Decimal
+
+
+def _basis_weight(item: ShipmentItem, basis: str) -> Decimal:
+    qty = Decimal(str(item.quantity_received or item.quantity_expected or 0))
+    if basis == Shipment.COST_BASIS_QUANTITY:
+        return qty
+    return qty * Decimal(str(item.unit_purchase_price))
+
+
+def _largest_remainder_shares(cost_pool: Decimal, weights: list[Decimal]) -> list[Decimal]:
+    """Split ``cost_pool`` by weight so the quantised shares sum back to it exactly."""
+    denominator = sum(weights)
+    raw = [cost_pool * weight / denominator for weight in weights]
+    shares = [value.quantize(ALLOCATION_QUANTUM, rounding=ROUND_DOWN) for value in raw]
+    leftover = int((cost_pool - sum(shares)) / ALLOCATION_QUANTUM)
+    by_remainder = sorted(range(len(raw)), key=lambda idx: raw[idx] - shares[idx], reverse=True)
+    for idx in by_remainder[:leftover]:
+        shares[idx] += ALLOCATION_QUANTUM
+    return shares
+
+
+def plan_landed_cost_allocation(shipment: Shipment, *, basis: str | None = None, cost_pool: Decimal | None = None) -> list[LandedCostShare]:
+    """Compute every item's landed cost share in one pass without writing anything."""
     basis = basis or shipment.allocation_basis
     items = list(shipment.items.select_related('product'))
     if not items:
         raise ShipmentServiceError("Shipment has no items to allocate costs against.")
+    if cost_pool is None:
+        cost_pool = shipment.total_cost_base
+    cost_pool = Decimal(str(cost_pool))
+    weights = [_basis_weight(item, basis) for item in items]
+    if cost_pool <= 0:
+        shares = [Decimal('0.0000')] * len(items)
+    elif sum(weights) <= 0:
+        raise ShipmentServiceError("Unable to allocate costs because basis denominator is zero.")
+    else:
+        shares = _largest_remainder_shares(cost_pool, weights)
+    plan = []
+    for item, weight, share in zip(items, weights, shares):
+        item.set_landed_cost(share)
+        plan.append(LandedCostShare(
+            item=item,
+            weight=weight,
+            share=share,
+            landed_total_cost=item.landed_total_cost,
+            landed_unit_cost=item.landed_unit_cost,
+        ))
+    return plan
+
+
+def _score_allocation(shipment: Shipment, cost_pool: Decimal, item_value: Decimal) -> None:
+    """Move the supplier scorecard by the difference this allocation makes; call before marking costs allocated."""
+    if shipment.landed_cost_allocated_at is None:
+        SupplierScorecard.apply(
+            shipment.supplier_id,
+            allocated_shipments=1,
+            allocated_item_value=item_value,
+            allocated_landed_cost=cost_pool,
+        )
+        return
+    previous = shipment.costs.filter(allocated=True).aggregate(total=Sum('amount_base'))['total'] or Decimal('0')
+    if cost_pool != previous:
+        SupplierScorecard.apply(shipment.supplier_id, allocated_landed_cost=cost_pool - previous)
+
+
+def allocate_landed_costs(shipment: Shipment, *, basis: str | None = None) -> Decimal:
+    """Distribute pooled costs across shipment items and persist landed unit costs."""
+    basis = basis or shipment.allocation_basis
     cost_pool = shipment.total_cost_base
     if cost_pool <= 0:
+        items = list(shipment.items.all())
+        if not items:
+            raise ShipmentServiceError("Shipment has no items to allocate costs against.")
+        _score_allocation(shipment, cost_pool, sum((item.expected_value for item in items), Decimal('0')))
         shipment.costs.filter(allocated=False).update(allocated=True)
         shipment.landed_cost_allocated_at = timezone.now()
         shipment.save(update_fields=['landed_cost_allocated_at', 'updated_at'])
@@ -50,23 +138,22 @@ def allocate_landed_costs(shipment: Shipment, *, basis: str | None = None) -> De
         )
         return Decimal('0.00')
 
-    def _basis_value(item: ShipmentItem) -> Decimal:
-        qty = Decimal(str(item.quantity_received or item.quantity_expected or 0))
-        if basis == Shipment.COST_BASIS_QUANTITY:
-            return qty
-        unit_price = Decimal(str(item.unit_purchase_price))
-        return qty * unit_price
-
-    denominator = sum(_basis_value(item) for item in items)
-    if denominator <= 0:
-        raise ShipmentServiceError("Unable to allocate costs because basis denominator is zero.")
-
-    for item in items:
-        weight = _basis_value(item)
-        share = (cost_pool * weight / denominator) if weight else Decimal('0.00')
-        share = share.quantize(Decimal('0.0001'))
-        item.apply_landed_cost(share)
+    plan = plan_landed_cost_allocation(shipment, basis=basis, cost_pool=cost_pool)
+    ShipmentItem.objects.bulk_update(
+        [row.item for row in plan],
+        ['landed_total_cost', 'landed_unit_cost'],
+        batch_size=RECEIPT_BATCH_SIZE,
+    )
+    serial_item_ids = [row.item.pk for row in plan if row.item.requires_serials]
+    if serial_item_ids:
+        item_costs = ShipmentItem.objects.filter(pk=OuterRef('shipment_item_id'))
+        ProductUnit.objects.filter(shipment_item_id__in=serial_item_ids).update(
+            landed_cost=Subquery(item_costs.values('landed_unit_cost')[:1]),
+            purchase_price=Subquery(item_costs.values('unit_purchase_price')[:1]),
+            updated_at=timezone.now(),
+        )
 
+    _score_allocation(shipment, cost_pool, sum((row.item.expected_value for row in plan), Decimal('0')))
     shipment.costs.filter(allocated=False).update(allocated=True)
     shipment.landed_cost_allocated_at = timezone.now()
     shipment.save(update_fields=['landed_cost_allocated_at', 'updated_at'])
@@ -78,18 +165,9 @@ def allocate_landed_costs(shipment: Shipment, *, basis: str | None = None) -> De
     return cost_pool
 
 
-@transaction.atomic
-def receive_shipment(*, shipment_id: int, receipts: Iterable[Mapping], received_by, basis: str | None = None, note: str = '') -> Shipment:
-    """Finalize a shipment receipt, enforcing serial capture, landed costs, stock posting, and accounting."""
-    shipment = Shipment.objects.select_for_update().get(pk=shipment_id)
-    shipment.require_status({Shipment.STATUS_ARRIVED, Shipment.STATUS_CLEARED})
-    item_qs = ShipmentItem.objects.select_for_update().filter(shipment=shipment).select_related('product')
-    items_by_id = {item.id: item for item in item_qs}
-    if not receipts:
-        raise ShipmentServiceError('No receipt details supplied.')
-
-    recorded = []
-    now = timezone.now()
+def _clean_receipts(items_by_id: dict, receipts: Iterable[Mapping], shipment: Shipment) -> list[dict]:
+    """Validate receipt payloads against locked items without touching the database."""
+    rows = []
     for payload in receipts:
         item_id = payload.get('item_id')
         if item_id not in items_by_id:
@@ -98,52 +176,105 @@ def receive_shipment(*, shipment_id: int, receipts: Iterable[Mapping], received_
         quantity = int(payload.get('quantity') or 0)
         if quantity <= 0:
             raise ShipmentServiceError('Receipt quantity must be positive.')
-        serials = payload.get('serials') or []
+        serials = parse_serials(payload.get('serials')) if item.requires_serials else []
         if item.requires_serials and len(serials) != quantity:
             raise ShipmentServiceError(f'{item.product} requires serial numbers for every unit received.')
-        if item.quantity_received + quantity > item.quantity_expected:
+        rows.append({'item': item, 'quantity': quantity, 'serials': serials})
+    return rows
+
+
+@transaction.atomic
+def receive_shipment(*, shipment_id: int, receipts: Iterable[Mapping], received_by, basis: str | None = None, note: str = '') -> Shipment:
+    """Finalize a shipment receipt, enforcing serial capture, landed costs, stock posting, and accounting.
+
+    Items, units and stock movements are written in bulk and product stock is
+    updated once per product, so the query count does not grow with the number
+    of serials received.
+    """
+    shipment = Shipment.objects.select_for_update().get(pk=shipment_id)
+    shipment.require_status({Shipment.STATUS_ARRIVED, Shipment.STATUS_CLEARED})
+    item_qs = ShipmentItem.objects.select_for_update().filter(shipment=shipment).select_related('product')
+    items_by_id = {item.id: item for item in item_qs}
+    if not receipts:
+        raise ShipmentServiceError('No receipt details supplied.')
+
+    recorded = _clean_receipts(items_by_id, receipts, shipment)
+    serials_by_item = defaultdict(list)
+    for row in recorded:
+        serials_by_item[row['item'].pk].extend(row['serials'])
+    validate_serial_batch(serials_by_item)
+
+    now = timezone.now()
+    for row in recorded:
+        item = row['item']
+        if item.quantity_received + row['quantity'] > item.quantity_expected:
             raise ShipmentServiceError('Quantity received cannot exceed quantity expected.')
-        item.quantity_received += quantity
+        item.quantity_received += row['quantity']
         item.last_received_at = now
-        item.full_clean()
-        item.save(update_fields=['quantity_received', 'last_received_at'])
-        recorded.append({'item': item, 'quantity': quantity, 'serials': serials})
+    ShipmentItem.objects.bulk_update(
+        {row['item'].pk: row['item'] for row in recorded}.values(),
+        ['quantity_received', 'last_received_at'],
+        batch_size=RECEIPT_BATCH_SIZE,
+    )
 
-    shipment.refresh_from_db()
-    if not shipment.is_fully_received:
+    items = list(items_by_id.values())
+    if not items or any(item.quantity_received < item.quantity_expected for item in items):
         raise ShipmentServiceError('All shipment items must be fully received before marking as received.')
 
     allocate_landed_costs(shipment, basis=basis)
+    landed_costs = dict(
+        ShipmentItem.objects.filter(shipment=shipment).values_list('id', 'landed_unit_cost')
+    )
 
+    product_ids = sorted({row['item'].product_id for row in recorded})
+    products = {
+        product.pk: product
+        for product in Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+    }
+    movements = []
+    units = []
     for row in recorded:
-        item = ShipmentItem.objects.get(pk=row['item'].pk)
-        unit_cost = item.landed_unit_cost or item.unit_purchase_price
-        StockMovement.objects.create(
-            product=item.product,
+        item = row['item']
+        unit_cost = landed_costs.get(item.pk) or item.unit_purchase_price
+        products[item.product_id].apply_movement(StockMovement.IN, row['quantity'], unit_cost)
+        movements.append(StockMovement(
+            product_id=item.product_id,
             movement_type=StockMovement.IN,
             quantity=row['quantity'],
             unit_cost=unit_cost,
             note=f'Shipment {shipment.shipment_code}',
             user=received_by,
+        ))
+        for serial in row['serials']:
+            units.append(ProductUnit(
+                serial_number=serial,
+                product_id=item.product_id,
+                shipment=shipment,
+                shipment_item=item,
+                purchase_price=item.unit_purchase_price,
+                landed_cost=unit_cost,
+                status=ProductUnit.STATUS_AVAILABLE,
+                created_by=received_by,
+            ))
+
+    StockMovement.objects.bulk_create(movements, batch_size=RECEIPT_BATCH_SIZE)
+    for product in products.values():
+        product.updated_at = now
+    Product.objects.bulk_update(products.values(), ['quantity', 'avg_cost', 'updated_at'])
+    sync_ledger_from(products.values())
+    invalidate_combo_availability()
+    if units:
+        try:
+            created_units = bulk_create_units(units)
+        except IntegrityError as exc:
+            raise ShipmentServiceError('One or more serial numbers were recorded concurrently; please retry.') from exc
+        ProductUnitEvent.record(
+            created_units,
+            ProductUnitEvent.EVENT_RECEIVED,
+            note=f'Shipment {shipment.shipment_code}',
+            actor=received_by,
+            at=now,
         )
-        if item.requires_serials:
-            cleaned = []
-            for serial in row['serials']:
-                value = (serial or '').strip()
-                if not value:
-                    raise ShipmentServiceError('Serial numbers cannot be blank.')
-                cleaned.append(value)
-            for serial in cleaned:
-                ProductUnit.objects.create(
-                    serial_number=serial,
-                    product=item.product,
-                    shipment=shipment,
-                    shipment_item=item,
-                    purchase_price=item.unit_purchase_price,
-                    landed_cost=unit_cost,
-                    status=ProductUnit.STATUS_AVAILABLE,
-                    created_by=received_by,
-                )
 
     ShipmentEventLog.objects.create(
         shipment=shipment,
@@ -196,18 +327,38 @@ def _post_inventory_receipt_journal(shipment: Shipment, actor=None) -> JournalEn
     return entry
 
 
-def shipment_cost_summary(shipment_id: int) -> dict:
-    shipment = Shipment.objects.get(pk=shipment_id)
-    breakdown = list(
-        shipment.costs.values('cost_type').annotate(total=Sum('amount_base')).order_by('cost_type')
-    )
+def with_cost_breakdown(queryset):
+    """Annotate shipments with their base-currency cost total and a column per cost type."""
+    money = models.DecimalField(max_digits=14, decimal_places=2)
+    annotations = {
+        f'cost_{code.lower()}': Coalesce(
+            Sum('costs__amount_base', filter=Q(costs__cost_type=code)), Decimal('0.00'), output_field=money,
+        )
+        for code, _ in ShipmentCost.TYPE_CHOICES
+    }
+    annotations['cost_total'] = Coalesce(Sum('costs__amount_base'), Decimal('0.00'), output_field=money)
+    return queryset.annotate(**annotations)
+
+
+def cost_summary_for(shipment: Shipment) -> dict:
+    """Build the cost summary dict from a shipment annotated by ``with_cost_breakdown``."""
+    breakdown = []
+    for code, _ in ShipmentCost.TYPE_CHOICES:
+        total = getattr(shipment, f'cost_{code.lower()}')
+        if total:
+            breakdown.append({'cost_type': code, 'total': total})
     return {
         'shipment': shipment,
-        'total_cost_base': shipment.total_cost_base,
+        'total_cost_base': shipment.cost_total,
         'breakdown': breakdown,
     }
 
 
+def shipment_cost_summary(shipment_id: int) -> dict:
+    shipment = with_cost_breakdown(Shipment.objects.filter(pk=shipment_id)).get()
+    return cost_summary_for(shipment)
+
+
 def landed_cost_per_product(product_id: int):
     return (
         ShipmentItem.objects.filter(product_id=product_id)
@@ -230,22 +381,162 @@ def profit_per_serial(serial_number: str) -> dict:
     }
 
 
+TRACE_RELATED = (
+    'unit__product',
+    'unit__shipment__supplier',
+    'unit__shipment_item',
+    'unit__sale_line__invoice__customer',
+    'sale_line__invoice',
+    'actor',
+)
+
+
+def serial_trace(serial_number: str) -> dict:
+    """Full lifecycle of a serial unit, read with one joined query over its event history."""
+    events = list(
+        ProductUnitEvent.objects.filter(unit__serial_number=serial_number)
+        .select_related(*TRACE_RELATED)
+        .order_by('created_at', 'id')
+    )
+    if events:
+        unit = events[0].unit
+    else:
+        unit = ProductUnit.objects.select_related(
+            'product', 'shipment__supplier', 'shipment_item', 'sale_line__invoice__customer',
+        ).get(serial_number=serial_number)
+    shipment = unit.shipment
+    sale_line = unit.sale_line
+    invoice = sale_line.invoice if sale_line else None
+    return {
+        'serial_number': unit.serial_number,
+        'status': unit.status,
+        'product': {'id': unit.product_id, 'sku': unit.product.sku, 'name': unit.product.name},
+        'shipment': {
+            'id': shipment.id,
+            'shipment_code': shipment.shipment_code,
+            'supplier': shipment.supplier.name,
+            'arrival_date': shipment.arrival_date,
+            'received_at': shipment.received_at,
+        },
+        'purchase_price': unit.purchase_price,
+        'landed_cost': unit.landed_cost,
+        'sale': {
+            'invoice_id': invoice.id,
+            'invoice_number': invoice.number,
+            'customer_id': invoice.customer_id,
+            'customer_name': invoice.customer.name,
+            'line_total': sale_line.line_total,
+            'sold_at': unit.sold_at,
+        } if invoice else None,
+        'profit': unit.profit_amount,
+        'fault': {
+            'reported_at': unit.fault_reported_at,
+            'notes': unit.fault_notes,
+        } if unit.fault_reported_at else None,
+        'events': [
+            {
+                'event_type': event.event_type,
+                'status': event.status,
+                'at': event.created_at,
+                'invoice_number': event.sale_line.invoice.number if event.sale_line_id and event.sale_line.invoice_id else None,
+                'landed_cost': event.landed_cost,
+                'note': event.note,
+                'actor': event.actor.get_username() if event.actor_id else None,
+            }
+            for event in events
+        ],
+    }
+
+
+def _fault_rate(total: int, faulty: int) -> Decimal:
+    return (Decimal(faulty) / Decimal(total)).quantize(Decimal('0.0001')) if total else Decimal('0.0000')
+
+
+# A unit counts as faulty once a fault was reported, even after it is returned or repaired.
+FAULTY_UNIT = Q(fault_reported_at__isnull=False)
+
+
 def supplier_defect_rate(supplier_id: int) -> dict:
-    units = ProductUnit.objects.filter(shipment__supplier_id=supplier_id)
-    total = units.count()
-    faulty = units.filter(status=ProductUnit.STATUS_FAULTY).count()
-    rate = (Decimal(faulty) / Decimal(total)).quantize(Decimal('0.0001')) if total else Decimal('0.0000')
-    return {'supplier_id': supplier_id, 'total_units': total, 'faulty_units': faulty, 'fault_rate': rate}
+    totals = ProductUnit.objects.filter(shipment__supplier_id=supplier_id).aggregate(
+        total=Count('id'),
+        faulty=Count('id', filter=FAULTY_UNIT),
+    )
+    total, faulty = totals['total'], totals['faulty']
+    return {'supplier_id': supplier_id, 'total_units': total, 'faulty_units': faulty, 'fault_rate': _fault_rate(total, faulty)}
+
+
+def supplier_scorecards():
+    """Supplier comparison rows read straight from the maintained scorecard table."""
+    return SupplierScorecard.objects.select_related('supplier').order_by('supplier__name')
+
+
+@transaction.atomic
+def rebuild_supplier_scorecards(apps=global_apps) -> int:
+    """Recompute every scorecard from source tables, replacing the incrementally maintained rows.
+
+    A data migration passes its ``apps`` so the rebuild runs against the
+    historical models.
+    """
+    unit_model = apps.get_model('inventory', 'ProductUnit')
+    shipment_model = apps.get_model('inventory', 'Shipment')
+    item_model = apps.get_model('inventory', 'ShipmentItem')
+    cost_model = apps.get_model('inventory', 'ShipmentCost')
+    card_model = apps.get_model('inventory', 'SupplierScorecard')
+    cards = {}
+
+    def card_for(supplier_id):
+        if supplier_id not in cards:
+            cards[supplier_id] = card_model(supplier_id=supplier_id)
+        return cards[supplier_id]
+
+    unit_rows = unit_model.objects.values('shipment__supplier_id').annotate(
+        total=Count('id'),
+        faulty=Count('id', filter=FAULTY_UNIT),
+    ).order_by()
+    for row in unit_rows:
+        card = card_for(row['shipment__supplier_id'])
+        card.total_units = row['total']
+        card.faulty_units = row['faulty']
+
+    scored = shipment_model.objects.filter(
+        status__in=[Shipment.STATUS_RECEIVED, Shipment.STATUS_CLOSED],
+        eta_date__isnull=False,
+        arrival_date__isnull=False,
+    ).values_list('supplier_id', 'eta_date', 'arrival_date')
+    for supplier_id, eta_date, arrival_date in scored.iterator():
+        card = card_for(supplier_id)
+        delay_days = (arrival_date - eta_date).days
+        card.shipments_scored += 1
+        card.total_delay_days += delay_days
+        card.on_time_shipments += 1 if delay_days <= 0 else 0
+
+    allocated = shipment_model.objects.filter(landed_cost_allocated_at__isnull=False)
+    for row in allocated.values('supplier_id').annotate(shipments=Count('id')).order_by():
+        card_for(row['supplier_id']).allocated_shipments = row['shipments']
+    value_rows = item_model.objects.filter(shipment__in=allocated).values('shipment__supplier_id').annotate(
+        value=Sum(F('quantity_expected') * F('unit_purchase_price'), output_field=models.DecimalField(max_digits=16, decimal_places=4)),
+    ).order_by()
+    for row in value_rows:
+        card_for(row['shipment__supplier_id']).allocated_item_value = row['value'] or Decimal('0')
+    cost_rows = cost_model.objects.filter(shipment__in=allocated, allocated=True).values('shipment__supplier_id').annotate(
+        total=Sum('amount_base'),
+    ).order_by()
+    for row in cost_rows:
+        card_for(row['shipment__supplier_id']).allocated_landed_cost = row['total'] or Decimal('0')
+
+    card_model.objects.all().delete()
+    # recalculate() only reads counters, so it also works on historical instances.
+    card_model.objects.bulk_create(
+        [SupplierScorecard.recalculate(card) for card in cards.values()], batch_size=RECEIPT_BATCH_SIZE,
+    )
+    return len(cards)
 
 
 def shipment_delay_report():
-    rows = []
-    for shipment in Shipment.objects.exclude(eta_date__isnull=True).exclude(arrival_date__isnull=True):
-        delta = shipment.arrival_date - shipment.eta_date
-        rows.append({
-            'shipment': shipment,
-            'eta_date': shipment.eta_date,
-            'arrival_date': shipment.arrival_date,
-            'delay_days': delta.days,
-        })
-    return rows
+    """Shipments with both dates set, annotated with ``delay`` computed by the database."""
+    return (
+        Shipment.objects.exclude(eta_date__isnull=True)
+        .exclude(arrival_date__isnull=True)
+        .annotate(delay=ExpressionWrapper(F('arrival_date') - F('eta_date'), output_field=models.DurationField()))
+        .order_by('-arrival_date', '-id')
+    )
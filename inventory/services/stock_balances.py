@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import random
+from typing import Iterable, Mapping
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from inventory.models import Product, StockBalance, StockLocation
+from inventory.services.combos import invalidate_combo_availability
+
+
+STOCK_REFRESH_CACHE_KEY = 'inventory:stock_refresh'
+
+
+def stripe_count() -> int:
+    return StockBalance.stripe_count()
+
+
+def _location(location_id: int | None) -> int:
+    return location_id or StockLocation.default_pk()
+
+
+def stock_levels(product_ids: Iterable[int], location_id: int | None = None) -> dict[int, tuple[int, int]]:
+    """``{product_id: (quantity, reserved)}`` summed over stripes, and over all locations unless one is given."""
+    rows = StockBalance.objects.filter(product_id__in=list(product_ids))
+    if location_id:
+        rows = rows.filter(location_id=location_id)
+    return {
+        row['product_id']: (row['quantity'] or 0, row['reserved'] or 0)
+        for row in rows.order_by().values('product_id').annotate(quantity=Sum('quantity'), reserved=Sum('reserved'))
+    }
+
+
+def available_quantity(product_id: int, location_id: int | None = None) -> int:
+    quantity, reserved = stock_levels([product_id], location_id).get(product_id, (0, 0))
+    return max(quantity - reserved, 0)
+
+
+def _stripe_order() -> list[int]:
+    count = stripe_count()
+    start = random.randrange(count)
+    return [(start + offset) % count for offset in range(count)]
+
+
+def _consolidate(product_id: int, location_id: int, quantity: int) -> bool:
+    """Move just enough free stock onto the richest stripe to reserve ``quantity`` there.
+
+    Only used when no single stripe can cover the request; the stripe rows
+    are locked in a fixed order so two pools cannot deadlock, and whatever
+    is not needed stays spread over the other stripes.
+    """
+    rows = list(
+        StockBalance.objects.select_for_update()
+        .filter(product_id=product_id, location_id=location_id)
+        .order_by('stripe')
+    )
+    free = sum(max(row.quantity - row.reserved, 0) for row in rows)
+    if free < quantity:
+        return False
+    target = max(rows, key=lambda row: row.quantity - row.reserved)
+    needed = quantity - max(target.quantity - target.reserved, 0)
+    for row in sorted(rows, key=lambda row: row.reserved - row.quantity):
+        if needed <= 0:
+            break
+        if row is target:
+            continue
+        moved = min(max(row.quantity - row.reserved, 0), needed)
+        row.quantity -= moved
+        target.quantity += moved
+        needed -= moved
+    target.reserved += quantity
+    now = timezone.now()
+    for row in rows:
+        row.updated_at = now
+    StockBalance.objects.bulk_update(rows, ['quantity', 'reserved', 'updated_at'])
+    return True
+
+
+def reserve_available(product_id: int, quantity: int, location_id: int | None = None) -> bool:
+    """Reserve ``quantity`` if it is free, touching a single stripe in the common case.
+
+    Each attempt is one conditional UPDATE, so concurrent checkouts of the
+    same product only wait on each other when they land on the same stripe.
+    """
+    if quantity <= 0:
+        return True
+    location_id = _location(location_id)
+    rows = StockBalance.objects.filter(product_id=product_id, location_id=location_id)
+    now = timezone.now()
+    for stripe in _stripe_order():
+        updated = rows.filter(stripe=stripe, quantity__gte=F('reserved') + quantity).update(
+            reserved=F('reserved') + quantity, updated_at=now,
+        )
+        if updated:
+            return True
+    return _consolidate(product_id, location_id, quantity)
+
+
+def _update_one_stripe(product_id: int, location_id: int | None, quantity: int, reserved: int) -> None:
+    """Apply deltas to a stripe holding enough reservations, falling back to stripe 0."""
+    location_id = _location(location_id)
+    rows = StockBalance.objects.filter(product_id=product_id, location_id=location_id)
+    changes = {'quantity': F('quantity') + quantity, 'reserved': F('reserved') + reserved, 'updated_at': timezone.now()}
+    for stripe in _stripe_order():
+        if rows.filter(stripe=stripe, reserved__gte=-reserved).update(**changes):
+            return
+    StockBalance.apply(product_id, quantity=quantity, reserved=reserved, location_id=location_id)
+
+
+def release_reserved(product_id: int, quantity: int, location_id: int | None = None) -> None:
+    if quantity > 0:
+        _update_one_stripe(product_id, location_id, 0, -quantity)
+
+
+def consume_reserved(product_id: int, quantity: int, location_id: int | None = None) -> None:
+    """Turn a reservation into a sale: stock and reservation both drop by ``quantity``."""
+    if quantity > 0:
+        _update_one_stripe(product_id, location_id, -quantity, -quantity)
+
+
+def apply_stock_deltas(deltas: Mapping[int, tuple[int, int]], location_id: int | None = None) -> None:
+    """Add ``{product_id: (quantity, reserved)}`` deltas in bulk, spreading stock over the stripes.
+
+    Used by back-office writers that already update ``Product`` themselves.
+    """
+    StockBalance.apply_deltas(deltas, location_id)
+
+
+def sync_ledger_from(products: Iterable[Product], location_id: int | None = None) -> None:
+    """Mirror in-memory stock changes of products saved with ``bulk_update`` into the ledger."""
+    deltas = {}
+    for product in products:
+        quantity = product._changed_since_load('quantity') or 0
+        reserved = product._changed_since_load('reserved') or 0
+        if quantity or reserved:
+            deltas[product.pk] = (quantity, reserved)
+        product._remember_tracked()
+    apply_stock_deltas(deltas, location_id)
+
+
+def refresh_product_stock(product_ids: Iterable[int] | None = None) -> int:
+    """Copy ledger totals onto ``Product.quantity``/``reserved`` for products that drifted.
+
+    One UPDATE; ``updated_at`` only moves for rows whose figures changed.
+    """
+    quantity = StockBalance.total('quantity')
+    reserved = StockBalance.total('reserved')
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    stale = products.annotate(ledger_quantity=quantity, ledger_reserved=reserved).filter(
+        ~Q(quantity=F('ledger_quantity')) | ~Q(reserved=F('ledger_reserved'))
+    )
+    refreshed = Product.objects.filter(pk__in=stale.values('pk')).update(
+        quantity=quantity, reserved=reserved, updated_at=timezone.now(),
+    )
+    if refreshed:
+        invalidate_combo_availability()
+    return refreshed
+
+
+def stock_refresh_interval() -> int:
+    return max(0, int(getattr(settings, 'STOCK_REFRESH_INTERVAL', 60)))
+
+
+def schedule_stock_refresh(product_ids: Iterable[int]) -> None:
+    """Refresh the derived ``Product`` columns after commit, at most once per product per interval.
+
+    Checkouts only write stock stripes; copying the totals onto the product
+    row after every one would make it the hot row again. A product refreshed
+    in the last ``STOCK_REFRESH_INTERVAL`` seconds is skipped and caught up
+    by the periodic ``refresh_product_stock`` command. Reads that need exact
+    figures use ``stock_levels``.
+    """
+    product_ids = set(product_ids)
+    if product_ids:
+        # Combo availability reads the ledger, which the caller just changed.
+        invalidate_combo_availability()
+    interval = stock_refresh_interval()
+    product_ids = sorted(
+        product_id for product_id in product_ids
+        if not interval or cache.add(f'{STOCK_REFRESH_CACHE_KEY}:{product_id}', True, interval)
+    )
+    if product_ids:
+        transaction.on_commit(lambda: refresh_product_stock(product_ids))
+
+
+@transaction.atomic
+def rebalance_stripes(product_ids: Iterable[int] | None = None, location_id: int | None = None) -> int:
+    """Spread each product's free stock evenly over the configured stripes again.
+
+    Writes already spread what they add; this repairs products whose
+    checkouts drained some stripes, or after ``STOCK_BALANCE_STRIPES``
+    changed. Totals do not change. Returns the number of products rebalanced.
+    """
+    location_id = _location(location_id)
+    count = stripe_count()
+    rows = StockBalance.objects.select_for_update().filter(location_id=location_id).order_by('product_id', 'stripe')
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=list(product_ids))
+    by_product: dict[int, dict[int, StockBalance]] = {}
+    for row in rows:
+        by_product.setdefault(row.product_id, {})[row.stripe] = row
+
+    now = timezone.now()
+    changed = []
+    created = []
+    for product_id, stripes in by_product.items():
+        for stripe in range(count):
+            if stripe not in stripes:
+                stripes[stripe] = StockBalance(product_id=product_id, location_id=location_id, stripe=stripe)
+                created.append(stripes[stripe])
+        StockBalance.spread(stripes, count)
+        for row in stripes.values():
+            row.updated_at = now
+            if row.pk:
+                changed.append(row)
+    if created:
+        StockBalance.objects.bulk_create(created, batch_size=500)
+    if changed:
+        StockBalance.objects.bulk_update(changed, ['quantity', 'reserved', 'updated_at'], batch_size=500)
+    return len(by_product)
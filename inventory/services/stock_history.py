@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Max, OuterRef, Subquery, Sum, When
+from django.utils import timezone
+
+from inventory.models import StockCheckpoint, StockMovement
+
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_FOLDER = 'archive/stock_movements'
+ARCHIVE_COLUMNS = ('id', 'product_id', 'movement_type', 'quantity', 'unit_cost', 'timestamp', 'note', 'user_id')
+
+
+@dataclass
+class MovementArchiveResult:
+    cutoff: datetime
+    movements: int = 0
+    checkpoints: int = 0
+    archive_name: str = ''
+    dry_run: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            'cutoff': self.cutoff.isoformat(),
+            'movements': self.movements,
+            'checkpoints': self.checkpoints,
+            'archive_name': self.archive_name,
+            'dry_run': self.dry_run,
+        }
+
+
+def movement_retention_days() -> int:
+    return int(getattr(settings, 'STOCK_MOVEMENT_RETENTION_DAYS', 365))
+
+
+def _archive_row(row: dict) -> str:
+    row = dict(row)
+    row['timestamp'] = row['timestamp'].isoformat()
+    if row['unit_cost'] is not None:
+        row['unit_cost'] = str(row['unit_cost'])
+    return json.dumps(row, separators=(',', ':'))
+
+
+def _write_archive(scope, cutoff: datetime, storage, batch_size: int) -> str:
+    """Stream ``scope`` oldest first into a gzipped JSON-lines file and store it."""
+    spool = tempfile.TemporaryFile()
+    with gzip.GzipFile(fileobj=spool, mode='wb') as archive:
+        rows = scope.order_by('timestamp', 'id').values(*ARCHIVE_COLUMNS).iterator(chunk_size=batch_size)
+        for row in rows:
+            archive.write(_archive_row(row).encode('utf-8') + b'\n')
+    spool.seek(0)
+    name = f"{ARCHIVE_FOLDER}/movements-before-{cutoff:%Y%m%dT%H%M%S}.jsonl.gz"
+    with spool:
+        return storage.save(name, File(spool, name=name))
+
+
+def read_movement_archive(name: str, storage=None) -> Iterator[dict]:
+    """Yield the archived movement rows stored under ``name``."""
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as handle:
+        with gzip.GzipFile(fileobj=handle, mode='rb') as archive:
+            for line in io.TextIOWrapper(archive, encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _write_checkpoints(scope, cutoff: datetime, archive_name: str) -> int:
+    inbound = Case(
+        When(movement_type=StockMovement.IN, then='quantity'),
+        default=0,
+        output_field=IntegerField(),
+    )
+    outbound = Case(
+        When(movement_type=StockMovement.OUT, then='quantity'),
+        default=0,
+        output_field=IntegerField(),
+    )
+    totals = list(
+        scope.order_by()
+        .values('product_id')
+        .annotate(quantity_in=Sum(inbound), quantity_out=Sum(outbound), movement_count=Count('id'))
+    )
+    latest = StockCheckpoint.objects.filter(product=OuterRef('product')).order_by('-as_of', '-id').values('pk')[:1]
+    previous = dict(
+        StockCheckpoint.objects.filter(product_id__in=[row['product_id'] for row in totals], pk=Subquery(latest))
+        .values_list('product_id', 'balance')
+    )
+    StockCheckpoint.objects.bulk_create([
+        StockCheckpoint(
+            product_id=row['product_id'],
+            as_of=cutoff,
+            quantity_in=row['quantity_in'] or 0,
+            quantity_out=row['quantity_out'] or 0,
+            balance=previous.get(row['product_id'], 0) + (row['quantity_in'] or 0) - (row['quantity_out'] or 0),
+            movement_count=row['movement_count'],
+            archive_name=archive_name,
+        )
+        for row in totals
+    ], batch_size=ARCHIVE_BATCH_SIZE)
+    return len(totals)
+
+
+def archive_stock_movements(
+    *,
+    before: datetime | None = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    dry_run: bool = False,
+    storage=None,
+) -> MovementArchiveResult:
+    """Move stock movements older than ``before`` out of the hot table.
+
+    The movements are first written to a compressed archive file. Then, in
+    one transaction, a checkpoint per product records the archived totals
+    and running balance before the archived rows are deleted.
+    """
+    cutoff = before or timezone.now() - timedelta(days=movement_retention_days())
+    result = MovementArchiveResult(cutoff=cutoff, dry_run=dry_run)
+    # Pin the upper id so movements recorded while archiving are never touched.
+    upper_id = StockMovement.objects.filter(timestamp__lt=cutoff).aggregate(upper=Max('id'))['upper']
+    if upper_id is None:
+        return result
+    scope = StockMovement.objects.filter(timestamp__lt=cutoff, id__lte=upper_id)
+    if dry_run:
+        stats = scope.aggregate(movements=Count('id'), products=Count('product_id', distinct=True))
+        result.movements = stats['movements']
+        result.checkpoints = stats['products']
+        return result
+
+    storage = storage or default_storage
+    result.archive_name = _write_archive(scope, cutoff, storage, batch_size)
+    try:
+        with transaction.atomic():
+            result.checkpoints = _write_checkpoints(scope, cutoff, result.archive_name)
+            while True:
+                ids = list(scope.order_by('id').values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                StockMovement.objects.filter(pk__in=ids).delete()
+                result.movements += len(ids)
+    except Exception:
+        storage.delete(result.archive_name)
+        raise
+    return result
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Combo, ComboItem, Product, StockLocation
+from .services.combos import invalidate_combo_availability
+from .services.images import delete_renditions, sync_product_renditions
+
+
+@receiver(post_save, sender=Product)
+def on_product_saved(sender, instance: Product, raw: bool = False, **kwargs):
+    if raw:
+        return
+    sync_product_renditions(instance)
+
+
+@receiver(post_delete, sender=Product)
+def on_product_deleted(sender, instance: Product, **kwargs):
+    if instance.image_renditions:
+        delete_renditions(instance.image_renditions, instance.image.storage)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Combo)
+@receiver(post_delete, sender=Combo)
+@receiver(post_save, sender=ComboItem)
+@receiver(post_delete, sender=ComboItem)
+def on_combo_stock_changed(sender, raw: bool = False, **kwargs):
+    if raw:
+        return
+    invalidate_combo_availability()
+
+
+@receiver(post_save, sender=StockLocation)
+@receiver(post_delete, sender=StockLocation)
+def on_stock_location_changed(sender, **kwargs):
+    StockLocation._default_pk = None
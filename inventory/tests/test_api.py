@@ -0,0 +1,102 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Category, Product, Shipment, ShipmentCost, Supplier
+
+
+class ProductApiTests(TestCase):
+    def setUp(self):
+        self.url = reverse('ims:inventory:product-api-list')
+        self.category = Category.objects.create(name='Printers', slug='printers')
+        self.supplier = Supplier.objects.create(name='Acme')
+        for idx in range(5):
+            Product.objects.create(
+                name=f'Printer {idx}',
+                sku=f'PRN-{idx}',
+                price=Decimal('100.00'),
+                category=self.category,
+                supplier=self.supplier,
+                is_active=idx != 4,
+            )
+        Product.objects.create(name='Cable', sku='CBL-1', price=Decimal('2.00'))
+
+    def test_list_is_cursor_paginated(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['sku'] for row in data['results']], ['CBL-1', 'PRN-0'])
+        self.assertIsNotNone(data['next'])
+        second = self.client.get(data['next']).json()
+        self.assertEqual([row['sku'] for row in second['results']], ['PRN-1', 'PRN-2'])
+
+    def test_filters_and_sparse_fields(self):
+        response = self.client.get(self.url, {
+            'category': 'printers',
+            'supplier': self.supplier.id,
+            'active': 'true',
+            'fields': 'sku,price',
+        })
+        rows = response.json()['results']
+        self.assertEqual([row['sku'] for row in rows], ['PRN-0', 'PRN-1', 'PRN-2', 'PRN-3'])
+        self.assertEqual(set(rows[0]), {'sku', 'price'})
+
+        future = (timezone.now() + timedelta(hours=1)).isoformat()
+        self.assertEqual(self.client.get(self.url, {'updated_since': future}).json()['results'], [])
+        self.assertEqual(self.client.get(self.url, {'updated_since': 'yesterday'}).status_code, 400)
+
+    def test_unchanged_list_returns_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        product = Product.objects.get(sku='CBL-1')
+        product.price = Decimal('3.00')
+        product.save()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_json_create_is_accepted(self):
+        user = get_user_model().objects.create_user('api@example.com', 'api@example.com', 'pass1234')
+        self.client.force_login(user)
+        response = self.client.post(
+            self.url,
+            data={'name': 'Toner', 'sku': 'TNR-1', 'price': '25.00'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Product.objects.filter(sku='TNR-1').exists())
+
+
+class ShipmentApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('ops@example.com', 'ops@example.com', 'pass1234')
+        self.client.force_login(self.user)
+        self.shipment = Shipment.objects.create(
+            supplier=Supplier.objects.create(name='Acme'),
+            origin_country='CN',
+            destination_country='ZW',
+            incoterm=Shipment.INCOTERM_FOB,
+            shipping_method=Shipment.METHOD_SEA,
+        )
+        self.url = reverse('ims:inventory:shipment-detail', args=[self.shipment.id])
+
+    def test_sparse_list_skips_items(self):
+        response = self.client.get(reverse('ims:inventory:shipment-list'), {'fields': 'id,shipment_code'})
+        self.assertEqual(response.json()['results'], [{'id': self.shipment.id, 'shipment_code': self.shipment.shipment_code}])
+
+    def test_cost_change_invalidates_detail_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Shipment.objects.filter(pk=self.shipment.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        etag = self.client.get(self.url)['ETag']
+        ShipmentCost.objects.create(shipment=self.shipment, cost_type=ShipmentCost.TYPE_FREIGHT, amount=Decimal('10.00'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from accounting.models import JournalEntry
+from inventory.models import Category, CountLine, CountSession, Product, StockMovement
+from inventory.services import (
+    CycleCountError,
+    parse_count_rows,
+    post_count_session,
+    record_counts,
+    start_count_session,
+)
+from inventory.services.stock_balances import available_quantity
+
+
+class CycleCountTests(TestCase):
+    def setUp(self):
+        self.inks = Category.objects.create(name='Inks')
+        self.cyan = Product.objects.create(name='Cyan', sku='INK-C', category=self.inks, quantity=10, avg_cost=Decimal('4.00'))
+        self.black = Product.objects.create(name='Black', sku='INK-K', category=self.inks, quantity=5, avg_cost=Decimal('3.00'))
+        self.paper = Product.objects.create(name='Paper', sku='PPR-1', quantity=100, avg_cost=Decimal('1.00'))
+        Product.objects.create(name='Printer', sku='PRN-1', category=self.inks, quantity=2, tracking_mode=Product.TRACK_SERIAL)
+
+    def test_scanner_rows_accumulate_per_sku(self):
+        counts = parse_count_rows(b'sku,qty\nINK-C\nINK-C\nINK-K,4\n\nINK-C,2\n')
+        self.assertEqual(counts, {'INK-C': 4, 'INK-K': 4})
+        with self.assertRaises(CycleCountError):
+            parse_count_rows('INK-C,1.5\n')
+
+    def test_post_applies_variances_as_deltas_with_one_journal(self):
+        session = start_count_session('Ink shelf', category=self.inks)
+        self.assertEqual(session.line_count, 2)
+
+        result = record_counts(session, {'INK-C': 6, 'INK-K': 7, 'NOPE': 1})
+        self.assertEqual((result.matched, result.unknown), (2, ['NOPE']))
+        record_counts(session, {'INK-C': 1})
+        # A sale during the count must survive the adjustment.
+        StockMovement.objects.create(product=self.cyan, movement_type=StockMovement.OUT, quantity=2)
+
+        with self.assertNumQueries(24):
+            post_count_session(session)
+        session.refresh_from_db()
+        self.assertEqual(session.status, CountSession.STATUS_POSTED)
+        self.assertEqual(session.lines_adjusted, 2)
+        self.cyan.refresh_from_db()
+        self.black.refresh_from_db()
+        self.assertEqual((self.cyan.quantity, self.black.quantity), (5, 7))
+        self.assertEqual(available_quantity(self.cyan.pk), 5)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(note__startswith='Cycle count').values_list('product__sku', 'movement_type', 'quantity')),
+            [('INK-C', 'OUT', 3), ('INK-K', 'IN', 2)],
+        )
+        # 3 short at 4.00 and 2 over at 3.00 nets to a 6.00 loss.
+        self.assertEqual(session.adjustment_value, Decimal('-6.00'))
+        entry = JournalEntry.objects.get(pk=session.journal_entry_id)
+        self.assertEqual(
+            sorted((line.account.code, line.debit_base, line.credit_base) for line in entry.lines.all()),
+            [('1300', Decimal('0'), Decimal('6.00')), ('5000', Decimal('6.00'), Decimal('0'))],
+        )
+        with self.assertRaises(CycleCountError):
+            record_counts(session, {'INK-C': 1})
+
+    def test_api_session_flow(self):
+        admin = get_user_model().objects.create_user('admin@example.com', 'admin@example.com', 'pass1234', is_staff=True)
+        self.client.force_login(admin)
+        created = self.client.post(reverse('ims:inventory:count-session-list'), {'name': 'Full count'}, content_type='application/json')
+        self.assertEqual(created.status_code, 201)
+        session_id = created.json()['id']
+        self.assertEqual(CountLine.objects.filter(session_id=session_id).count(), 3)
+
+        upload = SimpleUploadedFile('scan.csv', b'PPR-1,90\nINK-C,10\n', content_type='text/csv')
+        counted = self.client.post(reverse('ims:inventory:count-session-counts', args=[session_id]), {'file': upload})
+        self.assertEqual(counted.json()['matched'], 2)
+        variances = self.client.get(reverse('ims:inventory:count-session-variances', args=[session_id])).json()
+        self.assertEqual([(row['product_sku'], row['variance']) for row in variances['results']], [('PPR-1', -10)])
+
+        posted = self.client.post(reverse('ims:inventory:count-session-post-session', args=[session_id]))
+        self.assertEqual(posted.json()['status'], CountSession.STATUS_POSTED)
+        self.paper.refresh_from_db()
+        self.assertEqual(self.paper.quantity, 90)
+        self.black.refresh_from_db()
+        self.assertEqual(self.black.quantity, 5)
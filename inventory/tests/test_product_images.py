@@ -112,3 +112,29 @@ class ProductImageTests(TestCase):
 
         legacy_serializer = ProductSerializer(legacy_product, context={'request': request})
         self.assertEqual(legacy_serializer.data['image'], legacy_product.image_url)
+
+    @override_settings(IMAGE_RENDITIONS_ASYNC=False, PRODUCT_IMAGE_RENDITION_WIDTHS=(160, 320, 2000))
+    def test_upload_builds_webp_and_jpeg_renditions(self):
+        product = Product.objects.create(name='Press', sku='PRS-001', price=99, currency='USD')
+        image_file = self._make_image_file(size=(800, 400))
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image.save('press.png', ContentFile(image_file.read()), save=True)
+        product.refresh_from_db()
+
+        widths = product.get_image_renditions()
+        self.assertEqual(sorted(widths, key=int), ['160', '320'])
+        self.assertTrue(widths['320']['webp'].endswith('press-320w.webp'))
+        with product.image.storage.open(widths['160']['jpeg']) as handle:
+            self.assertEqual(Image.open(handle).size, (160, 80))
+        self.assertTrue(product.get_image_rendition(200).endswith('press-320w.jpg'))
+        self.assertTrue(product.get_image_rendition('thumb', fmt='webp').endswith('press-160w.webp'))
+        self.assertIn('press-160w.webp 160w', product.image_webp_srcset)
+
+        old_names = [name for formats in widths.values() for name in formats.values()]
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = None
+            product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_renditions, {})
+        self.assertFalse(any(os.path.exists(os.path.join(TEST_MEDIA_ROOT, name)) for name in old_names))
+        self.assertEqual(product.get_image_rendition('card'), product.get_primary_image_url())
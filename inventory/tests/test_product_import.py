@@ -0,0 +1,101 @@
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from inventory.models import Category, Product, Supplier, allocate_unique_slugs
+from inventory.services import import_products, read_product_rows
+
+
+def csv_rows(text):
+    return read_product_rows(io.BytesIO(text.encode('utf-8')), filename='catalog.csv')
+
+
+class ProductImportTests(TestCase):
+    def test_upserts_by_sku_and_keeps_blank_cells(self):
+        Product.objects.create(name='Old Press', sku='PRS-1', price=Decimal('10.00'), description='Keep me')
+        result = import_products(csv_rows(
+            'SKU,Name,Price,Description,Category,Supplier,Active\n'
+            'PRS-1,Heat Press,450.00,,Presses,Acme,yes\n'
+            'INK-1,Ink Set,,Four colours,Consumables,Acme,no\n'
+            'BAD-1,Broken,abc,,,,\n'
+            ',No Sku,1,,,,\n'
+        ))
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual([(e.row, e.message) for e in result.errors], [
+            (4, 'price must be a number.'),
+            (5, 'sku is required.'),
+        ])
+        press = Product.objects.get(sku='PRS-1')
+        self.assertEqual(press.name, 'Heat Press')
+        self.assertEqual(press.price, Decimal('450.00'))
+        self.assertEqual(press.description, 'Keep me')
+        self.assertEqual(press.category.name, 'Presses')
+        ink = Product.objects.get(sku='INK-1')
+        self.assertFalse(ink.is_active)
+        self.assertEqual(ink.slug, 'ink-set-ink-1')
+        self.assertEqual(Supplier.objects.filter(name='Acme').count(), 1)
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_query_count_is_per_chunk_not_per_row(self):
+        header = 'sku,name,price,category\n'
+        body = ''.join(f'SKU-{n:04d},Widget,{n}.00,Parts\n' for n in range(300))
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_products(csv_rows(header + body), chunk_size=500)
+        self.assertEqual(result.created, 300)
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 4)
+        slugs = set(Product.objects.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), 300)
+
+    def test_slug_allocation_avoids_existing_and_batch_collisions(self):
+        Product.objects.create(name='Cable', sku='X', slug='cable')
+        with self.assertNumQueries(1):
+            slugs = allocate_unique_slugs(Product, ['Cable', 'Cable', 'Drum'])
+        self.assertEqual(slugs, ['cable-1', 'cable-2', 'drum'])
+
+    def test_xlsx_rows_are_read(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['SKU', 'Name', 'Price'])
+        sheet.append([1001, 'Vinyl Roll', 12.5])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        rows = list(read_product_rows(buffer, filename='catalog.xlsx'))
+        self.assertEqual(rows, [{'sku': '1001', 'name': 'Vinyl Roll', 'price': '12.5'}])
+
+    @override_settings(IMAGE_RENDITIONS_ASYNC=False)
+    def test_images_are_ingested_from_directory(self):
+        image_dir = tempfile.mkdtemp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, image_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        Image.new('RGB', (400, 400), 'red').save(os.path.join(image_dir, 'MUG-1.jpg'))
+        with self.settings(MEDIA_ROOT=media_root), self.captureOnCommitCallbacks(execute=True):
+            result = import_products(csv_rows('sku,name\nMUG-1,Mug\nCAP-1,Cap\n'), image_dir=image_dir)
+        self.assertEqual(result.images, 1)
+        mug = Product.objects.get(sku='MUG-1')
+        self.assertEqual(mug.image.name, 'products/MUG-1/MUG-1.jpg')
+        self.assertTrue(mug.get_image_renditions())
+        self.assertFalse(Product.objects.get(sku='CAP-1').image)
+
+    def test_import_endpoint_supports_dry_run(self):
+        admin = get_user_model().objects.create_user('admin@example.com', 'admin@example.com', 'pass1234', is_staff=True)
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('catalog.csv', b'sku,name,price\nNEW-1,New Thing,5\n', content_type='text/csv')
+        response = self.client.post(reverse('ims:inventory:product-api-import-file'), {'file': upload, 'dry_run': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertFalse(Product.objects.filter(sku='NEW-1').exists())
@@ -3,15 +3,37 @@ import shutil
 import tempfile
 from decimal import Decimal
 
+from datetime import date
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from accounting.models import Account, Currency
 from inventory.forms import ShipmentCostForm
-from inventory.models import Product, Supplier, Shipment, ShipmentItem, ShipmentCost, StockMovement, ProductUnit
-from inventory.services import allocate_landed_costs, receive_shipment, ShipmentServiceError
+from inventory.models import Product, Supplier, Shipment, ShipmentItem, ShipmentCost, StockMovement, ProductUnit, ProductUnitEvent, SupplierScorecard
+from inventory.services import (
+    SerialConflict,
+    SerialConflictError,
+    ShipmentServiceError,
+    find_serial_conflicts,
+    parse_serial_upload,
+    parse_serials,
+    allocate_landed_costs,
+    plan_landed_cost_allocation,
+    rebuild_supplier_scorecards,
+    receive_shipment,
+    shipment_cost_summary,
+    shipment_delay_report,
+    supplier_defect_rate,
+)
+from search.models import SearchDocument
+from search.services import search_documents
 
 
 class ShipmentServiceTests(TestCase):
@@ -56,6 +78,44 @@ class ShipmentServiceTests(TestCase):
         self.assertGreater(self.item.landed_unit_cost, Decimal('500.00'))
         self.assertTrue(self.shipment.are_costs_allocated)
 
+    def test_allocation_shares_reconcile_to_cost_pool(self):
+        for idx in range(2):
+            ShipmentItem.objects.create(
+                shipment=self.shipment,
+                product=Product.objects.create(name=f'Cable {idx}', sku=f'CBL-{idx}', price=Decimal('3.00')),
+                quantity_expected=1,
+                unit_purchase_price=Decimal('1.00'),
+            )
+        ShipmentCost.objects.create(
+            shipment=self.shipment,
+            cost_type=ShipmentCost.TYPE_DUTY,
+            amount=Decimal('0.01'),
+            currency='USD',
+        )
+        plan = plan_landed_cost_allocation(self.shipment, basis=Shipment.COST_BASIS_QUANTITY)
+        self.assertEqual(sum(row.share for row in plan), Decimal('100.01'))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.landed_unit_cost, Decimal('0.0000'))
+
+        allocate_landed_costs(self.shipment, basis=Shipment.COST_BASIS_QUANTITY)
+        totals = sum(
+            item.landed_total_cost - item.quantity_expected * item.unit_purchase_price
+            for item in self.shipment.items.all()
+        )
+        self.assertEqual(totals, Decimal('100.01'))
+
+    def test_allocation_updates_serial_units_in_one_statement(self):
+        unit = ProductUnit.objects.create(
+            serial_number='SN-ALLOC',
+            product=self.product,
+            shipment=self.shipment,
+            shipment_item=self.item,
+        )
+        allocate_landed_costs(self.shipment)
+        unit.refresh_from_db()
+        self.assertEqual(unit.landed_cost, Decimal('600.0000'))
+        self.assertEqual(unit.purchase_price, Decimal('500.0000'))
+
     def test_receive_shipment_requires_serials(self):
         with self.assertRaises(ShipmentServiceError):
             receive_shipment(
@@ -78,6 +138,269 @@ class ShipmentServiceTests(TestCase):
         self.assertEqual(unit.status, ProductUnit.STATUS_AVAILABLE)
         self.assertGreater(unit.landed_cost, Decimal('500.00'))
 
+    def test_received_serials_are_searchable(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            receive_shipment(
+                shipment_id=self.shipment.id,
+                receipts=[{'item_id': self.item.id, 'quantity': 1, 'serials': ['SN-FIND-ME']}],
+                received_by=self.user,
+            )
+        results = search_documents('SN-FIND-ME', kinds=[SearchDocument.KIND_SERIAL])
+        self.assertEqual([document.title for document in results], ['SN-FIND-ME'])
+        self.assertIn('Serial Laptop', results[0].subtitle)
+
+    def test_receive_shipment_rejects_duplicate_serials_in_batch(self):
+        self.item.quantity_expected = 2
+        self.item.save(update_fields=['quantity_expected'])
+        with self.assertRaises(SerialConflictError) as ctx:
+            receive_shipment(
+                shipment_id=self.shipment.id,
+                receipts=[{'item_id': self.item.id, 'quantity': 2, 'serials': ['SN-1', 'SN-1']}],
+                received_by=self.user,
+            )
+        self.assertEqual([c.reason for c in ctx.exception.conflicts], [SerialConflict.REASON_DUPLICATE])
+        self.assertFalse(ProductUnit.objects.exists())
+
+    def test_receive_shipment_rejects_existing_serials(self):
+        ProductUnit.objects.create(
+            serial_number='SN-TAKEN',
+            product=self.product,
+            shipment=self.shipment,
+            shipment_item=self.item,
+        )
+        with self.assertRaisesMessage(SerialConflictError, 'SN-TAKEN'):
+            receive_shipment(
+                shipment_id=self.shipment.id,
+                receipts=[{'item_id': self.item.id, 'quantity': 1, 'serials': ['SN-TAKEN']}],
+                received_by=self.user,
+            )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_received, 0)
+
+    def test_bulk_receipt_query_count_is_independent_of_serial_count(self):
+        self.item.quantity_expected = 250
+        self.item.save(update_fields=['quantity_expected'])
+        serials = [f'BULK-{n:05d}' for n in range(250)]
+        with CaptureQueriesContext(connection) as ctx:
+            receive_shipment(
+                shipment_id=self.shipment.id,
+                receipts=[{'item_id': self.item.id, 'quantity': 250, 'serials': serials}],
+                received_by=self.user,
+            )
+        self.assertLess(len(ctx.captured_queries), 70)
+        self.assertEqual(ProductUnit.objects.filter(shipment=self.shipment).count(), 250)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 250)
+        self.assertEqual(self.product.avg_cost, Decimal('500.4000'))
+
+    def test_serial_trace_returns_unit_history(self):
+        receive_shipment(
+            shipment_id=self.shipment.id,
+            receipts=[{'item_id': self.item.id, 'quantity': 1, 'serials': ['SN-TRACE']}],
+            received_by=self.user,
+        )
+        unit = ProductUnit.objects.get(serial_number='SN-TRACE')
+        unit.mark_faulty('Dead on arrival', actor=self.user)
+        self.assertEqual(
+            list(unit.events.values_list('event_type', flat=True)),
+            [ProductUnitEvent.EVENT_RECEIVED, ProductUnitEvent.EVENT_FAULTY],
+        )
+
+        self.client.force_login(self.user)
+        url = reverse('ims:inventory:serial_trace_api', args=['SN-TRACE'])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], ProductUnit.STATUS_FAULTY)
+        self.assertEqual(data['shipment']['supplier'], 'Test Supplier')
+        self.assertEqual(data['fault']['notes'], 'Dead on arrival')
+        self.assertEqual([e['event_type'] for e in data['events']], ['RECEIVED', 'FAULTY'])
+        self.assertEqual(self.client.get(reverse('ims:inventory:serial_trace_api', args=['NOPE'])).status_code, 404)
+
+    def test_supplier_scorecard_is_maintained_incrementally(self):
+        self.shipment.eta_date = date(2026, 3, 1)
+        self.shipment.arrival_date = date(2026, 3, 5)
+        self.shipment.save(update_fields=['eta_date', 'arrival_date'])
+        self.item.quantity_expected = 2
+        self.item.save(update_fields=['quantity_expected'])
+        receive_shipment(
+            shipment_id=self.shipment.id,
+            receipts=[{'item_id': self.item.id, 'quantity': 2, 'serials': ['SC-1', 'SC-2']}],
+            received_by=self.user,
+        )
+        unit = ProductUnit.objects.get(serial_number='SC-1')
+        unit.mark_faulty('No power')
+        unit.mark_faulty('Still no power')
+        unit.mark_returned('Sent back to supplier')
+
+        card = SupplierScorecard.objects.get(supplier=self.supplier)
+        self.assertEqual((card.total_units, card.faulty_units), (2, 1))
+        self.assertEqual(card.fault_rate, Decimal('0.5000'))
+        rate = supplier_defect_rate(self.supplier.id)
+        self.assertEqual((rate['faulty_units'], rate['fault_rate']), (card.faulty_units, card.fault_rate))
+        self.assertEqual(card.average_delay_days, Decimal('4.00'))
+        self.assertEqual(card.on_time_pct, Decimal('0.00'))
+        self.assertEqual(card.landed_cost_overhead_pct, Decimal('10.00'))
+
+        SupplierScorecard.objects.all().delete()
+        self.assertEqual(rebuild_supplier_scorecards(), 1)
+        rebuilt = SupplierScorecard.objects.get(supplier=self.supplier)
+        for field in SupplierScorecard.COUNTER_FIELDS + ('fault_rate', 'on_time_pct', 'landed_cost_overhead_pct'):
+            self.assertEqual(getattr(rebuilt, field), getattr(card, field), field)
+
+        # The backfill migration runs the same rebuild against historical models.
+        SupplierScorecard.objects.all().delete()
+        historical = MigrationLoader(connection).project_state(('inventory', '0020_backfill_supplier_scorecards'))
+        self.assertEqual(rebuild_supplier_scorecards(historical.apps), 1)
+        backfilled = SupplierScorecard.objects.get(supplier=self.supplier)
+        for field in SupplierScorecard.COUNTER_FIELDS + ('fault_rate', 'on_time_pct', 'landed_cost_overhead_pct'):
+            self.assertEqual(getattr(backfilled, field), getattr(card, field), field)
+
+    def test_serial_parsing_handles_scanner_and_csv_input(self):
+        self.assertEqual(parse_serials(' A1\r\nA2,\tA3;;"A4"\n'), ['A1', 'A2', 'A3', 'A4'])
+        upload = SimpleUploadedFile('serials.csv', b'sku,Serial Number\nLAP-001,X-1\nLAP-001, X-2 \n')
+        self.assertEqual(parse_serial_upload(upload), ['X-1', 'X-2'])
+
+    def test_serial_conflicts_are_reported_together(self):
+        ProductUnit.objects.create(serial_number='OLD-1', product=self.product, shipment=self.shipment, shipment_item=self.item)
+        ProductUnit.objects.create(serial_number='OLD-2', product=self.product, shipment=self.shipment, shipment_item=self.item)
+        with self.assertNumQueries(1):
+            conflicts = find_serial_conflicts({self.item.id: ['NEW-1', 'OLD-1', 'NEW-1', 'OLD-2']})
+        self.assertEqual(
+            [(c.serial, c.reason) for c in conflicts],
+            [('NEW-1', 'duplicate'), ('OLD-1', 'exists'), ('OLD-2', 'exists')],
+        )
+
+    def test_receive_api_returns_all_serial_conflicts(self):
+        self.item.quantity_expected = 2
+        self.item.save(update_fields=['quantity_expected'])
+        ProductUnit.objects.create(serial_number='OLD-1', product=self.product, shipment=self.shipment, shipment_item=self.item)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('ims:inventory:shipment-receive', args=[self.shipment.id]),
+            data={'receipts': [{'item_id': self.item.id, 'quantity': 2, 'serials': 'OLD-1\nOLD-1'}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([c['reason'] for c in response.json()['conflicts']], ['duplicate', 'exists'])
+
+
+class ShipmentDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('ops@example.com', 'ops@example.com', 'pass1234')
+        self.product = Product.objects.create(name='Router', sku='RTR-001', tracking_mode=Product.TRACK_SERIAL)
+
+    def _make_shipment(self, supplier, **kwargs):
+        shipment = Shipment.objects.create(
+            supplier=supplier,
+            origin_country='CN',
+            destination_country='ZW',
+            incoterm=Shipment.INCOTERM_FOB,
+            shipping_method=Shipment.METHOD_SEA,
+            **kwargs,
+        )
+        ShipmentCost.objects.create(shipment=shipment, cost_type=ShipmentCost.TYPE_FREIGHT, amount=Decimal('40.00'))
+        ShipmentCost.objects.create(shipment=shipment, cost_type=ShipmentCost.TYPE_DUTY, amount=Decimal('10.00'))
+        return shipment
+
+    def _dashboard_query_count(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('ims:inventory:shipment_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_cost_summary_uses_conditional_aggregation(self):
+        shipment = self._make_shipment(Supplier.objects.create(name='Acme'))
+        summary = shipment_cost_summary(shipment.id)
+        self.assertEqual(summary['total_cost_base'], Decimal('50.00'))
+        self.assertEqual(
+            summary['breakdown'],
+            [{'cost_type': 'FREIGHT', 'total': Decimal('40.00')}, {'cost_type': 'DUTY', 'total': Decimal('10.00')}],
+        )
+
+    def test_delay_report_is_computed_in_sql(self):
+        supplier = Supplier.objects.create(name='Acme')
+        self._make_shipment(supplier, eta_date=date(2026, 1, 1), arrival_date=date(2026, 1, 11))
+        self._make_shipment(supplier)
+        rows = list(shipment_delay_report())
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0].delay.days, 10)
+
+    def test_dashboard_query_count_does_not_grow(self):
+        for idx in range(3):
+            self._make_shipment(Supplier.objects.create(name=f'Supplier {idx}'), eta_date=date(2026, 1, 1), arrival_date=date(2026, 1, 3))
+        baseline = self._dashboard_query_count()
+        for idx in range(3, 9):
+            self._make_shipment(Supplier.objects.create(name=f'Supplier {idx}'), eta_date=date(2026, 1, 1), arrival_date=date(2026, 1, 3))
+        self.assertEqual(self._dashboard_query_count(), baseline)
+
+
+class ShipmentRollupTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('ops@example.com', 'ops@example.com', 'pass1234', is_staff=True, is_superuser=True)
+        self.supplier = Supplier.objects.create(name='Rollup Supplier')
+
+    def _make_shipment(self, idx):
+        shipment = Shipment.objects.create(
+            supplier=self.supplier,
+            origin_country='CN',
+            destination_country='ZW',
+            incoterm=Shipment.INCOTERM_FOB,
+            shipping_method=Shipment.METHOD_SEA,
+        )
+        for n in range(2):
+            ShipmentItem.objects.create(
+                shipment=shipment,
+                product=Product.objects.create(name=f'Part {idx}-{n}', sku=f'PRT-{idx}-{n}'),
+                quantity_expected=4,
+                quantity_received=4 if n == 0 else 1,
+                unit_purchase_price=Decimal('2.5000'),
+            )
+        ShipmentCost.objects.create(shipment=shipment, cost_type=ShipmentCost.TYPE_FREIGHT, amount=Decimal('12.00'))
+        return shipment
+
+    def test_rollups_match_properties(self):
+        plain = self._make_shipment(0)
+        annotated = Shipment.objects.with_rollups().get(pk=plain.pk)
+        with self.assertNumQueries(0):
+            rollups = (
+                annotated.total_cost_base,
+                annotated.total_item_value,
+                annotated.total_quantity_expected,
+                annotated.total_quantity_received,
+                annotated.is_fully_received,
+                annotated.are_costs_allocated,
+            )
+        self.assertEqual(rollups, (
+            plain.total_cost_base,
+            plain.total_item_value,
+            plain.total_quantity_expected,
+            plain.total_quantity_received,
+            plain.is_fully_received,
+            plain.are_costs_allocated,
+        ))
+        self.assertEqual(rollups[:4], (Decimal('12.00'), Decimal('20.0000'), 8, 5))
+
+    def test_list_api_and_admin_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self._make_shipment(0)
+
+        def count(url):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(ctx.captured_queries)
+
+        api_url = reverse('ims:inventory:shipment-list')
+        admin_url = reverse('admin:inventory_shipment_changelist')
+        baseline = (count(api_url), count(admin_url))
+        for idx in range(1, 6):
+            self._make_shipment(idx)
+        self.assertEqual((count(api_url), count(admin_url)), baseline)
+
 
 class ShipmentCostAttachmentTests(TestCase):
     def setUp(self):
@@ -0,0 +1,73 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Product, StockCheckpoint, StockMovement
+from inventory.services import archive_stock_movements, read_movement_archive
+
+
+class StockHistoryTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.printer = Product.objects.create(name='Printer', sku='PRN-1')
+        self.toner = Product.objects.create(name='Toner', sku='TNR-1')
+        now = timezone.now()
+        rows = [
+            (self.printer, StockMovement.IN, 10, 400),
+            (self.printer, StockMovement.OUT, 3, 300),
+            (self.toner, StockMovement.IN, 50, 200),
+            (self.printer, StockMovement.OUT, 2, 5),
+            (self.toner, StockMovement.OUT, 5, 1),
+        ]
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, movement_type=kind, quantity=qty) for product, kind, qty, _ in rows
+        ])
+        for movement, (_, _, _, days) in zip(StockMovement.objects.order_by('id'), rows):
+            StockMovement.objects.filter(pk=movement.pk).update(timestamp=now - timedelta(days=days))
+
+    def test_archive_checkpoints_then_removes_old_movements(self):
+        cutoff = timezone.now() - timedelta(days=100)
+        result = archive_stock_movements(before=cutoff, batch_size=2)
+        self.assertEqual((result.movements, result.checkpoints), (3, 2))
+        self.assertEqual(StockMovement.objects.count(), 2)
+
+        checkpoints = {cp.product_id: cp for cp in StockCheckpoint.objects.all()}
+        self.assertEqual(checkpoints[self.printer.id].balance, 7)
+        self.assertEqual(checkpoints[self.toner.id].quantity_in, 50)
+        archived = list(read_movement_archive(result.archive_name))
+        self.assertEqual([row['quantity'] for row in archived], [10, 3, 50])
+
+        later = archive_stock_movements(before=timezone.now())
+        self.assertEqual(later.movements, 2)
+        printer = StockCheckpoint.objects.filter(product=self.printer).order_by('-as_of').first()
+        self.assertEqual((printer.balance, printer.quantity_out), (5, 2))
+
+    def test_command_dry_run_changes_nothing(self):
+        call_command('archive_stock_movements', '--days', '100', '--dry-run', stdout=io.StringIO())
+        self.assertEqual(StockMovement.objects.count(), 5)
+        self.assertFalse(StockCheckpoint.objects.exists())
+
+    def test_history_endpoints_page_newest_first(self):
+        user = get_user_model().objects.create_user('ops@example.com', 'ops@example.com', 'pass1234')
+        self.client.force_login(user)
+        url = reverse('ims:inventory:product-api-movements', args=[self.printer.id])
+        first = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([row['quantity'] for row in first['results']], [2, 3])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['quantity'] for row in second['results']], [10])
+
+        everything = self.client.get(reverse('ims:inventory:stock-movement-list'), {'type': 'out'}).json()
+        self.assertEqual([row['quantity'] for row in everything['results']], [5, 2, 3])
+        self.assertEqual(self.client.get(reverse('ims:inventory:stock-movement-list'), {'type': 'x'}).status_code, 400)
@@ -2,7 +2,14 @@ from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from . import views
-from .api import ProductViewSet, ComboViewSet, ShipmentViewSet
+from .api import (
+    ComboViewSet,
+    CountSessionViewSet,
+    ProductViewSet,
+    SerialTraceAPIView,
+    ShipmentViewSet,
+    StockMovementViewSet,
+)
 
 app_name = 'inventory'
 
@@ -11,6 +18,8 @@ router = DefaultRouter()
 router.register('api/products', ProductViewSet, basename='product-api')
 router.register('api/combos', ComboViewSet, basename='combo')
 router.register('api/shipments', ShipmentViewSet, basename='shipment')
+router.register('api/stock-movements', StockMovementViewSet, basename='stock-movement')
+router.register('api/count-sessions', CountSessionViewSet, basename='count-session')
 
 urlpatterns = [
     path('', views.product_list, name='product_list'),
@@ -23,6 +32,7 @@ urlpatterns = [
     path('shipments/<int:pk>/', views.shipment_detail, name='shipment_detail'),
     path('shipments/<int:pk>/receive/', views.shipment_receive, name='shipment_receive'),
     path('shipments/dashboard/', views.shipment_dashboard, name='shipment_dashboard'),
+    path('api/serials/<str:serial_number>/trace/', SerialTraceAPIView.as_view(), name='serial_trace_api'),
 ]
 
 urlpatterns += router.urls
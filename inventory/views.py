@@ -25,16 +25,18 @@ from .models import (
     ShipmentCost,
     ShipmentItem,
     StockMovement,
-    Supplier,
 )
 from .services import (
+    SerialConflictError,
     ShipmentServiceError,
+    cost_summary_for,
     landed_cost_per_product,
     profit_per_serial,
     receive_shipment,
     shipment_cost_summary,
     shipment_delay_report,
-    supplier_defect_rate,
+    supplier_scorecards,
+    with_cost_breakdown,
 )
 
 @login_required
@@ -94,7 +96,7 @@ def movement_create(request):
 @login_required
 def shipment_list(request):
     status = request.GET.get('status')
-    shipments = Shipment.objects.select_related('supplier').order_by('-created_at')
+    shipments = Shipment.objects.with_rollups().select_related('supplier').order_by('-created_at')
     if status:
         shipments = shipments.filter(status=status)
     return render(
@@ -122,7 +124,7 @@ def shipment_create(request):
 
 @login_required
 def shipment_detail(request, pk):
-    shipment = get_object_or_404(Shipment, pk=pk)
+    shipment = get_object_or_404(Shipment.objects.with_rollups(), pk=pk)
     item_form = ShipmentItemForm(prefix='item', shipment=shipment)
     cost_form = ShipmentCostForm(prefix='cost')
     if request.method == 'POST':
@@ -200,7 +202,7 @@ def shipment_receive(request, pk):
         return redirect('ims:inventory:shipment_detail', shipment.id)
     pending_items = [item for item in shipment.items.select_related('product') if item.quantity_received < item.quantity_expected]
     receipt_forms = [
-        ShipmentItemReceiptForm(request.POST or None, prefix=f'item-{item.id}', item=item)
+        ShipmentItemReceiptForm(request.POST or None, request.FILES or None, prefix=f'item-{item.id}', item=item)
         for item in pending_items
     ]
     if request.method == 'POST':
@@ -226,6 +228,8 @@ def shipment_receive(request, pk):
                     )
                     messages.success(request, 'Shipment received successfully.')
                     return redirect('ims:inventory:shipment_detail', shipment.id)
+                except SerialConflictError as exc:
+                    messages.error(request, ' '.join(exc.messages))
                 except ShipmentServiceError as exc:
                     messages.error(request, exc.messages[0] if isinstance(exc.messages, list) else str(exc))
     return render(
@@ -278,22 +282,11 @@ def shipment_dashboard(request):
             landed_rows = list(landed_cost_per_product(product_obj.id))
         except (Product.DoesNotExist, ValueError):
             landed_rows = []
-    shipments_qs = Shipment.objects.select_related('supplier').order_by('-created_at')
+    shipments_qs = with_cost_breakdown(Shipment.objects.select_related('supplier')).order_by('-created_at')
     recent_shipments_page = paginate_items(shipments_qs, 'ship_page')
-    cost_summaries = [
-        shipment_cost_summary(s.id)
-        for s in recent_shipments_page.object_list
-    ]
-    suppliers_qs = Supplier.objects.order_by('name')
-    supplier_stats_page = paginate_items(suppliers_qs, 'supplier_page')
-    supplier_stats_rows = []
-    for supplier in supplier_stats_page.object_list:
-        stats = supplier_defect_rate(supplier.id)
-        stats['supplier'] = supplier
-        supplier_stats_rows.append(stats)
-    supplier_stats_page.object_list = supplier_stats_rows
-    delays_list = shipment_delay_report()
-    delays_page = paginate_items(delays_list, 'delay_page')
+    cost_summaries = [cost_summary_for(s) for s in recent_shipments_page.object_list]
+    supplier_stats_page = paginate_items(supplier_scorecards(), 'supplier_page')
+    delays_page = paginate_items(shipment_delay_report(), 'delay_page')
     landed_rows_page = paginate_items(landed_rows, 'landed_page') if landed_rows is not None else None
     return render(
         request,
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import CatalogChange
+
+
+@admin.register(CatalogChange)
+class CatalogChangeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'changed_at')
+    list_filter = ('kind',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,46 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from sales.services.ingestion import InvoiceIngestionError
+
+from .services import DEFAULT_LIMIT, catalog_delta, upload_sales
+
+
+class CatalogDeltaAPIView(APIView):
+    """Products, price rules and combos changed since a terminal's watermark.
+
+    ``since`` is the ``watermark`` of the previous response (0 for a first
+    sync); keep calling while ``more`` is true.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'detail': 'since and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0:
+            return Response({'detail': 'since cannot be negative.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(catalog_delta(since, limit).as_dict())
+
+
+class SalesUploadAPIView(APIView):
+    """Invoices and their payments queued by an offline terminal, one batch per call.
+
+    A batch can be resent as is: invoices already applied come back under
+    ``duplicates``, so a terminal drops everything acknowledged in either
+    ``created`` or ``duplicates`` from its queue.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            upload = upload_sales(request.data.get('invoices'), user=request.user)
+        except InvoiceIngestionError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(upload.as_dict())
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class PosConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'pos'
+    verbose_name = 'POS sync'
+
+    def ready(self):
+        from . import signals  # noqa: F401
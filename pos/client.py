@@ -0,0 +1,177 @@
+"""Reference client for the POS sync API.
+
+A terminal keeps its catalog, its watermark and the invoices it could not
+send yet in one JSON file, so it can keep selling while offline::
+
+    client = PosSyncClient('https://ims.example.com', auth=('till-1', 'secret'), state_path='till-1.json')
+    client.pull()
+    toner = client.product('TNR-K')
+    client.queue_invoice({
+        'customer': 7,
+        'lines': [{'product': toner['id'], 'quantity': '1', 'unit_price': toner['price']}],
+        'payments': [{'amount': toner['price'], 'method': 'Cash'}],
+    })
+    client.push()
+
+Only ``requests`` and the standard library are used, so the module can be
+copied to a terminal without Django.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import uuid
+from dataclasses import asdict, dataclass, field
+
+import requests
+
+
+FEEDS = ('products', 'price_rules', 'combos')
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_TIMEOUT = 30
+
+
+@dataclass
+class SyncState:
+    watermark: int = 0
+    catalog: dict[str, dict[str, dict]] = field(default_factory=lambda: {feed: {} for feed in FEEDS})
+    queue: list[dict] = field(default_factory=list)
+    rejected: list[dict] = field(default_factory=list)
+    stock: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str | None) -> SyncState:
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as handle:
+            state = cls(**json.load(handle))
+        for feed in FEEDS:
+            state.catalog.setdefault(feed, {})
+        return state
+
+    def save(self, path: str | None) -> None:
+        if not path:
+            return
+        # Write then rename, so a crash mid-save never loses the queue.
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as handle:
+            json.dump(asdict(self), handle)
+        os.replace(handle.name, path)
+
+
+@dataclass
+class PushResult:
+    created: list[dict] = field(default_factory=list)
+    duplicates: list[dict] = field(default_factory=list)
+    failed: list[dict] = field(default_factory=list)
+    catalog_stale: bool = False
+
+    @property
+    def conflicts(self) -> list[dict]:
+        """Invoices booked despite a stock shortfall, or left pending because of one."""
+        return [row for row in self.created if row.get('stock_conflict') or row.get('reservation_error')]
+
+
+class PosSyncClient:
+    """Pull catalog deltas and push queued invoices against ``base_url``."""
+
+    api_root = '/ims/pos/api/'
+
+    def __init__(
+        self,
+        base_url: str,
+        auth=None,
+        *,
+        state_path: str | None = None,
+        session: requests.Session | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.session = session or requests.Session()
+        if auth is not None:
+            self.session.auth = auth
+        self.state_path = state_path
+        self.state = SyncState.load(state_path)
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def _url(self, name: str) -> str:
+        return f'{self.base_url}{self.api_root}{name}/'
+
+    def save(self) -> None:
+        self.state.save(self.state_path)
+
+    # Catalog
+
+    def pull(self, limit: int | None = None) -> int:
+        """Apply every change since the stored watermark; returns the number of objects touched."""
+        touched = 0
+        while True:
+            params = {'since': self.state.watermark}
+            if limit:
+                params['limit'] = limit
+            response = self.session.get(self._url('catalog'), params=params, timeout=self.timeout)
+            response.raise_for_status()
+            delta = response.json()
+            touched += self.apply_delta(delta)
+            if not delta['more']:
+                return touched
+
+    def apply_delta(self, delta: dict) -> int:
+        touched = 0
+        for feed in FEEDS:
+            records = self.state.catalog[feed]
+            columns = delta[feed]['columns']
+            for row in delta[feed]['rows']:
+                record = dict(zip(columns, row))
+                records[str(record['id'])] = record
+                touched += 1
+            for object_id in delta['deleted'][feed]:
+                records.pop(str(object_id), None)
+                touched += 1
+        self.state.watermark = delta['watermark']
+        self.save()
+        return touched
+
+    def product(self, sku: str) -> dict | None:
+        return next((record for record in self.state.catalog['products'].values() if record['sku'] == sku), None)
+
+    # Sales
+
+    def queue_invoice(self, invoice: dict) -> str:
+        """Queue an invoice for the next push; returns its idempotency key."""
+        invoice = {**invoice, 'idempotency_key': invoice.get('idempotency_key') or uuid.uuid4().hex}
+        self.state.queue.append(invoice)
+        self.save()
+        return invoice['idempotency_key']
+
+    def push(self) -> PushResult:
+        """Send the queue in batches, dropping every invoice the server acknowledged or rejected.
+
+        A network failure leaves the unsent batches queued; resending a
+        batch whose response was lost only produces duplicates.
+        """
+        result = PushResult()
+        while self.state.queue:
+            batch = self.state.queue[:self.batch_size]
+            response = self.session.post(self._url('sales'), json={'invoices': batch}, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+            result.created += body['created']
+            result.duplicates += body['duplicates']
+            result.failed += body['failed']
+            for row in body['failed']:
+                self.state.rejected.append({'invoice': batch[row['index']], 'errors': row['errors']})
+            self.state.stock.update(body['stock'])
+            result.catalog_stale = result.catalog_stale or body['watermark'] > self.state.watermark
+            del self.state.queue[:len(batch)]
+            self.save()
+        return result
+
+    def sync(self) -> PushResult:
+        """Push queued sales, then pull whatever changed in the catalog meanwhile."""
+        result = self.push()
+        self.pull()
+        return result
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pos.models import CatalogChange
+from pos.services import rebuild_change_log
+
+
+class Command(BaseCommand):
+    help = "Record every product, price rule and combo as changed so POS terminals download them again"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', dest='kinds', help='Only record this kind (repeatable)')
+
+    def handle(self, *args, **options):
+        kinds = options['kinds']
+        valid = {value for value, _ in CatalogChange.KIND_CHOICES}
+        if kinds and set(kinds) - valid:
+            raise CommandError(f"Unknown kind; choose from {', '.join(sorted(valid))}.")
+        counts = rebuild_change_log(kinds)
+        for kind, count in counts.items():
+            self.stdout.write(f"{kind}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Recorded {sum(counts.values())} catalog changes."))
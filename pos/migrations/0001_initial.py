@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+SEEDED = (
+    ('product', 'inventory', 'Product'),
+    ('price_rule', 'sales', 'PriceRule'),
+    ('combo', 'inventory', 'Combo'),
+)
+
+
+def seed_catalog_changes(apps, schema_editor):
+    # One row per existing object, so a terminal syncing from zero gets the whole catalog.
+    CatalogChange = apps.get_model('pos', 'CatalogChange')
+    for kind, app_label, model_name in SEEDED:
+        ids = apps.get_model(app_label, model_name).objects.order_by('pk').values_list('pk', flat=True)
+        CatalogChange.objects.bulk_create(
+            (CatalogChange(kind=kind, object_id=object_id) for object_id in ids.iterator(chunk_size=1000)),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('inventory', '0018_stock_balances'),
+        ('sales', '0007_invoice_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('price_rule', 'Price rule'), ('combo', 'Combo')], max_length=12)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='pos_catalog_kind_10dce6_idx')],
+            },
+        ),
+        migrations.RunPython(seed_catalog_changes, migrations.RunPython.noop),
+    ]
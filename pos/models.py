@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class CatalogChange(models.Model):
+    """The latest change of one product, price rule or combo, for POS delta downloads.
+
+    The auto-increment ``id`` is the sync watermark: a terminal asks for
+    everything above the last id it has applied. Recording a change drops
+    the object's previous row, so the log holds about one row per object
+    and a full download (watermark 0) is the catalog itself. Deletions are
+    rows whose object no longer exists.
+    """
+
+    KIND_PRODUCT = 'product'
+    KIND_PRICE_RULE = 'price_rule'
+    KIND_COMBO = 'combo'
+    KIND_CHOICES = [
+        (KIND_PRODUCT, 'Product'),
+        (KIND_PRICE_RULE, 'Price rule'),
+        (KIND_COMBO, 'Combo'),
+    ]
+
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'object_id'])]
+
+    def __str__(self):
+        return f'#{self.pk} {self.get_kind_display()} {self.object_id}'
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from inventory.models import Combo, ComboItem, Product
+from inventory.services.stock_balances import stock_levels
+from sales.models import PriceRule
+from sales.services.ingestion import IngestionResult, clean_invoice_payload, ingest_invoices
+
+from .models import CatalogChange
+
+
+RECORD_BATCH_SIZE = 1000
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+STOCK_ACCEPT = 'accept'
+STOCK_HOLD = 'hold'
+STOCK_POLICIES = (STOCK_ACCEPT, STOCK_HOLD)
+
+
+@dataclass(frozen=True)
+class Feed:
+    name: str
+    queryset: Callable[[], QuerySet]
+    fields: tuple[str, ...]
+    # Extra column filled per object id, e.g. the components of a combo.
+    extra: tuple[str, Callable[[list[int]], dict[int, list]]] | None = None
+
+    @property
+    def columns(self) -> list[str]:
+        names = [name.removesuffix('_id') if name != 'id' else name for name in self.fields]
+        return names + ([self.extra[0]] if self.extra else [])
+
+
+def _combo_items(combo_ids: list[int]) -> dict[int, list]:
+    items: dict[int, list] = {}
+    rows = ComboItem.objects.filter(combo_id__in=combo_ids).order_by('combo_id', 'product_id')
+    for combo_id, product_id, quantity in rows.values_list('combo_id', 'product_id', 'quantity'):
+        items.setdefault(combo_id, []).append([product_id, quantity])
+    return items
+
+
+FEEDS: dict[str, Feed] = {
+    CatalogChange.KIND_PRODUCT: Feed(
+        'products',
+        Product.objects.all,
+        ('id', 'sku', 'name', 'category_id', 'price', 'tax_rate', 'currency', 'tracking_mode', 'track_inventory', 'is_active'),
+    ),
+    CatalogChange.KIND_PRICE_RULE: Feed(
+        'price_rules',
+        PriceRule.objects.all,
+        (
+            'id', 'name', 'rule_type', 'scope', 'value_type', 'value', 'start_at', 'end_at', 'is_active',
+            'product_id', 'category_id', 'min_qty', 'stackable',
+        ),
+    ),
+    CatalogChange.KIND_COMBO: Feed(
+        'combos',
+        Combo.objects.all,
+        ('id', 'code', 'name', 'is_active', 'discount_type', 'discount_value', 'components_total', 'final_price'),
+        extra=('items', _combo_items),
+    ),
+}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _json(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def record_changes(kind: str, ids: Iterable[int]) -> int:
+    """Move ``ids`` of ``kind`` to the head of the change log, replacing their older rows."""
+    recorded = 0
+    for chunk in _chunks(sorted(set(ids)), RECORD_BATCH_SIZE):
+        with transaction.atomic():
+            CatalogChange.objects.filter(kind=kind, object_id__in=chunk).delete()
+            CatalogChange.objects.bulk_create([CatalogChange(kind=kind, object_id=object_id) for object_id in chunk])
+        recorded += len(chunk)
+    return recorded
+
+
+def schedule_changes(kind: str, ids: Iterable[int]) -> None:
+    """Record after commit, so a terminal never sees a watermark for data it cannot read yet."""
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: record_changes(kind, ids), robust=True)
+
+
+def schedule_product_changes(product_ids: Iterable[int]) -> None:
+    """Record products together with the combos they are a component of."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    def record():
+        record_changes(CatalogChange.KIND_PRODUCT, product_ids)
+        combos = Combo.objects.filter(items__product_id__in=product_ids).values_list('pk', flat=True).distinct()
+        record_changes(CatalogChange.KIND_COMBO, combos)
+
+    transaction.on_commit(record, robust=True)
+
+
+def rebuild_change_log(kinds: Iterable[str] | None = None) -> dict[str, int]:
+    """Record every existing object again, e.g. after loading data with signals disabled."""
+    return {
+        kind: record_changes(kind, FEEDS[kind].queryset().order_by('pk').values_list('pk', flat=True))
+        for kind in (kinds or FEEDS)
+    }
+
+
+def latest_watermark() -> int:
+    return CatalogChange.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def settle_seconds() -> int:
+    return max(0, int(getattr(settings, 'POS_SYNC_SETTLE_SECONDS', 5)))
+
+
+@dataclass
+class CatalogDelta:
+    since: int
+    watermark: int
+    more: bool = False
+    rows: dict[str, list[list]] = field(default_factory=dict)
+    deleted: dict[str, list[int]] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        payload = {'since': self.since, 'watermark': self.watermark, 'more': self.more}
+        for kind, feed in FEEDS.items():
+            payload[feed.name] = {'columns': feed.columns, 'rows': self.rows.get(kind, [])}
+        payload['deleted'] = {feed.name: self.deleted.get(kind, []) for kind, feed in FEEDS.items()}
+        return payload
+
+
+def catalog_delta(since: int = 0, limit: int = DEFAULT_LIMIT, *, now: datetime | None = None) -> CatalogDelta:
+    """Products, price rules and combos changed after the ``since`` watermark.
+
+    Costs one query for the page of changes plus one per kind in it, and
+    sends each object once as a positional row under its feed's
+    ``columns``; ids whose object is gone are listed under ``deleted``.
+    Changes younger than ``POS_SYNC_SETTLE_SECONDS`` are sent but the
+    watermark stops before them, because an older id can still be
+    committing alongside them; the terminal receives them again next time
+    and applies them idempotently.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    changes = list(
+        CatalogChange.objects.filter(pk__gt=since).order_by('pk')
+        .values_list('pk', 'kind', 'object_id', 'changed_at')[:limit + 1]
+    )
+    delta = CatalogDelta(since=since, watermark=since, more=len(changes) > limit)
+    changes = changes[:limit]
+    cutoff = (now or timezone.now()) - timedelta(seconds=settle_seconds())
+    wanted: dict[str, dict[int, None]] = {}
+    settled = True
+    for pk, kind, object_id, changed_at in changes:
+        settled = settled and changed_at <= cutoff
+        if settled:
+            delta.watermark = pk
+        if kind in FEEDS:
+            wanted.setdefault(kind, {})[object_id] = None
+    delta.more = delta.more and settled
+
+    for kind, ids in wanted.items():
+        feed = FEEDS[kind]
+        values = feed.queryset().filter(pk__in=list(ids)).values_list(*feed.fields)
+        rows = {row[0]: [_json(value) for value in row] for row in values}
+        if feed.extra:
+            extra = feed.extra[1](list(rows))
+            for object_id, row in rows.items():
+                row.append(extra.get(object_id, []))
+        delta.rows[kind] = [rows[object_id] for object_id in ids if object_id in rows]
+        delta.deleted[kind] = [object_id for object_id in ids if object_id not in rows]
+    return delta
+
+
+def stock_conflict_policy() -> str:
+    policy = getattr(settings, 'POS_SYNC_STOCK_POLICY', STOCK_ACCEPT)
+    if policy not in STOCK_POLICIES:
+        raise ImproperlyConfigured(f"POS_SYNC_STOCK_POLICY must be one of {', '.join(STOCK_POLICIES)}.")
+    return policy
+
+
+def available_stock(payload: list) -> dict[int, int]:
+    """Current available quantity of every stock-tracked product named in ``payload``, from the stock ledger."""
+    product_ids, skus = set(), set()
+    for invoice in payload:
+        for line in (invoice.get('lines') if isinstance(invoice, dict) else None) or []:
+            if not isinstance(line, dict):
+                continue
+            if isinstance(line.get('product'), int):
+                product_ids.add(line['product'])
+            elif isinstance(line.get('sku'), str):
+                skus.add(line['sku'])
+    if not product_ids and not skus:
+        return {}
+    tracked = list(Product.objects.filter(Q(pk__in=product_ids) | Q(sku__in=skus), track_inventory=True).values_list('pk', flat=True))
+    levels = stock_levels(tracked)
+    available = {}
+    for pk in tracked:
+        quantity, reserved = levels.get(pk, (0, 0))
+        available[pk] = max(quantity - reserved, 0)
+    return available
+
+
+@dataclass
+class SalesUpload:
+    result: IngestionResult
+    policy: str
+    stock: dict[int, int] = field(default_factory=dict)
+    watermark: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            **self.result.as_dict(),
+            'stock_policy': self.policy,
+            'stock': {str(product_id): available for product_id, available in sorted(self.stock.items())},
+            'watermark': self.watermark,
+        }
+
+
+def upload_sales(payload, *, user=None) -> SalesUpload:
+    """Apply one batch of invoices queued by an offline terminal.
+
+    Each invoice goes through bulk ingestion with the terminal's own
+    ``idempotency_key``, so a batch resent after a lost response only
+    reports duplicates. Stock conflicts follow ``POS_SYNC_STOCK_POLICY``:
+    ``accept`` books the sale that already happened at the counter and
+    flags it with a ``stock_conflict``, ``hold`` leaves the invoice pending
+    with a ``reservation_error`` for staff to resolve. The response carries
+    the available stock of the products sold and the current catalog
+    watermark so the terminal can correct its counts and decide to pull.
+    """
+    payload = clean_invoice_payload(payload)
+    policy = stock_conflict_policy()
+    result = ingest_invoices(payload, user=user, force=policy == STOCK_ACCEPT)
+    return SalesUpload(result=result, policy=policy, stock=available_stock(payload), watermark=latest_watermark())
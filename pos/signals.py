@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inventory.models import Combo, ComboItem, Product
+from inventory.services.product_import import products_imported
+from sales.models import PriceRule
+
+from .models import CatalogChange
+from .services import schedule_changes, schedule_product_changes
+
+
+# Product columns written by stock movements and image processing; terminals do not sync them.
+UNSYNCED_PRODUCT_FIELDS = frozenset({'quantity', 'reserved', 'avg_cost', 'image', 'image_renditions', 'updated_at'})
+
+
+@receiver(post_save, sender=Product)
+def on_product_saved(sender, instance: Product, raw: bool = False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and set(update_fields) <= UNSYNCED_PRODUCT_FIELDS):
+        return
+    # A price change is rolled into the combos using the product.
+    schedule_product_changes([instance.pk])
+
+
+@receiver(products_imported)
+def on_products_imported(sender, product_ids, **kwargs):
+    schedule_product_changes(product_ids)
+
+
+@receiver(post_delete, sender=Product)
+def on_product_deleted(sender, instance: Product, **kwargs):
+    schedule_changes(CatalogChange.KIND_PRODUCT, [instance.pk])
+
+
+@receiver(post_save, sender=PriceRule)
+@receiver(post_delete, sender=PriceRule)
+def on_price_rule_changed(sender, instance: PriceRule, raw: bool = False, **kwargs):
+    if raw:
+        return
+    schedule_changes(CatalogChange.KIND_PRICE_RULE, [instance.pk])
+
+
+@receiver(post_save, sender=Combo)
+@receiver(post_delete, sender=Combo)
+def on_combo_changed(sender, instance: Combo, raw: bool = False, **kwargs):
+    if raw:
+        return
+    schedule_changes(CatalogChange.KIND_COMBO, [instance.pk])
+
+
+@receiver(post_save, sender=ComboItem)
+@receiver(post_delete, sender=ComboItem)
+def on_combo_item_changed(sender, instance: ComboItem, raw: bool = False, **kwargs):
+    if raw:
+        return
+    schedule_changes(CatalogChange.KIND_COMBO, [instance.combo_id])
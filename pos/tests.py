@@ -0,0 +1,191 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+import requests
+from django.contrib.auth import get_user_model
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer
+from inventory.models import Combo, ComboItem, Product
+from inventory.services import import_products, read_product_rows
+from sales.models import Invoice, PriceRule
+
+from .client import PosSyncClient
+from .models import CatalogChange
+from .services import catalog_delta, upload_sales
+
+
+def rows_by_id(delta, feed):
+    payload = delta.as_dict()[feed]
+    return {row[0]: dict(zip(payload['columns'], row)) for row in payload['rows']}
+
+
+@override_settings(POS_SYNC_SETTLE_SECONDS=0)
+class CatalogDeltaTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paper = Product.objects.create(name='Paper', sku='PPR-1', price=Decimal('5.00'), quantity=10)
+            self.toner = Product.objects.create(name='Toner', sku='TNR-1', price=Decimal('40.00'), quantity=3)
+            self.pens = Product.objects.create(name='Pens', sku='PEN-1', price=Decimal('2.00'))
+            self.combo = Combo.objects.create(name='Office Pack', code='office-pack')
+            ComboItem.objects.create(combo=self.combo, product=self.paper, quantity=2)
+            ComboItem.objects.create(combo=self.combo, product=self.toner, quantity=1)
+            self.rule = PriceRule.objects.create(name='Paper promo', product=self.paper, value=Decimal('10'))
+
+    def test_full_then_delta_download_sends_only_what_changed(self):
+        first = catalog_delta(0)
+        self.assertEqual(set(rows_by_id(first, 'products')), {self.paper.pk, self.toner.pk, self.pens.pk})
+        combo = rows_by_id(first, 'combos')[self.combo.pk]
+        self.assertEqual((combo['final_price'], combo['items']), ('50.00', [[self.paper.pk, 2], [self.toner.pk, 1]]))
+        self.assertEqual(rows_by_id(first, 'price_rules')[self.rule.pk]['product'], self.paper.pk)
+        # The log keeps one row per object however often it was saved.
+        self.assertEqual(CatalogChange.objects.count(), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.toner.pk).get().save(update_fields=['quantity'])
+        self.assertEqual(catalog_delta(first.watermark).as_dict()['products']['rows'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toner.price = Decimal('45.00')
+            self.toner.save()
+            rule_id = self.rule.pk
+            self.rule.delete()
+        second = catalog_delta(first.watermark)
+        self.assertEqual(list(rows_by_id(second, 'products')), [self.toner.pk])
+        self.assertEqual(rows_by_id(second, 'combos')[self.combo.pk]['final_price'], '55.00')
+        self.assertEqual(second.as_dict()['deleted']['price_rules'], [rule_id])
+        self.assertEqual(catalog_delta(second.watermark).as_dict()['combos']['rows'], [])
+
+    def test_pages_are_fetched_with_a_constant_number_of_queries(self):
+        # The page of changes, then one query per kind in it (plus combo components).
+        with self.assertNumQueries(4):
+            delta = catalog_delta(0, limit=4)
+        self.assertTrue(delta.more)
+        with self.assertNumQueries(2):
+            rest = catalog_delta(delta.watermark, limit=4)
+        self.assertFalse(rest.more)
+        self.assertEqual(len(rows_by_id(delta, 'products')) + len(rows_by_id(rest, 'products')), 3)
+
+    @override_settings(POS_SYNC_SETTLE_SECONDS=60)
+    def test_watermark_stops_before_changes_that_may_still_be_committing(self):
+        settled = timezone.now() - timedelta(minutes=5)
+        CatalogChange.objects.exclude(kind=CatalogChange.KIND_PRICE_RULE).update(changed_at=settled)
+        delta = catalog_delta(0)
+        self.assertEqual(delta.watermark, CatalogChange.objects.get(kind=CatalogChange.KIND_COMBO).pk)
+        self.assertIn(self.rule.pk, rows_by_id(delta, 'price_rules'))
+        self.assertIn(self.rule.pk, rows_by_id(catalog_delta(delta.watermark), 'price_rules'))
+
+    def test_product_import_is_recorded(self):
+        csv = 'SKU,Name,Price\nPPR-1,Paper A4,6.00\nINK-1,Ink,9.00\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            import_products(read_product_rows(io.BytesIO(csv.encode('utf-8')), filename='catalog.csv'))
+        latest = CatalogChange.objects.order_by('-pk')[:3].values_list('kind', 'object_id')
+        ink = Product.objects.get(sku='INK-1')
+        self.assertEqual(
+            set(latest),
+            {(CatalogChange.KIND_PRODUCT, self.paper.pk), (CatalogChange.KIND_PRODUCT, ink.pk), (CatalogChange.KIND_COMBO, self.combo.pk)},
+        )
+
+    def test_api_requires_login_and_checks_parameters(self):
+        url = reverse('ims:pos:catalog_delta_api')
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        self.client.force_login(get_user_model().objects.create_user(username='till-1', password='safe-pass'))
+        self.assertEqual(self.client.get(url, {'since': 'x'}).status_code, 400)
+        body = self.client.get(url, {'since': 0}).json()
+        self.assertEqual(body['products']['columns'][:3], ['id', 'sku', 'name'])
+        self.assertFalse(body['more'])
+
+
+class SalesUploadTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.user = get_user_model().objects.create_user(username='till-1', password='safe-pass')
+        self.toner = Product.objects.create(name='Toner', sku='TNR-1', price=Decimal('40.00'), quantity=2)
+
+    def sale(self, key, quantity):
+        return {
+            'idempotency_key': key,
+            'customer': self.customer.pk,
+            'lines': [{'sku': 'TNR-1', 'quantity': quantity}],
+            'payments': [{'amount': str(Decimal('40.00') * quantity)}],
+        }
+
+    def test_accept_policy_books_oversold_sales_and_reports_stock(self):
+        self.client.force_login(self.user)
+        url = reverse('ims:pos:sales_upload_api')
+        payload = {'invoices': [self.sale('till-1-1', 1), self.sale('till-1-2', 2)]}
+        with self.captureOnCommitCallbacks(execute=True):
+            body = self.client.post(url, payload, content_type='application/json').json()
+        self.assertEqual([row['status'] for row in body['created']], [Invoice.PAID, Invoice.PAID])
+        self.assertIsNone(body['created'][0]['stock_conflict'])
+        self.assertIn('TNR-1: need 2, available 1', body['created'][1]['stock_conflict'])
+        self.assertEqual((body['stock_policy'], body['stock']), ('accept', {str(self.toner.pk): 0}))
+
+        again = self.client.post(url, payload, content_type='application/json').json()
+        self.assertEqual((again['created'], len(again['duplicates'])), ([], 2))
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    @override_settings(POS_SYNC_STOCK_POLICY='hold')
+    def test_hold_policy_leaves_conflicting_sales_pending(self):
+        # The derived product columns may lag; stock is judged and reported from the ledger.
+        Product.objects.filter(pk=self.toner.pk).update(quantity=99)
+        upload = upload_sales([self.sale('till-1-1', 3)], user=self.user).as_dict()
+        self.assertEqual(upload['created'][0]['status'], Invoice.PENDING)
+        self.assertIn('Insufficient stock', upload['created'][0]['reservation_error'])
+        self.assertIsNone(upload['created'][0]['stock_conflict'])
+        self.assertEqual(upload['stock'], {str(self.toner.pk): 2})
+
+
+@override_settings(POS_SYNC_SETTLE_SECONDS=0)
+class PosSyncClientTests(LiveServerTestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='till-1', password='safe-pass')
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.toner = Product.objects.create(name='Toner', sku='TNR-1', price=Decimal('40.00'), quantity=5)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.state_path = os.path.join(self.directory, 'till-1.json')
+
+    def client_for(self, url=None):
+        return PosSyncClient(url or self.live_server_url, auth=('till-1', 'safe-pass'), state_path=self.state_path, batch_size=2)
+
+    def test_offline_sales_are_queued_and_synced_in_batches(self):
+        client = self.client_for()
+        client.pull()
+        self.assertEqual(client.product('TNR-1')['price'], '40.00')
+
+        offline = self.client_for('http://127.0.0.1:9')
+        toner = offline.product('TNR-1')
+        # Lines carry the price charged at the counter, which the catalog may have changed since.
+        keys = [
+            offline.queue_invoice({
+                'customer': self.customer.pk,
+                'lines': [{'product': toner['id'], 'quantity': 1, 'unit_price': toner['price']}],
+                'payments': [{'amount': '40.00'}],
+            })
+            for _ in range(3)
+        ]
+        with self.assertRaises(requests.ConnectionError):
+            offline.push()
+        self.assertEqual(len(offline.state.queue), 3)
+
+        self.toner.price = Decimal('42.00')
+        self.toner.save()
+        client = self.client_for()
+        result = client.sync()
+        self.assertEqual(sorted(row['idempotency_key'] for row in result.created), sorted(keys))
+        self.assertEqual((client.state.queue, client.state.stock), ([], {str(self.toner.pk): 2}))
+        self.assertEqual(client.product('TNR-1')['price'], '42.00')
+        self.assertEqual(Invoice.objects.filter(status=Invoice.PAID).count(), 3)
+
+        # A lost response is harmless: resending the same invoices only yields duplicates.
+        for key in keys:
+            client.queue_invoice({'idempotency_key': key, 'customer': self.customer.pk, 'lines': [{'sku': 'TNR-1', 'quantity': 1}]})
+        self.assertEqual(len(client.push().duplicates), 3)
+        self.assertEqual(Invoice.objects.count(), 3)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .api import CatalogDeltaAPIView, SalesUploadAPIView
+
+app_name = 'pos'
+
+urlpatterns = [
+    path('api/catalog/', CatalogDeltaAPIView.as_view(), name='catalog_delta_api'),
+    path('api/sales/', SalesUploadAPIView.as_view(), name='sales_upload_api'),
+]
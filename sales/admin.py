@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
 from .models import (
     Quotation,
@@ -8,6 +8,7 @@ from .models import (
     PriceRule,
     StockReservation,
 )
+from .services.conversion import convert_quotations
 
 
 class DocumentLineInline(admin.TabularInline):
@@ -22,6 +23,15 @@ class QuotationAdmin(admin.ModelAdmin):
     inlines = [DocumentLineInline]
     list_display = ('number', 'customer', 'date', 'status', 'total')
     search_fields = ('number', 'customer__name')
+    actions = ['convert_to_invoices']
+
+    @admin.action(description='Convert selected quotations to invoices')
+    def convert_to_invoices(self, request, queryset):
+        result = convert_quotations(queryset.order_by('pk').values_list('pk', flat=True), user=request.user)
+        if result.invoices:
+            self.message_user(request, f"Converted {len(result.invoices)} quotations.", messages.SUCCESS)
+        for quotation_id, error in {**result.failed, **result.unreserved}.items():
+            self.message_user(request, f"Quotation {quotation_id}: {error}", messages.WARNING)
 
 
 @admin.register(Invoice)
@@ -39,8 +49,8 @@ class PaymentAdmin(admin.ModelAdmin):
 
 @admin.register(PriceRule)
 class PriceRuleAdmin(admin.ModelAdmin):
-    list_display = ('name', 'scope', 'value_type', 'value', 'is_active', 'start_at', 'end_at')
-    list_filter = ('scope', 'value_type', 'is_active')
+    list_display = ('name', 'rule_type', 'scope', 'value_type', 'value', 'min_qty', 'stackable', 'is_active', 'start_at', 'end_at')
+    list_filter = ('rule_type', 'scope', 'value_type', 'stackable', 'is_active')
 
 
 @admin.register(StockReservation)
@@ -5,6 +5,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from sales.models import DocumentLine
+from sales.services import StockService
+from sales.services.conversion import QuotationConversionError, clean_quotation_ids, convert_quotations
+from sales.services.ingestion import InvoiceIngestionError, ingest_invoices
 from inventory.models import ProductUnit, Product
 
 
@@ -48,13 +51,38 @@ class InvoiceLineSerialAPIView(APIView):
         for unit in units:
             if unit.status not in (ProductUnit.STATUS_AVAILABLE, ProductUnit.STATUS_RESERVED) and unit.sale_line_id != line.id:
                 return Response({'detail': f'Serial {unit.serial_number} is not available.'}, status=status.HTTP_400_BAD_REQUEST)
-        ProductUnit.objects.filter(sale_line=line).exclude(serial_number__in=cleaned).update(
-            sale_line=None,
-            status=ProductUnit.STATUS_AVAILABLE,
-            sold_at=None,
-        )
-        for unit in units:
-            unit.sale_line = line
-            unit.status = ProductUnit.STATUS_RESERVED
-            unit.save(update_fields=['sale_line', 'status', 'updated_at'])
+        StockService.assign_serials(line, units, actor=request.user)
         return Response({'assigned_serials': cleaned})
+
+
+class QuotationConversionAPIView(APIView):
+    """Convert one or many quotations to invoices; failures are reported per quotation."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            quotation_ids = clean_quotation_ids(request.data.get('quotation_ids'))
+        except QuotationConversionError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        force = str(request.data.get('force', '')).lower() in {'1', 'true', 'yes'}
+        result = convert_quotations(quotation_ids, user=request.user, force=force)
+        return Response(result.as_dict())
+
+
+class InvoiceIngestionAPIView(APIView):
+    """Create many invoices with lines, payments and serials in one call, e.g. a POS day close.
+
+    Each invoice carries a client ``idempotency_key`` so a retried push
+    returns the invoices created the first time instead of duplicating them.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        force = str(request.data.get('force', '')).lower() in {'1', 'true', 'yes'}
+        try:
+            result = ingest_invoices(request.data.get('invoices'), user=request.user, force=force)
+        except InvoiceIngestionError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict())
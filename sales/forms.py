@@ -5,6 +5,7 @@ from django.db.models import Q
 
 from .models import Quotation, Invoice, Payment, DocumentLine
 from inventory.models import Combo, ProductUnit
+from inventory.services.combos import combo_picker_options
 
 
 class QuotationForm(forms.ModelForm):
@@ -67,6 +68,10 @@ class ComboSelectionForm(forms.Form):
     combo = forms.ModelChoiceField(queryset=Combo.objects.filter(is_active=True))
     quantity = forms.IntegerField(min_value=1, initial=1)
 
+    def picker_options(self):
+        """Cached option data, so the picker renders with the page instead of in a request of its own."""
+        return combo_picker_options()
+
 
 class PaymentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from sales.services.statements import STATEMENT_CHUNK_SIZE, STATEMENT_FORMATS, generate_statements, statement_workers
+
+
+class Command(BaseCommand):
+    help = "Write HTML/PDF statements for every customer with invoices or payments in a period (default: last month)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day of the period (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day of the period (YYYY-MM-DD)')
+        parser.add_argument('--customer', type=int, action='append', dest='customers', help='Limit to this customer id (repeatable)')
+        parser.add_argument('--format', action='append', dest='formats', choices=STATEMENT_FORMATS, help='Output format (repeatable, default both)')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default STATEMENT_WORKERS or CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=STATEMENT_CHUNK_SIZE)
+
+    def _date(self, value, name):
+        try:
+            parsed = parse_date(value) if value else None
+        except ValueError:
+            # Well-formed but impossible, e.g. 2026-02-30.
+            parsed = None
+        if value and parsed is None:
+            raise CommandError(f'--{name} must be a date in YYYY-MM-DD format.')
+        return parsed
+
+    def handle(self, *args, **options):
+        last_month_end = timezone.localdate().replace(day=1) - timedelta(days=1)
+        end = self._date(options['end'], 'end') or last_month_end
+        start = self._date(options['start'], 'start') or end.replace(day=1)
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        result = generate_statements(
+            start,
+            end,
+            customer_ids=options['customers'],
+            formats=tuple(options['formats'] or STATEMENT_FORMATS),
+            workers=options['workers'] or statement_workers(),
+            chunk_size=options['chunk_size'],
+        )
+        if not result.customers:
+            self.stdout.write(f"No customer activity between {start} and {end}.")
+            return
+        for customer_id, error in result.failed.items():
+            self.stderr.write(f"Customer {customer_id}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(result.files)} statement file(s) for {result.customers - len(result.failed)} of "
+            f"{result.customers} customer(s), {start} to {end}."
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from sales.services.overdue import mark_overdue_invoices
+
+
+class Command(BaseCommand):
+    help = "Mark unpaid pending invoices past their due date as overdue (run daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='Treat this date (YYYY-MM-DD) as today')
+        parser.add_argument('--window-days', type=int, default=None, help='Days of due dates per UPDATE (default OVERDUE_WINDOW_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the invoices that would be flipped')
+
+    def handle(self, *args, **options):
+        try:
+            as_of = parse_date(options['as_of']) if options['as_of'] else None
+        except ValueError:
+            # Well-formed but impossible, e.g. 2026-02-30.
+            as_of = None
+        if options['as_of'] and as_of is None:
+            raise CommandError('--as-of must be a date in YYYY-MM-DD format.')
+        if options['window_days'] is not None and options['window_days'] < 1:
+            raise CommandError('--window-days must be at least 1.')
+        result = mark_overdue_invoices(as_of, window_days=options['window_days'], dry_run=options['dry_run'])
+        if options['verbosity'] > 1:
+            for start, end, count in result.windows:
+                self.stdout.write(f"Due {start} to {end}: {count}")
+        if result.dry_run:
+            self.stdout.write(f"Dry run: {result.flipped} invoice(s) would become overdue as of {result.as_of}.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {result.flipped} invoice(s) overdue as of {result.as_of}; {result.overdue} overdue in total."
+        ))
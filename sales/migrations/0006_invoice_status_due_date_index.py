@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('sales', '0005_remove_comboitem_combo_alter_documentline_combo_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'due_date'], name='sales_invoi_status_852738_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_invoice_status_due_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -13,6 +13,15 @@ def next_number(model, prefix):
     last = model.objects.order_by('-id').first()
     n = (last.id + 1) if last else 1
     return f"{prefix}{n:05d}"
+
+
+def next_numbers(model, prefix, count):
+    """``count`` consecutive numbers following :func:`next_number`, for bulk creation."""
+    last = model.objects.order_by('-id').values_list('id', flat=True).first()
+    start = (last or 0) + 1
+    return [f"{prefix}{n:05d}" for n in range(start, start + count)]
+
+
 MONEY_QUANT = Decimal('0.01')
 
 
@@ -112,6 +121,13 @@ class Invoice(models.Model):
     quotation = models.ForeignKey(Quotation, null=True, blank=True, on_delete=models.SET_NULL)
     notes = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    # Client-supplied key of invoices pushed through the ingestion API; a retried push is recognised by it.
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'due_date']),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.number:
@@ -1 +1,46 @@
-"""Deprecated combo serializers. Use inventory.serializers.ComboSerializer instead."""
+"""Serializers for the sales API.
+
+The deprecated combo serializers were replaced by inventory.serializers.ComboSerializer.
+Ingestion serializers only check the shape of each invoice; products,
+customers and serials are looked up together by the ingestion service.
+"""
+from decimal import Decimal
+
+from rest_framework import serializers
+
+
+class IngestLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField(required=False, min_value=1)
+    sku = serializers.CharField(required=False, max_length=64)
+    description = serializers.CharField(required=False, allow_blank=True, max_length=255, default='')
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    unit_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    tax_rate_percent = serializers.DecimalField(max_digits=5, decimal_places=2, required=False, min_value=Decimal('0'))
+    serials = serializers.ListField(child=serializers.CharField(max_length=120), required=False, default=list)
+
+    def validate(self, attrs):
+        if 'product' in attrs and 'sku' in attrs:
+            raise serializers.ValidationError('Give either product or sku, not both.')
+        if 'product' not in attrs and 'sku' not in attrs:
+            if not attrs.get('description') or 'unit_price' not in attrs:
+                raise serializers.ValidationError('Lines without a product need a description and unit_price.')
+            if attrs.get('serials'):
+                raise serializers.ValidationError('Serials can only be given for product lines.')
+        return attrs
+
+
+class IngestPaymentSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    method = serializers.CharField(max_length=50, required=False, default='Cash')
+    date = serializers.DateField(required=False)
+    note = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+
+
+class IngestInvoiceSerializer(serializers.Serializer):
+    idempotency_key = serializers.CharField(max_length=100)
+    customer = serializers.IntegerField(min_value=1)
+    date = serializers.DateField(required=False)
+    due_date = serializers.DateField(required=False, allow_null=True, default=None)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    lines = IngestLineSerializer(many=True, allow_empty=False)
+    payments = IngestPaymentSerializer(many=True, required=False, default=list)
@@ -5,11 +5,16 @@ from decimal import Decimal
 from typing import Optional
 
 from django.db import transaction
-from django.db.models import Sum, Q
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 
-from inventory.models import Product, ProductUnit
-from sales.models import Invoice, StockReservation, PriceRule
+from inventory.models import Product, ProductUnit, ProductUnitEvent
+from inventory.services.combos import invalidate_combo_availability
+from inventory.services.stock_balances import apply_stock_deltas, stock_levels
+from sales.models import DocumentLine, Invoice, StockReservation
+from sales.services.pricing import PricedLine, apply_cart_rules, price_rule_engine
+from search.models import SearchDocument
+from search.services import schedule_index
 
 
 @dataclass
@@ -23,89 +28,261 @@ class PricingResult:
 class PricingService:
     @staticmethod
     def apply_best_rule(product: Product, qty: int, base_price: Decimal) -> PricingResult:
-        now = timezone.now()
-        qs = PriceRule.objects.filter(is_active=True).filter(
-            Q(product__isnull=True) | Q(product=product) | Q(category=product.category)
+        priced = price_rule_engine().price_line(product, qty, base_price)
+        return PricingResult(
+            priced.unit_price,
+            priced.discount,
+            Decimal('0'),
+            priced.rules[0].id if priced.rules else None,
         )
-        qs = qs.filter(min_qty__lte=qty)
-        qs = qs.filter(Q(start_at__isnull=True) | Q(start_at__lte=now))
-        qs = qs.filter(Q(end_at__isnull=True) | Q(end_at__gte=now))
-
-        best: Optional[PriceRule] = None
-        best_saving = Decimal('0')
-        for r in qs:
-            saving = PricingService._saving_for_rule(r, base_price)
-            if saving > best_saving:
-                best_saving = saving
-                best = r
-        if best is None:
-            return PricingResult(base_price, Decimal('0'), Decimal('0'), None)
-        if best.value_type == PriceRule.PERCENT:
-            return PricingResult(base_price, Decimal('0'), Decimal(best.value), best.id)
-        else:
-            return PricingResult(base_price, Decimal(best.value), Decimal('0'), best.id)
 
     @staticmethod
-    def _saving_for_rule(rule: PriceRule, base_price: Decimal) -> Decimal:
-        if rule.value_type == PriceRule.PERCENT:
-            return (Decimal(rule.value) / Decimal('100')) * base_price
-        else:
-            return Decimal(rule.value)
+    def price_lines(lines) -> list[PricedLine]:
+        """Price many ``(product, qty, base_price)`` lines against the compiled rules."""
+        return price_rule_engine().price_lines(lines)
 
 
 class StockService:
+    @staticmethod
+    def _lock_products(product_ids) -> dict[int, Product]:
+        """Lock products in one query, always in pk order so concurrent callers cannot deadlock."""
+        products = Product.objects.select_for_update().filter(pk__in=list(product_ids)).order_by('pk')
+        return {product.pk: product for product in products.only('id', 'sku', 'quantity', 'reserved')}
+
+    @staticmethod
+    def _write_products(products, deltas: dict[int, tuple[int, int]]) -> None:
+        """Persist locked products in one grouped UPDATE and mirror ``deltas`` into the stock ledger."""
+        now = timezone.now()
+        for product in products:
+            product.updated_at = now
+        Product.objects.bulk_update(products, ['quantity', 'reserved', 'updated_at'])
+        apply_stock_deltas(deltas)
+        invalidate_combo_availability()
+
     @staticmethod
     @transaction.atomic
     def reserve_stock(invoice: Invoice, force: bool = False) -> None:
-        for line in invoice.items.select_related('product'):
-            product = line.product
-            if not product or not product.track_inventory:
-                continue
-            qty = int(line.quantity)
-            product = Product.objects.select_for_update().get(pk=product.pk)
-            available = (product.quantity or 0) - (product.reserved or 0)
-            if available < qty and not force:
-                raise ValueError(f"Insufficient stock for {product.sku}: need {qty}, available {available}")
-            res, _ = StockReservation.objects.get_or_create(invoice=invoice, product=product, defaults={'quantity': 0})
-            delta = qty - res.quantity
-            if delta != 0:
-                res.quantity = qty
-                res.save()
+        """Bring the invoice's reservations in line with its product lines.
+
+        Quantities are summed per product and compared with the existing
+        reservations in memory; only products whose reservation changes are
+        locked and written.
+        """
+        # Serialise reservation runs for one invoice before touching any product.
+        list(Invoice.objects.select_for_update().filter(pk=invoice.pk).values_list('pk', flat=True))
+        wanted = {
+            row['product_id']: int(row['qty'])
+            for row in invoice.items.filter(product__track_inventory=True)
+            .order_by().values('product_id').annotate(qty=Sum('quantity'))
+            if row['product_id']
+        }
+        existing = {res.product_id: res for res in StockReservation.objects.filter(invoice=invoice)}
+        deltas = {
+            product_id: wanted.get(product_id, 0) - (existing[product_id].quantity if product_id in existing else 0)
+            for product_id in set(wanted) | set(existing)
+        }
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        products = StockService._lock_products(deltas)
+        if not force:
+            # The stock ledger is authoritative; Product.reserved may lag shop checkouts.
+            growing = sorted(product_id for product_id, delta in deltas.items() if delta > 0 and product_id in products)
+            levels = stock_levels(growing)
+            short = []
+            for product_id in growing:
+                on_hand, reserved = levels.get(product_id, (0, 0))
+                available = on_hand - reserved
+                if deltas[product_id] > available:
+                    short.append(f"{products[product_id].sku}: need {deltas[product_id]} more, available {available}")
+            if short:
+                raise ValueError("Insufficient stock for " + '; '.join(short))
+
+        created, changed, dropped = [], [], []
+        for product_id, delta in deltas.items():
+            quantity = wanted.get(product_id, 0)
+            res = existing.get(product_id)
+            if res is None:
+                created.append(StockReservation(invoice=invoice, product_id=product_id, quantity=quantity))
+            elif quantity:
+                res.quantity = quantity
+                changed.append(res)
+            else:
+                dropped.append(res.pk)
+            product = products.get(product_id)
+            if product is not None:
                 product.reserved = (product.reserved or 0) + delta
-                product.save(update_fields=['reserved'])
+        if created:
+            StockReservation.objects.bulk_create(created)
+        if changed:
+            StockReservation.objects.bulk_update(changed, ['quantity'])
+        if dropped:
+            StockReservation.objects.filter(pk__in=dropped).delete()
+        StockService._write_products(
+            list(products.values()), {product_id: (0, delta) for product_id, delta in deltas.items()},
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def reserve_new_invoices(invoice_ids, force: bool = False, oversold: dict[int, str] | None = None) -> dict[int, str]:
+        """Reserve stock for invoices that hold no reservations yet, in one pass.
+
+        The products of every invoice are locked together in pk order and
+        allocated invoice by invoice. An invoice that cannot be covered in
+        full reserves nothing; its shortfall is returned keyed by invoice id.
+        With ``force`` it is reserved anyway, and the shortfall goes into
+        ``oversold`` when a dict is passed.
+        """
+        invoice_ids = list(invoice_ids)
+        wanted: dict[int, dict[int, int]] = {}
+        rows = (
+            DocumentLine.objects.filter(invoice_id__in=invoice_ids, product__track_inventory=True)
+            .order_by().values('invoice_id', 'product_id').annotate(qty=Sum('quantity'))
+        )
+        for row in rows:
+            wanted.setdefault(row['invoice_id'], {})[row['product_id']] = int(row['qty'])
+        product_ids = {product_id for lines in wanted.values() for product_id in lines}
+        if not product_ids:
+            return {}
+
+        products = StockService._lock_products(product_ids)
+        free = {product_id: on_hand - reserved for product_id, (on_hand, reserved) in stock_levels(product_ids).items()}
+        reservations, deltas, shortfalls = [], {}, {}
+        for invoice_id in invoice_ids:
+            lines = wanted.get(invoice_id, {})
+            short = [
+                f"{products[product_id].sku}: need {qty}, available {max(free.get(product_id, 0), 0)}"
+                for product_id, qty in sorted(lines.items())
+                if qty > free.get(product_id, 0)
+            ]
+            if short and not force:
+                shortfalls[invoice_id] = "Insufficient stock for " + '; '.join(short)
+                continue
+            if short and oversold is not None:
+                oversold[invoice_id] = "Oversold " + '; '.join(short)
+            for product_id, qty in lines.items():
+                free[product_id] = free.get(product_id, 0) - qty
+                deltas[product_id] = deltas.get(product_id, 0) + qty
+                reservations.append(StockReservation(invoice_id=invoice_id, product_id=product_id, quantity=qty))
+        if not reservations:
+            return shortfalls
+        for product_id, delta in deltas.items():
+            products[product_id].reserved = (products[product_id].reserved or 0) + delta
+        StockReservation.objects.bulk_create(reservations, batch_size=500)
+        StockService._write_products(
+            [products[product_id] for product_id in deltas], {product_id: (0, delta) for product_id, delta in deltas.items()},
+        )
+        return shortfalls
 
     @staticmethod
     @transaction.atomic
     def release_reservation(invoice: Invoice) -> None:
-        for res in StockReservation.objects.select_for_update().filter(invoice=invoice).select_related('product'):
-            product = Product.objects.select_for_update().get(pk=res.product_id)
-            product.reserved = max(0, (product.reserved or 0) - int(res.quantity))
-            product.save(update_fields=['reserved'])
-        StockReservation.objects.filter(invoice=invoice).delete()
-        ProductUnit.objects.filter(sale_line__invoice=invoice, status=ProductUnit.STATUS_RESERVED).update(
+        reservations = dict(
+            StockReservation.objects.filter(invoice=invoice).order_by().values('product_id')
+            .annotate(qty=Sum('quantity')).values_list('product_id', 'qty')
+        )
+        if reservations:
+            products = StockService._lock_products(reservations)
+            deltas = {}
+            for product_id, product in products.items():
+                released = min(int(reservations[product_id]), product.reserved or 0)
+                product.reserved = (product.reserved or 0) - released
+                deltas[product_id] = (0, -released)
+            StockReservation.objects.filter(invoice=invoice).delete()
+            StockService._write_products(list(products.values()), deltas)
+        StockService.release_units(
+            ProductUnit.objects.filter(sale_line__invoice=invoice, status=ProductUnit.STATUS_RESERVED)
+        )
+
+    @staticmethod
+    def release_units(units_qs, actor=None) -> int:
+        """Return units to stock and log a RELEASED event for each one."""
+        released = list(units_qs.only('id', 'sale_line_id', 'landed_cost'))
+        if not released:
+            return 0
+        ProductUnit.objects.filter(pk__in=[unit.pk for unit in released]).update(
             sale_line=None,
             status=ProductUnit.STATUS_AVAILABLE,
             sold_at=None,
+            updated_at=timezone.now(),
         )
+        # Status changes made with update() skip the save signals that keep the search index current.
+        schedule_index(SearchDocument.KIND_SERIAL, [unit.pk for unit in released])
+        ProductUnitEvent.record(released, ProductUnitEvent.EVENT_RELEASED, actor=actor)
+        return len(released)
 
     @staticmethod
     @transaction.atomic
-    def finalize_sale(invoice: Invoice) -> None:
-        serial_lines = invoice.items.select_related('product').filter(product__tracking_mode=Product.TRACK_SERIAL)
-        for line in serial_lines:
-            required = int(line.quantity)
-            units = list(ProductUnit.objects.select_for_update().filter(sale_line=line))
-            if len(units) != required:
-                raise ValueError(f'{line.product} requires {required} serial numbers before finalizing.')
-            for unit in units:
-                unit.mark_sold(line)
-        for res in StockReservation.objects.select_for_update().filter(invoice=invoice).select_related('product'):
-            product = Product.objects.select_for_update().get(pk=res.product_id)
-            qty = int(res.quantity)
+    def assign_serials(line, units, actor=None) -> None:
+        """Reserve exactly ``units`` for ``line``, releasing any others previously assigned."""
+        selected_ids = [unit.pk for unit in units]
+        StockService.release_units(
+            ProductUnit.objects.filter(sale_line=line).exclude(pk__in=selected_ids), actor=actor
+        )
+        newly_reserved = [unit for unit in units if unit.sale_line_id != line.pk or unit.status != ProductUnit.STATUS_RESERVED]
+        ProductUnit.objects.filter(pk__in=selected_ids).update(
+            sale_line=line,
+            status=ProductUnit.STATUS_RESERVED,
+            updated_at=timezone.now(),
+        )
+        schedule_index(SearchDocument.KIND_SERIAL, [unit.pk for unit in newly_reserved])
+        ProductUnitEvent.record(newly_reserved, ProductUnitEvent.EVENT_RESERVED, sale_line=line, actor=actor)
+
+    @staticmethod
+    def check_serial_counts(invoice: Invoice) -> None:
+        """Raise unless every serial-tracked line has exactly as many units as its quantity."""
+        short = list(
+            invoice.items.filter(product__tracking_mode=Product.TRACK_SERIAL)
+            .annotate(assigned=Count('product_units'))
+            .exclude(assigned=F('quantity'))
+            .select_related('product')
+            .order_by('id')
+        )
+        if short:
+            raise ValueError(' '.join(
+                f'{line.product} requires {int(line.quantity)} serial numbers before finalizing.' for line in short
+            ))
+
+    @staticmethod
+    @transaction.atomic
+    def finalize_sale(invoice: Invoice, actor=None) -> None:
+        """Mark the invoice's units sold and turn its reservations into stock out, in a fixed number of queries."""
+        StockService.check_serial_counts(invoice)
+        StockService._finalize([invoice.pk], actor)
+
+    @staticmethod
+    @transaction.atomic
+    def finalize_sales(invoice_ids, actor=None) -> None:
+        """Finalize many invoices together; their serial counts must already have been checked."""
+        StockService._finalize(list(invoice_ids), actor)
+
+    @staticmethod
+    def _finalize(invoice_ids: list[int], actor=None) -> None:
+        now = timezone.now()
+        units = ProductUnit.objects.filter(sale_line__invoice_id__in=invoice_ids, status=ProductUnit.STATUS_RESERVED)
+        sold = list(units.select_for_update().order_by('pk').only('id', 'sale_line_id', 'landed_cost'))
+        if sold:
+            units.update(status=ProductUnit.STATUS_SOLD, sold_at=now, updated_at=now)
+            schedule_index(SearchDocument.KIND_SERIAL, [unit.pk for unit in sold])
+            ProductUnitEvent.record(sold, ProductUnitEvent.EVENT_SOLD, actor=actor, at=now)
+
+        reservations = StockReservation.objects.filter(invoice_id__in=invoice_ids)
+        totals = dict(
+            reservations.order_by().values('product_id').annotate(qty=Sum('quantity')).values_list('product_id', 'qty')
+        )
+        if not totals:
+            return
+        products = StockService._lock_products(totals)
+        deltas = {}
+        for product_id, product in products.items():
+            qty = int(totals[product_id])
+            released = min(qty, max(product.reserved or 0, 0))
             product.quantity = (product.quantity or 0) - qty
-            product.reserved = max(0, (product.reserved or 0) - qty)
-            product.save(update_fields=['quantity', 'reserved'])
-        StockReservation.objects.filter(invoice=invoice).delete()
+            product.reserved = (product.reserved or 0) - released
+            deltas[product_id] = (-qty, -released)
+        reservations.delete()
+        StockService._write_products(list(products.values()), deltas)
 
     @staticmethod
     def amount_paid(invoice: Invoice):
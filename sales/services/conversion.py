@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from sales.models import DocumentLine, Invoice, Quotation, next_numbers
+from sales.services import StockService
+from search.models import SearchDocument
+from search.services import schedule_index
+
+
+LINE_BATCH_SIZE = 1000
+LINE_FIELDS = ('product_id', 'combo_id', 'description', 'quantity', 'unit_price', 'tax_rate_percent', 'line_total')
+
+
+class QuotationConversionError(ValidationError):
+    """Raised when a conversion request itself is malformed."""
+
+
+@dataclass
+class ConversionResult:
+    invoices: dict[int, int] = field(default_factory=dict)
+    failed: dict[int, str] = field(default_factory=dict)
+    unreserved: dict[int, str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            'converted': [
+                {'quotation': quotation_id, 'invoice': invoice_id, 'reservation_error': self.unreserved.get(quotation_id)}
+                for quotation_id, invoice_id in self.invoices.items()
+            ],
+            'failed': [{'quotation': quotation_id, 'error': error} for quotation_id, error in self.failed.items()],
+        }
+
+
+def clean_quotation_ids(values) -> list[int]:
+    if not isinstance(values, (list, tuple)) or not values:
+        raise QuotationConversionError('quotation_ids must be a non-empty list.')
+    try:
+        ids = [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise QuotationConversionError('quotation_ids must contain integers.')
+    return list(dict.fromkeys(ids))
+
+
+@transaction.atomic
+def convert_quotations(quotation_ids: Iterable[int], *, user=None, reserve: bool = True, force: bool = False) -> ConversionResult:
+    """Turn quotations into invoices in bulk.
+
+    Missing, already converted and empty quotations are reported in
+    ``failed`` and skipped; the rest are converted together with one bulk
+    insert per table and a single reservation pass. A converted invoice
+    whose stock cannot be reserved keeps no reservations and is listed in
+    ``unreserved``, matching the single conversion from the quotation page.
+    """
+    quotation_ids = list(dict.fromkeys(quotation_ids))
+    result = ConversionResult()
+    quotations = {
+        quotation.pk: quotation
+        for quotation in Quotation.objects.select_for_update().filter(pk__in=quotation_ids).order_by('pk')
+    }
+    lines: dict[int, list[dict]] = {}
+    for row in DocumentLine.objects.filter(quotation_id__in=list(quotations)).order_by('quotation_id', 'id').values('quotation_id', *LINE_FIELDS):
+        lines.setdefault(row.pop('quotation_id'), []).append(row)
+
+    ready = []
+    for quotation_id in quotation_ids:
+        quotation = quotations.get(quotation_id)
+        if quotation is None:
+            result.failed[quotation_id] = 'Quotation not found.'
+        elif quotation.status == Quotation.CONVERTED:
+            result.failed[quotation_id] = f'{quotation.number} is already converted.'
+        elif not lines.get(quotation_id):
+            result.failed[quotation_id] = f'{quotation.number} has no lines.'
+        else:
+            ready.append(quotation)
+    if not ready:
+        return result
+
+    invoices = Invoice.objects.bulk_create([
+        Invoice(number=number, customer_id=quotation.customer_id, quotation=quotation, notes=quotation.notes, created_by=user)
+        for quotation, number in zip(ready, next_numbers(Invoice, 'INV-', len(ready)))
+    ])
+    DocumentLine.objects.bulk_create(
+        [
+            DocumentLine(invoice=invoice, **row)
+            for quotation, invoice in zip(ready, invoices)
+            for row in lines[quotation.pk]
+        ],
+        batch_size=LINE_BATCH_SIZE,
+    )
+    Quotation.objects.filter(pk__in=[quotation.pk for quotation in ready]).update(status=Quotation.CONVERTED)
+    for quotation, invoice in zip(ready, invoices):
+        result.invoices[quotation.pk] = invoice.pk
+    # Bulk writes skip the save signals that keep the staff search index current.
+    schedule_index(SearchDocument.KIND_INVOICE, result.invoices.values())
+    schedule_index(SearchDocument.KIND_QUOTATION, result.invoices.keys())
+
+    if reserve:
+        quotation_for = {invoice.pk: quotation.pk for quotation, invoice in zip(ready, invoices)}
+        shortfalls = StockService.reserve_new_invoices([invoice.pk for invoice in invoices], force=force)
+        for invoice_id, error in shortfalls.items():
+            result.unreserved[quotation_for[invoice_id]] = error
+    return result
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounting.services.posting import post_payments_bulk
+from customers.models import Customer
+from inventory.models import Product, ProductUnit, ProductUnitEvent
+from sales.models import DocumentLine, Invoice, Payment, next_numbers, to_decimal
+from sales.serializers import IngestInvoiceSerializer
+from sales.services import StockService
+from sales.services.pricing import price_rule_engine
+from search.models import SearchDocument
+from search.services import schedule_index
+
+
+logger = logging.getLogger(__name__)
+
+LINE_BATCH_SIZE = 1000
+
+
+class InvoiceIngestionError(ValidationError):
+    """Raised when an ingestion request itself is malformed."""
+
+
+def max_ingest_invoices() -> int:
+    return int(getattr(settings, 'INVOICE_INGEST_MAX', 2000))
+
+
+@dataclass
+class IngestionResult:
+    created: dict[int, Invoice] = field(default_factory=dict)
+    duplicates: dict[int, Invoice] = field(default_factory=dict)
+    failed: dict[int, object] = field(default_factory=dict)
+    unreserved: dict[int, str] = field(default_factory=dict)
+    oversold: dict[int, str] = field(default_factory=dict)
+    keys: dict[int, str] = field(default_factory=dict)
+    posting_error: str = ''
+
+    def as_dict(self) -> dict:
+        def invoice(index, item):
+            return {'index': index, 'idempotency_key': self.keys.get(index), 'invoice': item.pk, 'number': item.number, 'status': item.status}
+
+        return {
+            'created': [
+                {
+                    **invoice(index, item),
+                    'reservation_error': self.unreserved.get(index),
+                    'stock_conflict': self.oversold.get(index),
+                }
+                for index, item in sorted(self.created.items())
+            ],
+            'duplicates': [invoice(index, item) for index, item in sorted(self.duplicates.items())],
+            'failed': [
+                {'index': index, 'idempotency_key': self.keys.get(index), 'errors': errors}
+                for index, errors in sorted(self.failed.items())
+            ],
+            'posting_error': self.posting_error or None,
+        }
+
+
+@dataclass
+class _Draft:
+    index: int
+    data: dict
+    invoice: Invoice | None = None
+    lines: list[tuple[DocumentLine, list[ProductUnit]]] = field(default_factory=list)
+    payments: list[Payment] = field(default_factory=list)
+
+    @property
+    def total(self) -> Decimal:
+        return sum((line.line_total for line, _ in self.lines), Decimal('0.00'))
+
+    @property
+    def paid(self) -> Decimal:
+        return sum((payment.amount for payment in self.payments), Decimal('0.00'))
+
+
+def clean_invoice_payload(values) -> list:
+    if not isinstance(values, list) or not values:
+        raise InvoiceIngestionError('invoices must be a non-empty list.')
+    if len(values) > max_ingest_invoices():
+        raise InvoiceIngestionError(f'At most {max_ingest_invoices()} invoices can be sent in one request.')
+    return values
+
+
+def _parse(payload: list, result: IngestionResult) -> list[_Draft]:
+    """Shape-check every invoice and drop repeated keys within the request."""
+    drafts, seen = [], {}
+    for index, item in enumerate(payload):
+        if isinstance(item, dict) and isinstance(item.get('idempotency_key'), str):
+            result.keys[index] = item['idempotency_key']
+        serializer = IngestInvoiceSerializer(data=item)
+        if not serializer.is_valid():
+            result.failed[index] = serializer.errors
+            continue
+        key = serializer.validated_data['idempotency_key']
+        if key in seen:
+            result.failed[index] = {'idempotency_key': [f'Repeats the key of invoice #{seen[key]} in this request.']}
+            continue
+        seen[key] = index
+        drafts.append(_Draft(index, serializer.validated_data))
+    return drafts
+
+
+def _lookup(drafts: list[_Draft]):
+    """Customers, products and serial units referenced by the whole request, one query each."""
+    customer_ids, product_ids, skus, serials = set(), set(), set(), set()
+    for draft in drafts:
+        customer_ids.add(draft.data['customer'])
+        for line in draft.data['lines']:
+            if 'product' in line:
+                product_ids.add(line['product'])
+            elif 'sku' in line:
+                skus.add(line['sku'])
+            serials.update(line['serials'])
+    customers = set(Customer.objects.filter(pk__in=customer_ids).values_list('pk', flat=True))
+    products = list(Product.objects.filter(Q(pk__in=product_ids) | Q(sku__in=skus))) if product_ids or skus else []
+    units = {
+        unit.serial_number: unit
+        for unit in ProductUnit.objects.select_for_update().filter(serial_number__in=serials)
+        .order_by('pk').only('id', 'serial_number', 'product_id', 'status', 'sale_line_id', 'landed_cost')
+    } if serials else {}
+    return customers, {product.pk: product for product in products}, {product.sku: product for product in products}, units
+
+
+def _build(draft: _Draft, customers, by_id, by_sku, units, claimed: set, engine, now, user) -> list[str]:
+    """Turn a parsed invoice into unsaved model instances, collecting every problem found."""
+    data = draft.data
+    errors = []
+    if data['customer'] not in customers:
+        errors.append(f"Customer {data['customer']} does not exist.")
+    invoice_date = data.get('date') or timezone.localdate()
+    draft.invoice = Invoice(
+        customer_id=data['customer'],
+        date=invoice_date,
+        due_date=data['due_date'],
+        notes=data['notes'],
+        created_by=user,
+        idempotency_key=data['idempotency_key'],
+    )
+    for number, line in enumerate(data['lines'], start=1):
+        product = by_id.get(line['product']) if 'product' in line else by_sku.get(line.get('sku'))
+        if ('product' in line or 'sku' in line) and product is None:
+            errors.append(f"Line {number}: product {line.get('product') or line.get('sku')} does not exist.")
+            continue
+        quantity = line['quantity']
+        selected = []
+        if product is not None and product.is_serial_tracked:
+            if quantity != quantity.to_integral_value() or len(line['serials']) != int(quantity):
+                errors.append(f'Line {number}: {product.sku} needs exactly {quantity.normalize()} serial numbers.')
+            for serial in line['serials']:
+                unit = units.get(serial)
+                if unit is None or unit.product_id != product.pk:
+                    errors.append(f'Line {number}: serial {serial} is not a unit of {product.sku}.')
+                elif unit.status != ProductUnit.STATUS_AVAILABLE or serial in claimed:
+                    errors.append(f'Line {number}: serial {serial} is not available.')
+                else:
+                    claimed.add(serial)
+                    selected.append(unit)
+        elif line['serials']:
+            errors.append(f'Line {number}: {product.sku} is not serial tracked.')
+
+        if 'unit_price' in line:
+            unit_price = line['unit_price']
+        else:
+            unit_price = engine.price_line(product, quantity, now=now).unit_price
+        tax_rate = line.get('tax_rate_percent', getattr(product, 'tax_rate', None) or Decimal('0'))
+        draft.lines.append((DocumentLine(
+            product=product,
+            description=line['description'] or (product.name if product else ''),
+            quantity=quantity,
+            unit_price=unit_price,
+            tax_rate_percent=to_decimal(tax_rate),
+            line_total=to_decimal(unit_price * quantity),
+        ), selected))
+    for payment in data['payments']:
+        draft.payments.append(Payment(
+            amount=payment['amount'],
+            method=payment['method'],
+            date=payment.get('date') or invoice_date,
+            note=payment['note'] or None,
+        ))
+    if draft.paid > draft.total:
+        errors.append(f'Payments of {draft.paid} exceed the invoice total of {draft.total}.')
+    if errors:
+        # Serials held by a rejected invoice stay free for the rest of the request.
+        claimed.difference_update(unit.serial_number for _, selected in draft.lines for unit in selected)
+    return errors
+
+
+def _ingest(payload: list, *, user=None, force: bool = False) -> IngestionResult:
+    result = IngestionResult()
+    drafts = _parse(payload, result)
+    existing = {
+        invoice.idempotency_key: invoice
+        for invoice in Invoice.objects.filter(idempotency_key__in=[draft.data['idempotency_key'] for draft in drafts])
+        .only('id', 'number', 'status', 'idempotency_key')
+    }
+    fresh = []
+    for draft in drafts:
+        invoice = existing.get(draft.data['idempotency_key'])
+        if invoice is not None:
+            result.duplicates[draft.index] = invoice
+        else:
+            fresh.append(draft)
+    if not fresh:
+        return result
+
+    customers, by_id, by_sku, units = _lookup(fresh)
+    engine, now, claimed = price_rule_engine(), timezone.now(), set()
+    ready = []
+    for draft in fresh:
+        errors = _build(draft, customers, by_id, by_sku, units, claimed, engine, now, user)
+        if errors:
+            result.failed[draft.index] = errors
+        else:
+            ready.append(draft)
+    if not ready:
+        return result
+
+    for draft, number in zip(ready, next_numbers(Invoice, 'INV-', len(ready))):
+        draft.invoice.number = number
+    Invoice.objects.bulk_create([draft.invoice for draft in ready])
+    for draft in ready:
+        for line, _ in draft.lines:
+            line.invoice = draft.invoice
+        for payment in draft.payments:
+            payment.invoice = draft.invoice
+    DocumentLine.objects.bulk_create([line for draft in ready for line, _ in draft.lines], batch_size=LINE_BATCH_SIZE)
+    payments = Payment.objects.bulk_create([payment for draft in ready for payment in draft.payments], batch_size=LINE_BATCH_SIZE)
+
+    reserved_units = []
+    for draft in ready:
+        for line, selected in draft.lines:
+            for unit in selected:
+                unit.sale_line_id = line.pk
+                unit.status = ProductUnit.STATUS_RESERVED
+                unit.updated_at = now
+                reserved_units.append(unit)
+    if reserved_units:
+        ProductUnit.objects.bulk_update(reserved_units, ['sale_line', 'status', 'updated_at'], batch_size=LINE_BATCH_SIZE)
+        ProductUnitEvent.record(reserved_units, ProductUnitEvent.EVENT_RESERVED, actor=user, at=now)
+        # bulk_update skips the save signals that keep the serials' search documents current.
+        schedule_index(SearchDocument.KIND_SERIAL, [unit.pk for unit in reserved_units])
+
+    by_invoice = {draft.invoice.pk: draft for draft in ready}
+    oversold = {}
+    for invoice_id, error in StockService.reserve_new_invoices(list(by_invoice), force=force, oversold=oversold).items():
+        result.unreserved[by_invoice[invoice_id].index] = error
+    for invoice_id, error in oversold.items():
+        result.oversold[by_invoice[invoice_id].index] = error
+    settled = [
+        invoice_id for invoice_id, draft in by_invoice.items()
+        if draft.index not in result.unreserved and draft.total > 0 and draft.paid >= draft.total
+    ]
+    if settled:
+        Invoice.objects.filter(pk__in=settled).update(status=Invoice.PAID)
+        StockService.finalize_sales(settled, actor=user)
+        for invoice_id in settled:
+            by_invoice[invoice_id].invoice.status = Invoice.PAID
+
+    if payments:
+        try:
+            with transaction.atomic():
+                post_payments_bulk(payments, actor=user)
+        except Exception as exc:
+            # Like the payment signal, a posting failure never blocks the sale itself.
+            logger.exception('Posting ingested payments failed')
+            result.posting_error = str(exc)
+    schedule_index(SearchDocument.KIND_INVOICE, list(by_invoice))
+    for draft in ready:
+        result.created[draft.index] = draft.invoice
+    return result
+
+
+def ingest_invoices(payload, *, user=None, force: bool = False) -> IngestionResult:
+    """Create many invoices with their lines, payments and serials in one transaction.
+
+    Every invoice is validated before anything is written, with one lookup
+    per table for the whole request; invoices with problems are reported in
+    ``failed`` and the rest are created with bulk inserts, a single
+    reservation pass, one finalization pass for fully paid invoices and
+    batched journal posting. An invoice whose ``idempotency_key`` was seen
+    before is returned in ``duplicates`` instead of being created again.
+    Fully paid invoices that cannot reserve their stock stay pending and
+    are listed with a ``reservation_error``, like converted quotations;
+    with ``force`` they are reserved anyway and carry a ``stock_conflict``.
+    """
+    payload = clean_invoice_payload(payload)
+    try:
+        with transaction.atomic():
+            return _ingest(payload, user=user, force=force)
+    except IntegrityError:
+        # A concurrent push inserted one of our keys first; a rerun reports it as a duplicate.
+        with transaction.atomic():
+            return _ingest(payload, user=user, force=force)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from sales.models import DocumentLine, Invoice, Payment
+from search.models import SearchDocument
+from search.services import schedule_index
+
+
+def overdue_window_days() -> int:
+    return max(1, int(getattr(settings, 'OVERDUE_WINDOW_DAYS', 31)))
+
+
+def _sum_per_invoice(model, field_name: str):
+    totals = model.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice').annotate(total=Sum(field_name))
+    return Coalesce(
+        Subquery(totals.values('total')),
+        Value(0),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def unpaid_past_due(as_of: date):
+    """Pending invoices due before ``as_of`` whose payments do not cover the line total."""
+    return (
+        Invoice.objects.filter(status=Invoice.PENDING, due_date__lt=as_of)
+        .alias(billed=_sum_per_invoice(DocumentLine, 'line_total'), paid=_sum_per_invoice(Payment, 'amount'))
+        .filter(billed__gt=F('paid'))
+    )
+
+
+@dataclass
+class OverdueRunResult:
+    as_of: date
+    flipped: int = 0
+    windows: list[tuple[date, date, int]] = field(default_factory=list)
+    overdue: int = 0
+    dry_run: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            'as_of': self.as_of.isoformat(),
+            'flipped': self.flipped,
+            'windows': [
+                {'from': start.isoformat(), 'to': end.isoformat(), 'flipped': count}
+                for start, end, count in self.windows
+            ],
+            'overdue': self.overdue,
+            'dry_run': self.dry_run,
+        }
+
+
+def mark_overdue_invoices(as_of: date | None = None, *, window_days: int | None = None, dry_run: bool = False) -> OverdueRunResult:
+    """Flip unpaid pending invoices past their due date to overdue.
+
+    Candidates are walked by ``due_date``, oldest first, one window of
+    ``window_days`` at a time; each window reads the ids of its unpaid
+    invoices and flips them with one UPDATE whose WHERE clause compares
+    line and payment totals again, and empty stretches of dates are
+    skipped. Each UPDATE commits on its own, so an interrupted run keeps
+    its progress and the next run resumes with what is left.
+    """
+    as_of = as_of or timezone.localdate()
+    window = timedelta(days=window_days or overdue_window_days())
+    result = OverdueRunResult(as_of=as_of, dry_run=dry_run)
+    pending = Invoice.objects.filter(status=Invoice.PENDING, due_date__lt=as_of)
+    start = pending.order_by('due_date').values_list('due_date', flat=True).first()
+    while start is not None:
+        end = min(start + window, as_of)
+        batch = unpaid_past_due(as_of).filter(due_date__gte=start, due_date__lt=end)
+        if dry_run:
+            count = batch.count()
+        else:
+            ids = list(batch.values_list('pk', flat=True))
+            count = batch.filter(pk__in=ids).update(status=Invoice.OVERDUE) if ids else 0
+            # The UPDATE skips the save signals that keep the staff search index current.
+            schedule_index(SearchDocument.KIND_INVOICE, ids)
+        if count:
+            result.windows.append((start, end - timedelta(days=1), count))
+            result.flipped += count
+        start = pending.filter(due_date__gte=end).order_by('due_date').values_list('due_date', flat=True).first()
+    result.overdue = Invoice.objects.filter(status=Invoice.OVERDUE).count()
+    return result
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from sales.models import PriceRule
+
+
+PRICE_RULES_VERSION_KEY = 'sales:price_rules:version'
+CART_DISCOUNT_PREFIX = 'Cart discount: '
+TWOPLACES = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+
+def _money(value: Decimal) -> Decimal:
+    return max(Decimal('0.00'), value).quantize(TWOPLACES)
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    id: int
+    name: str
+    rule_type: str
+    scope: str
+    value_type: str
+    value: Decimal
+    min_qty: int
+    stackable: bool
+    start_at: Optional[datetime]
+    end_at: Optional[datetime]
+
+    @classmethod
+    def from_rule(cls, rule: PriceRule) -> 'CompiledRule':
+        return cls(
+            id=rule.id,
+            name=rule.name,
+            rule_type=rule.rule_type,
+            scope=rule.scope,
+            value_type=rule.value_type,
+            value=Decimal(rule.value),
+            min_qty=rule.min_qty or 1,
+            stackable=rule.stackable,
+            start_at=rule.start_at,
+            end_at=rule.end_at,
+        )
+
+    @property
+    def stack_order(self) -> tuple:
+        # Discounts come off before promotions, percentages before flat amounts.
+        return (self.rule_type != PriceRule.DISCOUNT, self.value_type != PriceRule.PERCENT, self.id)
+
+    def applies(self, quantity, now: datetime) -> bool:
+        if quantity < self.min_qty:
+            return False
+        if self.start_at and self.start_at > now:
+            return False
+        return not (self.end_at and self.end_at < now)
+
+    def apply(self, amount: Decimal) -> Decimal:
+        if self.value_type == PriceRule.PERCENT:
+            return amount * (Decimal('1') - self.value / HUNDRED)
+        return amount - self.value
+
+
+def _best(rules: list[CompiledRule], amount: Decimal) -> tuple[Decimal, tuple[CompiledRule, ...]]:
+    """Lowest amount reachable with either one exclusive rule or every stackable rule together."""
+    options = [(rule,) for rule in rules if not rule.stackable]
+    stack = tuple(sorted((rule for rule in rules if rule.stackable), key=lambda rule: rule.stack_order))
+    if stack:
+        options.append(stack)
+    best_amount, best_rules = amount, ()
+    for option in options:
+        result = amount
+        for rule in option:
+            result = max(Decimal('0'), rule.apply(result))
+        if result < best_amount:
+            best_amount, best_rules = result, option
+    return best_amount, best_rules
+
+
+@dataclass
+class PricedLine:
+    base_price: Decimal
+    unit_price: Decimal
+    rules: tuple[CompiledRule, ...] = ()
+
+    @property
+    def discount(self) -> Decimal:
+        return self.base_price - self.unit_price
+
+    @property
+    def rule_ids(self) -> list[int]:
+        return [rule.id for rule in self.rules]
+
+
+@dataclass
+class CartPricing:
+    lines: list[PricedLine]
+    subtotal: Decimal
+    discount: Decimal = Decimal('0.00')
+    rules: tuple[CompiledRule, ...] = ()
+
+    @property
+    def total(self) -> Decimal:
+        return self.subtotal - self.discount
+
+    @property
+    def rule_ids(self) -> list[int]:
+        return [rule.id for rule in self.rules]
+
+
+class PriceRuleEngine:
+    """Active price rules compiled into in-memory indexes.
+
+    Product and category rules are looked up by id and cart rules are kept
+    apart, so evaluating any number of lines touches no database. Rules that
+    start or end later are compiled too and filtered by ``now`` when priced.
+    """
+
+    def __init__(self, rules: Iterable[PriceRule], version: str = ''):
+        self.version = version
+        self.by_product: dict[int, list[CompiledRule]] = {}
+        self.by_category: dict[int, list[CompiledRule]] = {}
+        self.cart: list[CompiledRule] = []
+        for rule in rules:
+            compiled = CompiledRule.from_rule(rule)
+            if rule.scope == PriceRule.CART:
+                self.cart.append(compiled)
+            elif rule.scope == PriceRule.PRODUCT and rule.product_id:
+                self.by_product.setdefault(rule.product_id, []).append(compiled)
+            elif rule.category_id:
+                self.by_category.setdefault(rule.category_id, []).append(compiled)
+            # Rules without a product or category target no lines.
+
+    @classmethod
+    def compile(cls, version: str = '') -> 'PriceRuleEngine':
+        rules = PriceRule.objects.filter(is_active=True).filter(
+            Q(end_at__isnull=True) | Q(end_at__gte=timezone.now())
+        ).order_by('id')
+        return cls(rules, version)
+
+    def candidates(self, product_id: int | None, category_id: int | None) -> list[CompiledRule]:
+        return self.by_product.get(product_id, []) + self.by_category.get(category_id, [])
+
+    def price_line(self, product, quantity, base_price: Decimal | None = None, now: datetime | None = None) -> PricedLine:
+        now = now or timezone.now()
+        base = Decimal(str(product.price if base_price is None else base_price))
+        rules = [rule for rule in self.candidates(product.pk, product.category_id) if rule.applies(quantity, now)]
+        if not rules:
+            return PricedLine(base, base)
+        unit_price, applied = _best(rules, base)
+        return PricedLine(base, _money(unit_price), applied)
+
+    def price_lines(self, lines: Iterable[tuple], now: datetime | None = None) -> list[PricedLine]:
+        """Price ``(product, quantity[, base_price])`` tuples with one clock reading."""
+        now = now or timezone.now()
+        return [self.price_line(*line, now=now) for line in lines]
+
+    def cart_discount(self, subtotal: Decimal, quantity, now: datetime | None = None) -> tuple[Decimal, tuple[CompiledRule, ...]]:
+        """Best cart-scope discount on ``subtotal``; ``min_qty`` counts units across the cart."""
+        now = now or timezone.now()
+        rules = [rule for rule in self.cart if rule.applies(quantity, now)]
+        if not rules or subtotal <= 0:
+            return Decimal('0.00'), ()
+        total, applied = _best(rules, subtotal)
+        return (subtotal - _money(total)).quantize(TWOPLACES), applied
+
+    def price_cart(self, lines: Iterable[tuple], now: datetime | None = None) -> CartPricing:
+        now = now or timezone.now()
+        lines = list(lines)
+        priced = self.price_lines(lines, now=now)
+        subtotal = sum(
+            (line.unit_price * Decimal(str(source[1])) for line, source in zip(priced, lines)),
+            Decimal('0.00'),
+        ).quantize(TWOPLACES)
+        quantity = sum(Decimal(str(source[1])) for source in lines)
+        discount, applied = self.cart_discount(subtotal, quantity, now=now)
+        return CartPricing(priced, subtotal, discount, applied)
+
+
+_engine: PriceRuleEngine | None = None
+
+
+def price_rules_ttl() -> int:
+    return getattr(settings, 'CACHE_TTL_PRICE_RULES', 60)
+
+
+def price_rules_version() -> str:
+    """The current rule version; it expires after ``CACHE_TTL_PRICE_RULES`` seconds.
+
+    A bump only reaches the processes sharing the cache, so with a
+    per-process cache the expiry bounds how long another worker keeps
+    pricing with rules it compiled earlier.
+    """
+    version = cache.get(PRICE_RULES_VERSION_KEY)
+    if version is None:
+        cache.add(PRICE_RULES_VERSION_KEY, uuid.uuid4().hex, price_rules_ttl())
+        version = cache.get(PRICE_RULES_VERSION_KEY)
+    return version
+
+
+def price_rule_engine() -> PriceRuleEngine:
+    """The compiled engine for the current rule version, rebuilt after a rule changed or the version expired."""
+    global _engine
+    version = price_rules_version()
+    engine = _engine
+    if engine is None or engine.version != version:
+        engine = _engine = PriceRuleEngine.compile(version)
+    return engine
+
+
+def _bump_version() -> None:
+    cache.set(PRICE_RULES_VERSION_KEY, uuid.uuid4().hex, price_rules_ttl())
+
+
+def invalidate_price_rules() -> None:
+    """Move every process to a new rule version now and again on commit."""
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def apply_cart_rules(document):
+    """Keep one cart discount line on a quotation or invoice in step with the cart rules.
+
+    Returns the discount line, or None when no cart rule applies.
+    """
+    lines = list(document.lines.select_related('product'))
+    current = [line for line in lines if not line.product_id and not line.combo_id and line.description.startswith(CART_DISCOUNT_PREFIX)]
+    others = [line for line in lines if line not in current]
+    subtotal = sum((Decimal(str(line.line_total)) for line in others), Decimal('0.00'))
+    quantity = sum(Decimal(str(line.quantity)) for line in others if line.product_id)
+    discount, rules = price_rule_engine().cart_discount(subtotal, quantity)
+
+    keep = current[0] if current and discount else None
+    stale = [line.pk for line in current if line is not keep]
+    if stale:
+        document.lines.filter(pk__in=stale).delete()
+    if not discount:
+        return None
+    description = (CART_DISCOUNT_PREFIX + ', '.join(rule.name for rule in rules))[:255]
+    if keep is None:
+        return document.add_misc_line(description=description, amount=-discount)
+    keep.description = description
+    keep.unit_price = keep.line_total = -discount
+    keep.save(update_fields=['description', 'unit_price', 'line_total'])
+    return keep
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Iterable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+from django.utils.text import slugify
+
+from customers.models import Customer
+from sales.models import DocumentLine, Invoice, Payment
+
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_FOLDER = 'statements'
+STATEMENT_CHUNK_SIZE = 200
+STATEMENT_FORMATS = ('html', 'pdf')
+TWOPLACES = Decimal('0.01')
+
+OPENING, INVOICE, PAYMENT = 0, 1, 2
+
+# Invoices (debits) and payments (credits) up to the period end, with
+# everything before the period collapsed into one opening row per customer.
+# The running balance is a window sum over that ledger, so no customer is
+# ever walked in Python.
+LEDGER_SQL = """
+WITH history AS (
+    SELECT i.customer_id AS customer_id, i.date AS entry_date, {invoice_kind} AS kind, i.id AS object_id,
+           i.number AS reference, '' AS detail, COALESCE(SUM(l.line_total), 0) AS amount
+    FROM {invoice} i
+    LEFT JOIN {line} l ON l.invoice_id = i.id
+    WHERE i.customer_id IN ({customers}) AND i.date <= %s
+    GROUP BY i.customer_id, i.date, i.id, i.number
+    UNION ALL
+    SELECT i.customer_id, p.date, {payment_kind}, p.id, i.number, p.method, -p.amount
+    FROM {payment} p
+    JOIN {invoice} i ON i.id = p.invoice_id
+    WHERE i.customer_id IN ({customers}) AND p.date <= %s
+),
+entries AS (
+    SELECT customer_id, NULL AS entry_date, {opening_kind} AS kind, 0 AS object_id,
+           '' AS reference, '' AS detail, SUM(amount) AS amount
+    FROM history
+    WHERE entry_date < %s
+    GROUP BY customer_id
+    UNION ALL
+    SELECT customer_id, entry_date, kind, object_id, reference, detail, amount
+    FROM history
+    WHERE entry_date >= %s
+)
+SELECT customer_id, entry_date, kind, object_id, reference, detail, amount,
+       SUM(amount) OVER (
+           PARTITION BY customer_id
+           ORDER BY kind > {opening_kind}, entry_date, kind, object_id
+           ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+       ) AS balance
+FROM entries
+ORDER BY customer_id, kind > {opening_kind}, entry_date, kind, object_id
+"""
+
+
+def _money(value) -> Decimal:
+    # SQLite hands back sums of decimal columns as floats.
+    return Decimal(str(value or 0)).quantize(TWOPLACES)
+
+
+def _date(value) -> date | None:
+    return parse_date(value) if isinstance(value, str) else value
+
+
+@dataclass
+class StatementEntry:
+    date: date
+    kind: int
+    reference: str
+    detail: str
+    amount: Decimal
+    balance: Decimal
+
+    @property
+    def debit(self) -> Decimal:
+        return self.amount if self.amount > 0 else Decimal('0.00')
+
+    @property
+    def credit(self) -> Decimal:
+        return -self.amount if self.amount < 0 else Decimal('0.00')
+
+    @property
+    def description(self) -> str:
+        if self.kind == INVOICE:
+            return f'Invoice {self.reference}'
+        return f'Payment for {self.reference}' + (f' ({self.detail})' if self.detail else '')
+
+
+@dataclass
+class Statement:
+    customer: Customer
+    start: date
+    end: date
+    opening_balance: Decimal = Decimal('0.00')
+    entries: list[StatementEntry] = field(default_factory=list)
+
+    @property
+    def closing_balance(self) -> Decimal:
+        return self.entries[-1].balance if self.entries else self.opening_balance
+
+    @property
+    def invoiced(self) -> Decimal:
+        return sum((entry.debit for entry in self.entries), Decimal('0.00'))
+
+    @property
+    def paid(self) -> Decimal:
+        return sum((entry.credit for entry in self.entries), Decimal('0.00'))
+
+    def as_dict(self) -> dict:
+        return {
+            'customer': self.customer.pk,
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'opening_balance': str(self.opening_balance),
+            'closing_balance': str(self.closing_balance),
+            'entries': [
+                {
+                    'date': entry.date.isoformat(),
+                    'description': entry.description,
+                    'debit': str(entry.debit),
+                    'credit': str(entry.credit),
+                    'balance': str(entry.balance),
+                }
+                for entry in self.entries
+            ],
+        }
+
+
+def build_statements(customer_ids: Iterable[int], start: date, end: date) -> dict[int, Statement]:
+    """Statements for ``customer_ids`` over ``start``..``end`` from a single query.
+
+    Customers without any invoice or payment up to ``end`` get no statement.
+    """
+    customers = {customer.pk: customer for customer in Customer.objects.filter(pk__in=list(customer_ids))}
+    if not customers:
+        return {}
+    sql = LEDGER_SQL.format(
+        invoice=connection.ops.quote_name(Invoice._meta.db_table),
+        line=connection.ops.quote_name(DocumentLine._meta.db_table),
+        payment=connection.ops.quote_name(Payment._meta.db_table),
+        customers=', '.join(['%s'] * len(customers)),
+        opening_kind=OPENING,
+        invoice_kind=INVOICE,
+        payment_kind=PAYMENT,
+    )
+    ids = list(customers)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*ids, end, *ids, end, start, start])
+        rows = cursor.fetchall()
+
+    statements: dict[int, Statement] = {}
+    for customer_id, entry_date, kind, _, reference, detail, amount, balance in rows:
+        statement = statements.get(customer_id)
+        if statement is None:
+            statement = statements[customer_id] = Statement(customers[customer_id], start, end)
+        if kind == OPENING:
+            statement.opening_balance = _money(amount)
+        else:
+            statement.entries.append(StatementEntry(_date(entry_date), kind, reference, detail or '', _money(amount), _money(balance)))
+    return statements
+
+
+def build_statement(customer: Customer, start: date, end: date) -> Statement:
+    return build_statements([customer.pk], start, end).get(customer.pk) or Statement(customer, start, end)
+
+
+def customers_with_activity(start: date, end: date) -> list[int]:
+    """Ids of customers invoiced or paying within ``start``..``end``."""
+    invoiced = Invoice.objects.filter(date__range=(start, end)).values_list('customer_id', flat=True)
+    paid = Payment.objects.filter(date__range=(start, end)).values_list('invoice__customer_id', flat=True)
+    return sorted(set(invoiced.distinct()) | set(paid.distinct()))
+
+
+def render_statement_html(statement: Statement) -> str:
+    return render_to_string('sales/pdf_statement.html', {'statement': statement})
+
+
+def statement_name(statement: Statement, fmt: str) -> str:
+    slug = slugify(statement.customer.name)[:40] or 'customer'
+    return f'{STATEMENT_FOLDER}/{statement.end:%Y-%m-%d}/{statement.customer.pk}-{slug}.{fmt}'
+
+
+def _save(storage, name: str, content: bytes) -> str:
+    # Reruns replace the previous file instead of collecting suffixed copies.
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def write_statements(customer_ids: list[int], start: date, end: date, formats=STATEMENT_FORMATS, storage=None) -> tuple[list[str], dict[int, str]]:
+    """Render and store one chunk of statements; failures are reported per customer."""
+    from sales.pdf_utils import render_pdf_from_html
+
+    storage = storage or default_storage
+    files, failed = [], {}
+    for customer_id, statement in build_statements(customer_ids, start, end).items():
+        try:
+            html = render_statement_html(statement)
+            if 'html' in formats:
+                files.append(_save(storage, statement_name(statement, 'html'), html.encode('utf-8')))
+            if 'pdf' in formats:
+                files.append(_save(storage, statement_name(statement, 'pdf'), render_pdf_from_html(html)))
+        except Exception as exc:
+            logger.exception('Statement for customer %s failed', customer_id)
+            failed[customer_id] = str(exc)
+    return files, failed
+
+
+def _init_worker() -> None:
+    import django
+
+    django.setup()
+    # Never reuse a connection inherited from the parent process.
+    connections.close_all()
+
+
+def _write_chunk(customer_ids, start, end, formats):
+    return write_statements(customer_ids, start, end, formats)
+
+
+@dataclass
+class StatementRunResult:
+    start: date
+    end: date
+    customers: int = 0
+    files: list[str] = field(default_factory=list)
+    failed: dict[int, str] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'customers': self.customers,
+            'files': self.files,
+            'failed': [{'customer': customer_id, 'error': error} for customer_id, error in self.failed.items()],
+        }
+
+
+def statement_workers() -> int:
+    return max(1, int(getattr(settings, 'STATEMENT_WORKERS', os.cpu_count() or 1)))
+
+
+def generate_statements(
+    start: date,
+    end: date,
+    *,
+    customer_ids: Iterable[int] | None = None,
+    formats=STATEMENT_FORMATS,
+    workers: int | None = None,
+    chunk_size: int = STATEMENT_CHUNK_SIZE,
+    storage=None,
+) -> StatementRunResult:
+    """Write statements for every customer with activity in the period.
+
+    Customers are split into chunks of ``chunk_size``; each chunk costs one
+    ledger query and is rendered in a separate process when ``workers`` is
+    above one, which is where a month-end run spends its time. With a single
+    worker the chunks run in this process and ``storage`` may be any storage
+    instance; worker processes always write to the default storage.
+    """
+    ids = sorted(set(customer_ids)) if customer_ids is not None else customers_with_activity(start, end)
+    result = StatementRunResult(start=start, end=end, customers=len(ids))
+    chunks = [ids[index:index + chunk_size] for index in range(0, len(ids), chunk_size)]
+    workers = min(workers or statement_workers(), len(chunks))
+
+    if workers <= 1:
+        outcomes = (write_statements(chunk, start, end, formats, storage) for chunk in chunks)
+        for files, failed in outcomes:
+            result.files.extend(files)
+            result.failed.update(failed)
+        return result
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_write_chunk, chunk, start, end, tuple(formats)) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                files, failed = future.result()
+            except Exception as exc:
+                logger.exception('Statement chunk starting at customer %s failed', chunk[0])
+                failed = dict.fromkeys(chunk, str(exc))
+                files = []
+            result.files.extend(files)
+            result.failed.update(failed)
+    return result
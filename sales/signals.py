@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PriceRule
+from .services.pricing import invalidate_price_rules
+
+
+@receiver(post_save, sender=PriceRule)
+@receiver(post_delete, sender=PriceRule)
+def on_price_rule_changed(sender, raw: bool = False, **kwargs):
+    if raw:
+        return
+    invalidate_price_rules()
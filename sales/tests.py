@@ -1,8 +1,19 @@
+from datetime import date, timedelta
+from io import StringIO
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import InMemoryStorage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
+from accounting.models import JournalEntry, JournalLine
 from customers.models import Customer
 from inventory.models import (
     Category,
@@ -13,10 +24,23 @@ from inventory.models import (
     Shipment,
     ShipmentItem,
     ProductUnit,
+    ProductUnitEvent,
 )
-from inventory.services.combos import add_combo_to_invoice, add_combo_to_quotation, combo_available_quantity
-from sales.models import Quotation, Invoice
-from sales.services import StockService
+from inventory.services.combos import (
+    add_combo_to_invoice,
+    add_combo_to_quotation,
+    combo_availability,
+    combo_available_quantity,
+    compute_combo_availability,
+)
+from inventory.services.stock_balances import stock_levels
+from search.models import SearchDocument
+from sales.models import Invoice, Payment, PriceRule, Quotation, StockReservation
+from sales.services import StockService, apply_cart_rules, price_rule_engine
+from sales.services.ingestion import ingest_invoices
+from sales.services.overdue import mark_overdue_invoices
+from sales.services.pricing import PRICE_RULES_VERSION_KEY
+from sales.services.statements import build_statements, generate_statements
 
 
 class ComboIntegrationTests(TestCase):
@@ -72,6 +96,70 @@ class ComboIntegrationTests(TestCase):
         self.product_b.save()
         self.assertEqual(combo_available_quantity(self.percent_combo), min(self.product_a.quantity // 2, 4 // 1))
 
+    def test_combo_availability_index_uses_available_stock_in_one_query(self):
+        self.product_a.reserved = 15
+        self.product_a.save()
+        with self.assertNumQueries(1):
+            index = compute_combo_availability()
+        self.assertEqual(index, {self.percent_combo.id: 2, self.fixed_combo.id: 5})
+        self.assertEqual(combo_availability(), index)
+        with self.assertNumQueries(0):
+            combo_availability()
+
+        ComboItem.objects.filter(combo=self.fixed_combo, product=self.product_c).update(quantity=20)
+        self.product_c.save()
+        self.assertEqual(combo_availability()[self.fixed_combo.id], 2)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ims:inventory:combo-availability'))
+        self.assertIn({'id': self.percent_combo.id, 'code': 'starter-bundle', 'available': 2}, response.json())
+
+    def test_stored_prices_follow_product_and_item_changes(self):
+        self.percent_combo.refresh_from_db()
+        self.assertEqual(self.percent_combo.components_total, Decimal('450.00'))
+        self.assertEqual(self.percent_combo.final_price, Decimal('405.00'))
+
+        self.product_a.price = Decimal('110.00')
+        # The product row, the two set-based UPDATEs, then the percentage combo read and write.
+        with self.assertNumQueries(5):
+            self.product_a.save()
+        self.percent_combo.refresh_from_db()
+        self.fixed_combo.refresh_from_db()
+        self.assertEqual(self.percent_combo.final_price, Decimal('423.00'))
+        self.assertEqual(self.fixed_combo.final_price, Decimal('260.00'))
+        self.assertEqual(self.fixed_combo.final_price, self.fixed_combo.compute_price())
+
+        ComboItem.objects.get(combo=self.fixed_combo, product=self.product_c).delete()
+        self.fixed_combo.refresh_from_db()
+        self.assertEqual(self.fixed_combo.final_price, Decimal('80.00'))
+        self.fixed_combo.discount_type = Combo.DISCOUNT_PERCENT
+        self.fixed_combo.discount_value = Decimal('50.00')
+        self.fixed_combo.save()
+        self.fixed_combo.refresh_from_db()
+        self.assertEqual(self.fixed_combo.final_price, Decimal('55.00'))
+
+    def test_save_and_refresh_round_half_cents_alike(self):
+        ribbon = Product.objects.create(name='Ribbon', sku='RBN-1', price=Decimal('10.10'), quantity=5)
+        combo = Combo.objects.create(
+            name='Ribbon Deal', code='ribbon-deal', discount_type=Combo.DISCOUNT_PERCENT, discount_value=Decimal('15'),
+        )
+        ComboItem.objects.create(combo=combo, product=ribbon, quantity=1)
+        combo.refresh_from_db()
+        # 10.10 less 15% is 8.585, which rounds half up.
+        self.assertEqual(combo.final_price, Decimal('8.59'))
+        self.assertEqual(combo.apply_discount(combo.components_total), combo.final_price)
+        combo.save()
+        combo.refresh_from_db()
+        self.assertEqual(combo.final_price, Decimal('8.59'))
+
+    def test_combo_listing_reads_stored_prices(self):
+        self.client.force_login(self.user)
+        url = reverse('ims:inventory:combo-list')
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        prices = {row['code']: row['computed_price'] for row in response.json()}
+        self.assertEqual(prices, {'starter-bundle': '405.00', 'accessory-pack': '250.00'})
+
     def test_add_percent_discount_combo_expands_to_lines_and_discount(self):
         invoice = Invoice.objects.create(customer=self.customer)
         created_lines, discount_line, final_price = add_combo_to_invoice(invoice, self.percent_combo.id, quantity=3)
@@ -196,3 +284,439 @@ class SerialFulfillmentTests(TestCase):
             unit.refresh_from_db()
             self.assertEqual(unit.status, ProductUnit.STATUS_SOLD)
             self.assertEqual(unit.sale_line, line)
+
+    def finalize_units(self, count):
+        ProductUnit.objects.bulk_create([
+            ProductUnit(
+                serial_number=f'SN-{count}-{index}',
+                product=self.serial_product,
+                shipment=self.shipment,
+                shipment_item=self.shipment_item,
+                landed_cost=Decimal('650.00'),
+            )
+            for index in range(count)
+        ])
+        self.serial_product.quantity = count
+        self.serial_product.save()
+        invoice = Invoice.objects.create(customer=self.customer)
+        line = invoice.add_product_line(self.serial_product, count)
+        StockService.reserve_stock(invoice)
+        StockService.assign_serials(line, list(ProductUnit.objects.filter(serial_number__startswith=f'SN-{count}-')))
+        with CaptureQueriesContext(connection) as queries:
+            StockService.finalize_sale(invoice)
+        self.assertEqual(ProductUnit.objects.filter(sale_line=line, status=ProductUnit.STATUS_SOLD).count(), count)
+        self.assertEqual(ProductUnitEvent.objects.filter(sale_line=line, event_type=ProductUnitEvent.EVENT_SOLD).count(), count)
+        self.serial_product.refresh_from_db()
+        self.assertEqual((self.serial_product.quantity, self.serial_product.reserved), (0, 0))
+        return len(queries)
+
+    def test_finalization_query_count_does_not_grow_with_units(self):
+        ProductUnit.objects.all().delete()
+        self.assertEqual(self.finalize_units(3), self.finalize_units(40))
+
+
+class PriceRuleEngineTests(TestCase):
+    def setUp(self):
+        self.inks = Category.objects.create(name='Inks')
+        self.cyan = Product.objects.create(name='Cyan', sku='INK-C', category=self.inks, price=Decimal('20.00'))
+        self.paper = Product.objects.create(name='Paper', sku='PPR-1', price=Decimal('10.00'))
+        self.customer = Customer.objects.create(name='Print Shop')
+
+    def rule(self, name, **fields):
+        fields.setdefault('value_type', PriceRule.PERCENT)
+        return PriceRule.objects.create(name=name, **fields)
+
+    def test_best_exclusive_rule_or_stack_wins_without_queries(self):
+        self.rule('Cyan 10%', product=self.cyan, value=Decimal('10'))
+        self.rule('Inks 2 off', scope=PriceRule.CATEGORY, category=self.inks, value_type=PriceRule.FIXED, value=Decimal('2'), stackable=True)
+        self.rule('Ink promo 5%', rule_type=PriceRule.PROMOTION, scope=PriceRule.CATEGORY, category=self.inks, value=Decimal('5'), stackable=True)
+        self.rule('Bulk 50%', product=self.cyan, value=Decimal('50'), min_qty=100)
+        self.rule('Untargeted', value=Decimal('90'))
+        engine = price_rule_engine()
+
+        with self.assertNumQueries(0):
+            priced = price_rule_engine().price_lines([(self.cyan, 1), (self.paper, 3)] * 100)
+        # Discounts stack before promotions: 20 - 2 = 18, less 5% = 17.10 beats the exclusive 10% (18).
+        self.assertEqual((priced[0].unit_price, len(priced[0].rules)), (Decimal('17.10'), 2))
+        self.assertEqual(priced[1].unit_price, Decimal('10.00'))
+        self.assertEqual(engine.price_line(self.cyan, 100).unit_price, Decimal('10.00'))
+
+    def test_rule_changes_invalidate_and_windows_are_respected(self):
+        engine = price_rule_engine()
+        self.assertEqual(engine.price_line(self.paper, 1).unit_price, Decimal('10.00'))
+        rule = self.rule('Paper week', product=self.paper, value=Decimal('20'), start_at=timezone.now() + timedelta(days=1))
+        self.assertIsNot(price_rule_engine(), engine)
+        self.assertEqual(price_rule_engine().price_line(self.paper, 1).unit_price, Decimal('10.00'))
+        later = timezone.now() + timedelta(days=2)
+        self.assertEqual(price_rule_engine().price_line(self.paper, 1, now=later).unit_price, Decimal('8.00'))
+        rule.delete()
+        self.assertEqual(price_rule_engine().price_line(self.paper, 1, now=later).unit_price, Decimal('10.00'))
+
+    def test_rules_changed_elsewhere_are_picked_up_once_the_version_expires(self):
+        rule = self.rule('Paper 20%', product=self.paper, value=Decimal('20'))
+        self.assertEqual(price_rule_engine().price_line(self.paper, 1).unit_price, Decimal('8.00'))
+        # A change another worker announced in its own cache is invisible here until the version expires.
+        PriceRule.objects.filter(pk=rule.pk).update(value=Decimal('50'))
+        self.assertEqual(price_rule_engine().price_line(self.paper, 1).unit_price, Decimal('8.00'))
+        cache.delete(PRICE_RULES_VERSION_KEY)
+        self.assertEqual(price_rule_engine().price_line(self.paper, 1).unit_price, Decimal('5.00'))
+
+    def test_cart_rule_keeps_one_discount_line(self):
+        self.rule('Big order 10%', scope=PriceRule.CART, value=Decimal('10'), min_qty=5)
+        quotation = Quotation.objects.create(customer=self.customer)
+        quotation.add_product_line(self.paper, 3)
+        self.assertIsNone(apply_cart_rules(quotation))
+        quotation.add_product_line(self.cyan, 2)
+        apply_cart_rules(quotation)
+        quotation.add_product_line(self.paper, 1)
+        line = apply_cart_rules(quotation)
+        self.assertEqual(line.line_total, Decimal('-8.00'))
+        self.assertEqual(quotation.lines.filter(product__isnull=True).count(), 1)
+        self.assertEqual(quotation.total, Decimal('72.00'))
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Reseller')
+        self.toner = Product.objects.create(name='Toner', sku='TNR-1', price=Decimal('30.00'), quantity=10)
+        self.drum = Product.objects.create(name='Drum', sku='DRM-1', price=Decimal('80.00'), quantity=3)
+        self.invoice = Invoice.objects.create(customer=self.customer)
+        self.toner_line = self.invoice.add_product_line(self.toner, 4)
+        self.invoice.add_product_line(self.toner, 2)
+        self.drum_line = self.invoice.add_product_line(self.drum, 1)
+
+    def reserved(self):
+        return dict(StockReservation.objects.filter(invoice=self.invoice).values_list('product__sku', 'quantity'))
+
+    def test_reserve_writes_only_changed_products(self):
+        StockService.reserve_stock(self.invoice)
+        self.assertEqual(self.reserved(), {'TNR-1': 6, 'DRM-1': 1})
+        self.toner.refresh_from_db()
+        self.assertEqual(self.toner.reserved, 6)
+        self.assertEqual(stock_levels([self.toner.pk])[self.toner.pk], (10, 6))
+
+        # Nothing changed: savepoint, lock the invoice, read lines and reservations, release.
+        with self.assertNumQueries(5):
+            StockService.reserve_stock(self.invoice)
+
+        self.toner_line.delete()
+        self.drum_line.quantity = Decimal('3')
+        self.drum_line.save()
+        StockService.reserve_stock(self.invoice)
+        self.assertEqual(self.reserved(), {'TNR-1': 2, 'DRM-1': 3})
+        self.invoice.lines.filter(product=self.toner).delete()
+        StockService.reserve_stock(self.invoice)
+        self.assertEqual(self.reserved(), {'DRM-1': 3})
+        self.assertEqual(stock_levels([self.toner.pk])[self.toner.pk], (10, 0))
+
+    def test_shortfall_reports_every_product_and_writes_nothing(self):
+        self.invoice.add_product_line(self.drum, 5)
+        self.invoice.add_product_line(self.toner, 9)
+        with self.assertRaisesMessage(ValueError, 'TNR-1: need 15 more, available 10; DRM-1: need 6 more, available 3'):
+            StockService.reserve_stock(self.invoice)
+        self.assertEqual(self.reserved(), {})
+        StockService.reserve_stock(self.invoice, force=True)
+        self.assertEqual(self.reserved(), {'TNR-1': 15, 'DRM-1': 6})
+
+        StockService.release_reservation(self.invoice)
+        self.assertEqual(self.reserved(), {})
+        self.drum.refresh_from_db()
+        self.assertEqual(self.drum.reserved, 0)
+
+
+class QuotationConversionTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Month End Ltd')
+        self.user = get_user_model().objects.create_user(username='clerk', password='safe-pass')
+        self.toner = Product.objects.create(name='Toner', sku='TNR-1', price=Decimal('30.00'), quantity=5)
+        self.paper = Product.objects.create(name='Paper', sku='PPR-1', price=Decimal('5.00'), quantity=100)
+
+    def quotation(self, *lines):
+        quotation = Quotation.objects.create(customer=self.customer, notes='Thanks')
+        for product, qty in lines:
+            quotation.add_product_line(product, qty)
+        return quotation
+
+    def test_bulk_conversion_reports_failures_per_quotation(self):
+        first = self.quotation((self.toner, 3), (self.paper, 10))
+        second = self.quotation((self.toner, 3))
+        empty = self.quotation()
+        done = self.quotation((self.paper, 1))
+        done.status = Quotation.CONVERTED
+        done.save()
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('ims:sales:quotation_convert_api'),
+            {'quotation_ids': [first.pk, second.pk, empty.pk, done.pk, 999]},
+            content_type='application/json',
+        )
+        body = response.json()
+        self.assertEqual([row['quotation'] for row in body['converted']], [first.pk, second.pk])
+        self.assertEqual([row['quotation'] for row in body['failed']], [empty.pk, done.pk, 999])
+        self.assertIsNone(body['converted'][0]['reservation_error'])
+        self.assertIn('TNR-1: need 3, available 2', body['converted'][1]['reservation_error'])
+
+        invoice = Invoice.objects.get(pk=body['converted'][0]['invoice'])
+        self.assertEqual((invoice.quotation_id, invoice.created_by, invoice.notes), (first.pk, self.user, 'Thanks'))
+        self.assertEqual(invoice.total, first.total)
+        self.assertTrue(invoice.number.startswith('INV-'))
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('product__sku', 'quantity')), {'TNR-1': 3, 'PPR-1': 10},
+        )
+        self.assertEqual(Quotation.objects.filter(status=Quotation.CONVERTED).count(), 3)
+        self.assertEqual(self.client.post(reverse('ims:sales:quotation_convert_api'), {}, content_type='application/json').status_code, 400)
+
+    def test_page_conversion_redirects_to_new_invoice(self):
+        quotation = self.quotation((self.paper, 2))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('ims:sales:quotation_to_invoice', args=[quotation.pk]))
+        invoice = Invoice.objects.get(quotation=quotation)
+        self.assertRedirects(response, reverse('ims:sales:invoice_edit', args=[invoice.pk]), fetch_redirect_response=False)
+        again = self.client.get(reverse('ims:sales:quotation_to_invoice', args=[quotation.pk]))
+        self.assertRedirects(again, reverse('ims:sales:quotation_edit', args=[quotation.pk]), fetch_redirect_response=False)
+        self.assertEqual(Invoice.objects.filter(quotation=quotation).count(), 1)
+
+
+class DocumentEditingTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Front Desk')
+        self.user = get_user_model().objects.create_user(username='editor', password='safe-pass')
+        self.toner = Product.objects.create(name='Toner', sku='TNR-1', price=Decimal('30.00'), quantity=10)
+        self.combo = Combo.objects.create(name='Toner Twin', code='toner-twin')
+        ComboItem.objects.create(combo=self.combo, product=self.toner, quantity=2)
+        self.client.force_login(self.user)
+
+    def test_htmx_line_add_returns_fragments_not_the_page(self):
+        quotation = Quotation.objects.create(customer=self.customer)
+        existing = quotation.add_product_line(self.toner, 1)
+        url = reverse('ims:sales:quotation_edit', args=[quotation.pk])
+        data = {'add_line': '1', 'product': self.toner.pk, 'description': '', 'quantity': '2', 'unit_price': '30.00', 'tax_rate_percent': '0'}
+
+        response = self.client.post(url, data, HTTP_HX_REQUEST='true')
+        content = response.content.decode()
+        line = quotation.lines.exclude(pk=existing.pk).get()
+        self.assertIn(f'id="line-{line.pk}"', content)
+        self.assertNotIn(f'id="line-{existing.pk}"', content)
+        self.assertIn('id="document-total" hx-swap-oob="true">90.00<', content)
+        self.assertIn('id="line-form"', content)
+        self.assertNotIn('<html', content)
+
+        invalid = self.client.post(url, {**data, 'quantity': ''}, HTTP_HX_REQUEST='true').content.decode()
+        self.assertIn('errorlist', invalid)
+        self.assertNotIn('beforeend:#document-lines', invalid)
+        self.assertEqual(quotation.lines.count(), 2)
+
+        self.assertRedirects(self.client.post(url, data), url, fetch_redirect_response=False)
+        self.assertContains(self.client.get(url), f'id="line-{existing.pk}"')
+
+        invoice = Invoice.objects.create(customer=self.customer)
+        page = self.client.get(reverse('ims:sales:invoice_edit', args=[invoice.pk]))
+        self.assertContains(page, 'id="lines-empty"')
+        self.assertContains(page, 'id="invoice-payments"')
+        # The picker is filled with the page, so it works without JavaScript.
+        self.assertContains(page, f'<option value="{self.combo.pk}">')
+        self.assertContains(page, 'htmx.org@1.9.12', count=1)
+
+
+class CustomerStatementTests(TestCase):
+    def setUp(self):
+        self.acme = Customer.objects.create(name='Acme Print')
+        self.quiet = Customer.objects.create(name='Quiet Co')
+        self.user = get_user_model().objects.create_user(username='accounts', password='safe-pass')
+
+    def invoice(self, customer, day, amount):
+        invoice = Invoice.objects.create(customer=customer, date=day)
+        invoice.add_misc_line('Service', amount)
+        return invoice
+
+    def test_running_balance_with_opening_balance(self):
+        march = self.invoice(self.acme, date(2026, 3, 20), '100.00')
+        Payment.objects.create(invoice=march, amount=Decimal('40.00'), date=date(2026, 3, 28))
+        april = self.invoice(self.acme, date(2026, 4, 5), '250.00')
+        Payment.objects.create(invoice=april, amount=Decimal('60.00'), date=date(2026, 4, 5), method='Card')
+        Payment.objects.create(invoice=march, amount=Decimal('60.00'), date=date(2026, 4, 30))
+        self.invoice(self.acme, date(2026, 5, 2), '999.00')
+        self.invoice(self.quiet, date(2026, 1, 10), '15.00')
+
+        with self.assertNumQueries(2):
+            statements = build_statements([self.acme.pk, self.quiet.pk], date(2026, 4, 1), date(2026, 4, 30))
+        acme = statements[self.acme.pk]
+        self.assertEqual(acme.opening_balance, Decimal('60.00'))
+        self.assertEqual(
+            [(entry.description, entry.debit, entry.credit, entry.balance) for entry in acme.entries],
+            [
+                (f'Invoice {april.number}', Decimal('250.00'), Decimal('0.00'), Decimal('310.00')),
+                (f'Payment for {april.number} (Card)', Decimal('0.00'), Decimal('60.00'), Decimal('250.00')),
+                (f'Payment for {march.number} (Cash)', Decimal('0.00'), Decimal('60.00'), Decimal('190.00')),
+            ],
+        )
+        self.assertEqual(acme.closing_balance, Decimal('190.00'))
+        quiet = statements[self.quiet.pk]
+        self.assertEqual((quiet.opening_balance, quiet.entries, quiet.closing_balance), (Decimal('15.00'), [], Decimal('15.00')))
+
+    def test_batch_writes_files_for_active_customers_only(self):
+        self.invoice(self.acme, date(2026, 4, 5), '250.00')
+        self.invoice(self.quiet, date(2026, 1, 10), '15.00')
+        storage = InMemoryStorage()
+
+        result = generate_statements(date(2026, 4, 1), date(2026, 4, 30), formats=('html',), workers=1, storage=storage)
+        self.assertEqual((result.customers, result.failed), (1, {}))
+        self.assertEqual(result.files, [f'statements/2026-04-30/{self.acme.pk}-acme-print.html'])
+        with storage.open(result.files[0]) as handle:
+            self.assertIn(b'250.00', handle.read())
+
+        again = generate_statements(date(2026, 4, 1), date(2026, 4, 30), formats=('html',), workers=1, storage=storage)
+        self.assertEqual(again.files, result.files)
+
+    def test_statement_page(self):
+        self.invoice(self.acme, date(2026, 4, 5), '250.00')
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('ims:sales:customer_statement', args=[self.acme.pk]), {'start': '2026-04-01', 'end': '2026-04-30'},
+        )
+        self.assertContains(response, 'Acme Print')
+        self.assertContains(response, 'Balance due')
+        url = reverse('ims:sales:customer_statement', args=[self.acme.pk])
+        self.assertEqual(self.client.get(url, {'end': '2026-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2026-05-01', 'end': '2026-04-30'}).status_code, 400)
+        with self.assertRaisesMessage(CommandError, '--end must be a date'):
+            call_command('generate_customer_statements', end='2026-02-30', stdout=StringIO())
+
+
+class OverdueInvoiceTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Late Payer')
+        self.today = date(2026, 6, 15)
+
+    def invoice(self, due_date, amount='100.00', paid=None, status=Invoice.PENDING):
+        invoice = Invoice.objects.create(customer=self.customer, due_date=due_date, status=status)
+        invoice.add_misc_line('Service', amount)
+        if paid:
+            Payment.objects.create(invoice=invoice, amount=Decimal(paid))
+        return invoice
+
+    def test_only_unpaid_pending_invoices_past_due_flip(self):
+        old = self.invoice(date(2026, 1, 3))
+        partial = self.invoice(date(2026, 6, 1), paid='30.00')
+        settled = self.invoice(date(2026, 6, 1), paid='100.00')
+        due_today = self.invoice(self.today)
+        undated = self.invoice(None)
+        paid = self.invoice(date(2026, 2, 1), status=Invoice.PAID)
+
+        dry = mark_overdue_invoices(self.today, dry_run=True)
+        self.assertEqual((dry.flipped, dry.overdue), (2, 0))
+
+        # The ids, one UPDATE and one next-due-date lookup per window; the empty months in between are skipped.
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(8):
+            result = mark_overdue_invoices(self.today, window_days=31)
+        self.assertEqual(result.flipped, 2)
+        self.assertEqual([count for _, _, count in result.windows], [1, 1])
+        self.assertEqual(
+            set(Invoice.objects.filter(status=Invoice.OVERDUE).values_list('pk', flat=True)), {old.pk, partial.pk},
+        )
+        self.assertIn('Overdue', SearchDocument.objects.get(kind=SearchDocument.KIND_INVOICE, object_id=old.pk).subtitle)
+        for invoice, status in ((settled, Invoice.PENDING), (due_today, Invoice.PENDING), (undated, Invoice.PENDING), (paid, Invoice.PAID)):
+            invoice.refresh_from_db()
+            self.assertEqual(invoice.status, status)
+
+        out = StringIO()
+        call_command('mark_overdue_invoices', as_of='2026-06-15', stdout=out)
+        self.assertIn('Marked 0 invoice(s) overdue as of 2026-06-15; 2 overdue in total.', out.getvalue())
+        with self.assertRaisesMessage(CommandError, '--as-of must be a date'):
+            call_command('mark_overdue_invoices', as_of='2026-02-30', stdout=StringIO())
+
+
+class InvoiceIngestionTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Walk-in')
+        self.user = get_user_model().objects.create_user(username='pos-1', password='safe-pass')
+        self.paper = Product.objects.create(name='Paper', sku='PPR-1', price=Decimal('5.00'), quantity=100)
+        self.laptop = Product.objects.create(
+            name='Laptop', sku='LPT-1', price=Decimal('1200.00'), quantity=2, tracking_mode=Product.TRACK_SERIAL,
+        )
+        shipment = Shipment.objects.create(
+            supplier=Supplier.objects.create(name='Vendor'),
+            origin_country='CN',
+            destination_country='ZW',
+            incoterm=Shipment.INCOTERM_FOB,
+            shipping_method=Shipment.METHOD_AIR,
+            status=Shipment.STATUS_ARRIVED,
+        )
+        item = ShipmentItem.objects.create(
+            shipment=shipment, product=self.laptop, quantity_expected=2, quantity_received=2,
+            unit_purchase_price=Decimal('600.00'), tracking_mode=Product.TRACK_SERIAL,
+        )
+        for serial in ('SN-A', 'SN-B'):
+            ProductUnit.objects.create(serial_number=serial, product=self.laptop, shipment=shipment, shipment_item=item)
+
+    def sale(self, key, *lines, paid=None):
+        return {
+            'idempotency_key': key,
+            'customer': self.customer.pk,
+            'date': '2026-10-19',
+            'lines': list(lines),
+            'payments': [{'amount': paid}] if paid else [],
+        }
+
+    def test_day_push_creates_valid_invoices_and_replays_idempotently(self):
+        payload = [
+            self.sale('pos1-1', {'sku': 'LPT-1', 'quantity': 1, 'serials': ['SN-A']}, {'sku': 'PPR-1', 'quantity': 4}, paid='1220.00'),
+            self.sale('pos1-2', {'product': self.paper.pk, 'quantity': 2, 'unit_price': '4.50'}),
+            self.sale('pos1-3', {'sku': 'NOPE', 'quantity': 1}, {'sku': 'LPT-1', 'quantity': 1, 'serials': ['SN-Z']}),
+            self.sale('pos1-1', {'sku': 'PPR-1', 'quantity': 1}),
+            self.sale('pos1-5', {'sku': 'LPT-1', 'quantity': 1, 'serials': ['SN-A']}),
+            {'customer': self.customer.pk},
+        ]
+        self.client.force_login(self.user)
+        url = reverse('ims:sales:invoice_ingest_api')
+        with self.captureOnCommitCallbacks(execute=True):
+            body = self.client.post(url, {'invoices': payload}, content_type='application/json').json()
+
+        self.assertEqual([row['index'] for row in body['created']], [0, 1])
+        self.assertEqual([row['status'] for row in body['created']], [Invoice.PAID, Invoice.PENDING])
+        self.assertEqual([row['index'] for row in body['failed']], [2, 3, 4, 5])
+        self.assertEqual(
+            body['failed'][0]['errors'],
+            ['Line 1: product NOPE does not exist.', 'Line 2: serial SN-Z is not a unit of LPT-1.'],
+        )
+        self.assertEqual(body['failed'][2]['errors'], ['Line 1: serial SN-A is not available.'])
+        self.assertIsNone(body['posting_error'])
+
+        paid = Invoice.objects.get(idempotency_key='pos1-1')
+        self.assertEqual((paid.total, paid.created_by), (Decimal('1220.00'), self.user))
+        self.assertEqual(ProductUnit.objects.get(serial_number='SN-A').status, ProductUnit.STATUS_SOLD)
+        self.assertEqual(stock_levels([self.paper.pk, self.laptop.pk]), {self.paper.pk: (96, 2), self.laptop.pk: (1, 0)})
+        self.assertEqual(
+            sorted(JournalEntry.objects.filter(source_id=paid.pk).values_list('memo', flat=True)),
+            [f'COGS for {paid.number}', f'Invoice {paid.number}', f'Receipt for {paid.number}'],
+        )
+        totals = JournalLine.objects.aggregate(debit=Sum('debit_base'), credit=Sum('credit_base'))
+        self.assertEqual(totals['debit'], totals['credit'])
+        self.assertTrue(SearchDocument.objects.filter(object_id=paid.pk, kind=SearchDocument.KIND_INVOICE).exists())
+
+        again = self.client.post(url, {'invoices': payload[:2]}, content_type='application/json').json()
+        self.assertEqual((again['created'], [row['invoice'] for row in again['duplicates']]), ([], [paid.pk, paid.pk + 1]))
+        self.assertEqual(Invoice.objects.count(), 2)
+        self.assertEqual(self.client.post(url, {}, content_type='application/json').status_code, 400)
+
+    def test_reserved_serials_are_reindexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_invoices([self.sale('pos1-9', {'sku': 'LPT-1', 'quantity': 1, 'serials': ['SN-B']})], user=self.user)
+        unit = ProductUnit.objects.get(serial_number='SN-B')
+        self.assertEqual(unit.status, ProductUnit.STATUS_RESERVED)
+        self.assertIn(unit.get_status_display(), SearchDocument.objects.get(kind=SearchDocument.KIND_SERIAL, object_id=unit.pk).subtitle)
+
+    def day(self, count):
+        start = Invoice.objects.count()
+        payload = [
+            self.sale(f'day-{start + n}', {'sku': 'PPR-1', 'quantity': 1}, paid='5.00') for n in range(count)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            result = ingest_invoices(payload, user=self.user)
+        self.assertEqual(len(result.created), count)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_invoices(self):
+        self.day(1)  # creates the journal sequence, base currency and default bank
+        self.assertEqual(self.day(2), self.day(12))
@@ -1,6 +1,6 @@
 from django.urls import path
 from . import views
-from .api import InvoiceLineSerialAPIView
+from .api import InvoiceIngestionAPIView, InvoiceLineSerialAPIView, QuotationConversionAPIView
 
 app_name = 'sales'
 
@@ -13,6 +13,9 @@ urlpatterns = [
     path('invoice/new/', views.invoice_create, name='invoice_create'),
     path('invoice/<int:pk>/', views.invoice_edit, name='invoice_edit'),
     path('invoice/<int:pk>/pdf/', views.invoice_pdf, name='invoice_pdf'),
+    path('customer/<int:pk>/statement/', views.customer_statement, name='customer_statement'),
     path('invoice/line/<int:line_id>/serials/', views.invoice_line_serials, name='invoice_line_serials'),
     path('api/invoice-lines/<int:line_id>/serials/', InvoiceLineSerialAPIView.as_view(), name='invoice_line_serials_api'),
+    path('api/invoices/bulk/', InvoiceIngestionAPIView.as_view(), name='invoice_ingest_api'),
+    path('api/quotations/convert/', QuotationConversionAPIView.as_view(), name='quotation_convert_api'),
 ]
@@ -4,8 +4,11 @@ from django import forms
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.urls import reverse
 from django.template.loader import render_to_string
 from django.db.models import Q
 
@@ -23,12 +26,13 @@ from .models import (
     Payment,
     DocumentLine,
 )
-from .services import PricingService, StockService
-from inventory.models import Combo, ProductUnit
+from .services import PricingService, StockService, apply_cart_rules
+from .services.conversion import convert_quotations
+from .services.statements import build_statement, render_statement_html
+from customers.models import Customer
 from inventory.services.combos import (
     add_combo_to_invoice,
     add_combo_to_quotation,
-    combo_available_quantity,
 )
 
 
@@ -62,58 +66,91 @@ def quotation_create(request):
     return render(request, 'sales/quotation_form.html', {'form': form})
 
 
+def _is_htmx(request):
+    return request.headers.get('HX-Request') == 'true'
+
+
+def _line_snapshot(document):
+    return {
+        pk: rest
+        for pk, *rest in document.lines.values_list('id', 'description', 'quantity', 'unit_price', 'line_total')
+    }
+
+
+def _line_changes_response(request, document, before, form_template, context, document_kind):
+    """Re-rendered form plus out-of-band updates for only the rows that changed."""
+    lines = list(document.lines.select_related('product').order_by('id'))
+    created, updated = [], []
+    for line in lines:
+        if line.pk not in before:
+            created.append(line)
+        elif before[line.pk] != [line.description, line.quantity, line.unit_price, line.line_total]:
+            updated.append(line)
+    changes = {
+        'created': created,
+        'updated': updated,
+        'deleted': sorted(set(before) - {line.pk for line in lines}),
+        'total': sum(line.line_total for line in lines),
+        'document_kind': document_kind,
+    }
+    html = render_to_string(form_template, context, request=request)
+    html += render_to_string('sales/partials/line_changes.html', changes, request=request)
+    return HttpResponse(html)
+
+
+def _add_priced_line(document, line_form, **owner):
+    line = line_form.save(commit=False)
+    product = line.product
+    if product:
+        line.unit_price = PricingService.apply_best_rule(product, int(line.quantity), Decimal(str(line.unit_price))).unit_price
+        if not line.description:
+            line.description = product.name
+    line.line_total = (Decimal(str(line.unit_price)) * Decimal(str(line.quantity))).quantize(Decimal('0.01'))
+    for name, value in owner.items():
+        setattr(line, name, value)
+    line.save()
+    apply_cart_rules(document)
+    return line
+
+
 @login_required
 def quotation_edit(request, pk):
     quotation = get_object_or_404(Quotation, pk=pk)
+    edit_url = reverse('ims:sales:quotation_edit', args=[pk])
     line_form = DocumentLineForm(request.POST or None)
     combo_form = ComboSelectionForm(request.POST or None, prefix='combo')
+    htmx = _is_htmx(request)
 
     if request.method == 'POST':
-        if 'add_line' in request.POST and line_form.is_valid():
-            line = line_form.save(commit=False)
-            product = line.product
-            if product:
-                pricing = PricingService.apply_best_rule(product, int(line.quantity), Decimal(str(line.unit_price)))
-                if pricing.discount_percent:
-                    factor = Decimal('1') - (pricing.discount_percent / Decimal('100'))
-                    line.unit_price = (Decimal(str(line.unit_price)) * factor).quantize(Decimal('0.01'))
-                elif pricing.discount_value:
-                    line.unit_price = max(
-                        Decimal('0.00'),
-                        Decimal(str(line.unit_price)) - pricing.discount_value,
-                    ).quantize(Decimal('0.01'))
-                if not line.description:
-                    line.description = product.name
-            line.line_total = (Decimal(str(line.unit_price)) * Decimal(str(line.quantity))).quantize(Decimal('0.01'))
-            line.quotation = quotation
-            line.save()
-            return redirect('ims:sales:quotation_edit', pk)
+        before = _line_snapshot(quotation) if htmx else None
+        if 'add_line' in request.POST:
+            if line_form.is_valid():
+                _add_priced_line(quotation, line_form, quotation=quotation)
+                if not htmx:
+                    return redirect('ims:sales:quotation_edit', pk)
+                line_form = DocumentLineForm()
+            if htmx:
+                return _line_changes_response(
+                    request, quotation, before, 'sales/partials/line_form.html',
+                    {'item_form': line_form, 'edit_url': edit_url}, 'quotation',
+                )
         if 'add_combo' in request.POST:
-            combo_form = ComboSelectionForm(request.POST, prefix='combo')
             if combo_form.is_valid():
                 combo = combo_form.cleaned_data['combo']
                 quantity = combo_form.cleaned_data['quantity']
                 try:
                     add_combo_to_quotation(quotation, combo.id, quantity)
+                    apply_cart_rules(quotation)
                 except ValueError as exc:
                     messages.error(request, str(exc))
-                return redirect('ims:sales:quotation_edit', pk)
-
-    combo_options = []
-    for combo in Combo.objects.filter(is_active=True).prefetch_related('items__product'):
-        components = [
-            {
-                'product': item.product,
-                'quantity': item.quantity,
-            }
-            for item in combo.items.all()
-        ]
-        combo_options.append({
-            'combo': combo,
-            'price': combo.compute_price(),
-            'available': combo_available_quantity(combo),
-            'components': components,
-        })
+                if not htmx:
+                    return redirect('ims:sales:quotation_edit', pk)
+                combo_form = ComboSelectionForm(prefix='combo', initial={'combo': combo.pk})
+            if htmx:
+                return _line_changes_response(
+                    request, quotation, before, 'sales/partials/combo_form.html',
+                    {'combo_form': combo_form, 'edit_url': edit_url}, 'quotation',
+                )
 
     lines = list(quotation.lines.select_related('product').order_by('id'))
     return render(
@@ -123,7 +160,8 @@ def quotation_edit(request, pk):
             'quotation': quotation,
             'item_form': line_form,
             'combo_form': combo_form,
-            'combo_options': combo_options,
+            'edit_url': edit_url,
+            'document_kind': 'quotation',
             'lines': lines,
         },
     )
@@ -132,24 +170,13 @@ def quotation_edit(request, pk):
 @login_required
 def quotation_to_invoice(request, pk):
     quotation = get_object_or_404(Quotation, pk=pk)
-    invoice = Invoice.objects.create(customer=quotation.customer, quotation=quotation, notes=quotation.notes)
-    for line in quotation.lines.all():
-        DocumentLine.objects.create(
-            invoice=invoice,
-            product=line.product,
-            description=line.description,
-            quantity=line.quantity,
-            unit_price=line.unit_price,
-            tax_rate_percent=line.tax_rate_percent,
-            line_total=line.line_total,
-        )
-    quotation.status = Quotation.CONVERTED
-    quotation.save(update_fields=['status'])
-    try:
-        StockService.reserve_stock(invoice)
-    except Exception as exc:
-        messages.error(request, f"Stock reservation failed on conversion: {exc}")
-    return redirect('ims:sales:invoice_edit', invoice.id)
+    result = convert_quotations([quotation.pk], user=request.user)
+    if quotation.pk in result.failed:
+        messages.error(request, result.failed[quotation.pk])
+        return redirect('ims:sales:quotation_edit', pk)
+    if quotation.pk in result.unreserved:
+        messages.error(request, f"Stock reservation failed on conversion: {result.unreserved[quotation.pk]}")
+    return redirect('ims:sales:invoice_edit', result.invoices[quotation.pk])
 
 
 @login_required
@@ -179,78 +206,75 @@ def invoice_create(request):
 @login_required
 def invoice_edit(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
+    edit_url = reverse('ims:sales:invoice_edit', args=[pk])
     line_form = DocumentLineForm(request.POST or None)
     combo_form = ComboSelectionForm(request.POST or None, prefix='combo')
     pay_form = PaymentForm(request.POST or None, initial={'invoice': invoice})
+    htmx = _is_htmx(request)
 
     if request.method == 'POST':
-        if 'add_line' in request.POST and line_form.is_valid():
-            line = line_form.save(commit=False)
-            product = line.product
-            if product:
-                pricing = PricingService.apply_best_rule(product, int(line.quantity), Decimal(str(line.unit_price)))
-                if pricing.discount_percent:
-                    factor = Decimal('1') - (pricing.discount_percent / Decimal('100'))
-                    line.unit_price = (Decimal(str(line.unit_price)) * factor).quantize(Decimal('0.01'))
-                elif pricing.discount_value:
-                    line.unit_price = max(
-                        Decimal('0.00'),
-                        Decimal(str(line.unit_price)) - pricing.discount_value,
-                    ).quantize(Decimal('0.01'))
-                if not line.description:
-                    line.description = product.name
-            line.line_total = (Decimal(str(line.unit_price)) * Decimal(str(line.quantity))).quantize(Decimal('0.01'))
-            line.invoice = invoice
-            line.save()
-            try:
-                StockService.reserve_stock(invoice)
-            except Exception as exc:
-                messages.error(request, f"Stock reservation failed: {exc}")
-            return redirect('ims:sales:invoice_edit', pk)
+        before = _line_snapshot(invoice) if htmx else None
+        if 'add_line' in request.POST:
+            if line_form.is_valid():
+                _add_priced_line(invoice, line_form, invoice=invoice)
+                try:
+                    StockService.reserve_stock(invoice)
+                except Exception as exc:
+                    messages.error(request, f"Stock reservation failed: {exc}")
+                if not htmx:
+                    return redirect('ims:sales:invoice_edit', pk)
+                line_form = DocumentLineForm()
+            if htmx:
+                return _line_changes_response(
+                    request, invoice, before, 'sales/partials/line_form.html',
+                    {'item_form': line_form, 'edit_url': edit_url}, 'invoice',
+                )
         if 'add_combo' in request.POST:
-            combo_form = ComboSelectionForm(request.POST, prefix='combo')
             if combo_form.is_valid():
                 combo = combo_form.cleaned_data['combo']
                 quantity = combo_form.cleaned_data['quantity']
                 try:
                     add_combo_to_invoice(invoice, combo.id, quantity)
+                    apply_cart_rules(invoice)
                     StockService.reserve_stock(invoice)
                 except ValueError as exc:
                     messages.error(request, str(exc))
                 except Exception as exc:
                     messages.error(request, f"Stock reservation failed: {exc}")
-                return redirect('ims:sales:invoice_edit', pk)
-        if 'add_payment' in request.POST and pay_form.is_valid():
-            payment = pay_form.save()
-            paid = StockService.amount_paid(invoice)
-            if paid >= invoice.total:
-                try:
-                    invoice.confirm(user=request.user)
-                    invoice.status = Invoice.PAID
+                if not htmx:
+                    return redirect('ims:sales:invoice_edit', pk)
+                combo_form = ComboSelectionForm(prefix='combo', initial={'combo': combo.pk})
+            if htmx:
+                return _line_changes_response(
+                    request, invoice, before, 'sales/partials/combo_form.html',
+                    {'combo_form': combo_form, 'edit_url': edit_url}, 'invoice',
+                )
+        if 'add_payment' in request.POST:
+            if pay_form.is_valid():
+                pay_form.save()
+                paid = StockService.amount_paid(invoice)
+                if paid >= invoice.total:
+                    try:
+                        invoice.confirm(user=request.user)
+                        invoice.status = Invoice.PAID
+                        invoice.save(update_fields=['status'])
+                        StockService.finalize_sale(invoice, actor=request.user)
+                    except Exception as exc:
+                        messages.error(request, f"Invoice confirmation failed: {exc}")
+                elif paid > 0 and invoice.status not in (Invoice.PAID, Invoice.OVERDUE):
+                    invoice.status = Invoice.PENDING
                     invoice.save(update_fields=['status'])
-                    StockService.finalize_sale(invoice)
-                except Exception as exc:
-                    messages.error(request, f"Invoice confirmation failed: {exc}")
-            elif paid > 0 and invoice.status != Invoice.PAID:
-                invoice.status = Invoice.PENDING
-                invoice.save(update_fields=['status'])
-            return redirect('ims:sales:invoice_edit', pk)
-
-    combo_options = []
-    for combo in Combo.objects.filter(is_active=True).prefetch_related('items__product'):
-        components = [
-            {
-                'product': item.product,
-                'quantity': item.quantity,
-            }
-            for item in combo.items.all()
-        ]
-        combo_options.append({
-            'combo': combo,
-            'price': combo.compute_price(),
-            'available': combo_available_quantity(combo),
-            'components': components,
-        })
+                if not htmx:
+                    return redirect('ims:sales:invoice_edit', pk)
+                pay_form = PaymentForm(initial={'invoice': invoice})
+            if htmx:
+                html = render_to_string('sales/partials/payment_form.html', {'pay_form': pay_form, 'edit_url': edit_url}, request=request)
+                html += render_to_string(
+                    'sales/partials/payment_changes.html',
+                    {'invoice': invoice, 'payments': invoice.payments.all()},
+                    request=request,
+                )
+                return HttpResponse(html)
 
     lines = list(invoice.lines.select_related('product').order_by('id'))
     return render(
@@ -260,9 +284,11 @@ def invoice_edit(request, pk):
             'invoice': invoice,
             'item_form': line_form,
             'combo_form': combo_form,
-            'combo_options': combo_options,
             'pay_form': pay_form,
+            'edit_url': edit_url,
+            'document_kind': 'invoice',
             'lines': lines,
+            'payments': invoice.payments.all(),
         },
     )
 
@@ -281,6 +307,31 @@ def invoice_pdf(request, pk):
     return response
 
 
+@login_required
+def customer_statement(request, pk):
+    """Statement for one customer; ``?start=&end=`` default to the current month."""
+    from .pdf_utils import render_pdf_from_html
+
+    customer = get_object_or_404(Customer, pk=pk)
+    today = timezone.localdate()
+    try:
+        # parse_date returns None for malformed input but raises for impossible dates such as 2026-02-30.
+        end = parse_date(request.GET.get('end') or '') or today
+        start = parse_date(request.GET.get('start') or '') or end.replace(day=1)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid statement date.')
+    if start > end:
+        return HttpResponseBadRequest('The statement start must not be after its end.')
+    html = render_statement_html(build_statement(customer, start, end))
+    if request.GET.get('format') != 'pdf':
+        return HttpResponse(html)
+    pdf = render_pdf_from_html(html, base_url=request.build_absolute_uri())
+    response = HttpResponse(pdf, content_type='application/pdf')
+    disposition = 'inline' if (request.GET.get('preview') or request.GET.get('disposition') == 'inline') else 'attachment'
+    response['Content-Disposition'] = f"{disposition}; filename=\"statement-{customer.pk}-{end:%Y-%m-%d}.pdf\""
+    return response
+
+
 @login_required
 def invoice_line_serials(request, line_id):
     line = get_object_or_404(
@@ -295,17 +346,7 @@ def invoice_line_serials(request, line_id):
         return redirect('ims:sales:invoice_edit', line.invoice_id)
     form = InvoiceLineSerialAssignmentForm(request.POST or None, line=line)
     if request.method == 'POST' and form.is_valid():
-        selected = list(form.cleaned_data['serials'])
-        selected_ids = [unit.id for unit in selected]
-        ProductUnit.objects.filter(sale_line=line).exclude(id__in=selected_ids).update(
-            sale_line=None,
-            status=ProductUnit.STATUS_AVAILABLE,
-            sold_at=None,
-        )
-        for unit in selected:
-            unit.sale_line = line
-            unit.status = ProductUnit.STATUS_RESERVED
-            unit.save(update_fields=['sale_line', 'status', 'updated_at'])
+        StockService.assign_serials(line, list(form.cleaned_data['serials']), actor=request.user)
         messages.success(request, 'Serial numbers updated.')
         return redirect('ims:sales:invoice_edit', line.invoice_id)
     return render(
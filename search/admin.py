@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import SearchDocument
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'title', 'subtitle', 'updated_at')
+    list_filter = ('kind',)
+    search_fields = ('title', 'subtitle')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,37 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import SearchDocument
+from .services import DEFAULT_LIMIT, search_documents
+
+
+class SearchAPIView(APIView):
+    """Ranked search over invoices, quotations, customers, products and serials."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        unknown = set(kinds) - {value for value, _ in SearchDocument.KIND_CHOICES}
+        if unknown:
+            return Response({'detail': f"Unknown kind: {', '.join(sorted(unknown))}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'detail': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        documents = search_documents(request.query_params.get('q', ''), kinds=kinds, limit=limit)
+        return Response({
+            'results': [
+                {
+                    'kind': document.kind,
+                    'id': document.object_id,
+                    'title': document.title,
+                    'subtitle': document.subtitle,
+                    'url': document.url,
+                    'rank': round(float(document.rank or 0), 4),
+                }
+                for document in documents
+            ],
+        })
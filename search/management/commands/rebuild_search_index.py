@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from search.models import SearchDocument
+from search.services import INDEX_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the staff search documents from invoices, quotations, customers, products and serials"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', dest='kinds', help='Only rebuild this kind (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=INDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        kinds = options['kinds']
+        valid = {value for value, _ in SearchDocument.KIND_CHOICES}
+        if kinds and set(kinds) - valid:
+            raise CommandError(f"Unknown kind; choose from {', '.join(sorted(valid))}.")
+        counts = rebuild_index(kinds, batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f"{kind}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {sum(counts.values())} documents."))
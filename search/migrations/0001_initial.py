@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:52
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+INDEXES = (
+    ('search_document_vector_gin', 'vector'),
+    ('search_document_title_trgm', 'title gin_trgm_ops'),
+    ('search_document_subtitle_trgm', 'subtitle gin_trgm_ops'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN indexes need PostgreSQL; other backends fall back to plain lookups.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON search_searchdocument USING gin ({column})')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('invoice', 'Invoice'), ('quotation', 'Quotation'), ('customer', 'Customer'), ('product', 'Product'), ('serial', 'Serial')], max_length=12)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('url', models.CharField(blank=True, max_length=255)),
+                ('vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """One searchable row per invoice, quotation, customer, product or serial unit.
+
+    ``vector`` (full text) and the trigram indexes on ``title`` and
+    ``subtitle`` are only built on PostgreSQL; see migration 0001.
+    """
+
+    KIND_INVOICE = 'invoice'
+    KIND_QUOTATION = 'quotation'
+    KIND_CUSTOMER = 'customer'
+    KIND_PRODUCT = 'product'
+    KIND_SERIAL = 'serial'
+    KIND_CHOICES = [
+        (KIND_INVOICE, 'Invoice'),
+        (KIND_QUOTATION, 'Quotation'),
+        (KIND_CUSTOMER, 'Customer'),
+        (KIND_PRODUCT, 'Product'),
+        (KIND_SERIAL, 'Serial'),
+    ]
+
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=255, blank=True)
+    vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('kind', 'object_id'),)
+
+    def __str__(self):
+        return f'{self.get_kind_display()}: {self.title}'
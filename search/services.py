@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.urls import reverse
+
+from customers.models import Customer
+from inventory.models import Product, ProductUnit
+from sales.models import Invoice, Quotation
+
+from .models import SearchDocument
+
+
+INDEX_BATCH_SIZE = 1000
+SEARCH_CONFIG = 'simple'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+DOCUMENT_FIELDS = ('title', 'subtitle', 'body', 'url')
+
+
+@dataclass(frozen=True)
+class Indexer:
+    queryset: Callable[[], QuerySet]
+    document: Callable[[object], dict]
+    # (kind, lookup) pairs whose documents embed this kind's title and must follow a rename.
+    dependents: tuple[tuple[str, str], ...] = ()
+
+
+def _join(*parts) -> str:
+    return ' · '.join(str(part) for part in parts if part)
+
+
+def _invoice_document(invoice: Invoice) -> dict:
+    return {
+        'title': invoice.number,
+        'subtitle': _join(invoice.customer.name, invoice.get_status_display(), invoice.date),
+        'body': invoice.notes or '',
+        'url': reverse('ims:sales:invoice_edit', args=[invoice.pk]),
+    }
+
+
+def _quotation_document(quotation: Quotation) -> dict:
+    return {
+        'title': quotation.number,
+        'subtitle': _join(quotation.customer.name, quotation.get_status_display(), quotation.date),
+        'body': quotation.notes or '',
+        'url': reverse('ims:sales:quotation_edit', args=[quotation.pk]),
+    }
+
+
+def _customer_document(customer: Customer) -> dict:
+    return {
+        'title': customer.name,
+        'subtitle': _join(customer.email, customer.phone),
+        'body': customer.address or '',
+        'url': reverse('ims:customers:customer_edit', args=[customer.pk]),
+    }
+
+
+def _product_document(product: Product) -> dict:
+    return {
+        'title': product.name,
+        'subtitle': _join(product.sku, product.category.name if product.category else ''),
+        'body': product.description or '',
+        'url': reverse('ims:inventory:product_edit', args=[product.pk]),
+    }
+
+
+def _serial_document(unit: ProductUnit) -> dict:
+    return {
+        'title': unit.serial_number,
+        'subtitle': _join(unit.product.name, unit.product.sku, unit.get_status_display()),
+        'body': '',
+        'url': reverse('ims:inventory:product_edit', args=[unit.product_id]),
+    }
+
+
+INDEXERS: dict[str, Indexer] = {
+    SearchDocument.KIND_INVOICE: Indexer(lambda: Invoice.objects.select_related('customer'), _invoice_document),
+    SearchDocument.KIND_QUOTATION: Indexer(lambda: Quotation.objects.select_related('customer'), _quotation_document),
+    SearchDocument.KIND_CUSTOMER: Indexer(
+        Customer.objects.all,
+        _customer_document,
+        dependents=((SearchDocument.KIND_INVOICE, 'customer_id__in'), (SearchDocument.KIND_QUOTATION, 'customer_id__in')),
+    ),
+    SearchDocument.KIND_PRODUCT: Indexer(
+        lambda: Product.objects.select_related('category'),
+        _product_document,
+        dependents=((SearchDocument.KIND_SERIAL, 'product_id__in'),),
+    ),
+    SearchDocument.KIND_SERIAL: Indexer(lambda: ProductUnit.objects.select_related('product'), _serial_document),
+}
+
+
+def _uses_postgres() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _refresh_vectors(kind: str, object_ids: list[int]) -> None:
+    if not _uses_postgres():
+        return
+    SearchDocument.objects.filter(kind=kind, object_id__in=object_ids).update(
+        vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('subtitle', weight='B', config=SEARCH_CONFIG)
+            + SearchVector('body', weight='C', config=SEARCH_CONFIG)
+        ),
+    )
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def index_objects(kind: str, ids: Iterable[int] | None = None, *, filters: dict | None = None, batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """Upsert the search documents of ``kind``, limited to ``ids`` or ``filters`` when given.
+
+    Requested ids that no longer exist lose their document; a full run
+    (no ids, no filters) also drops documents of deleted objects.
+    """
+    indexer = INDEXERS[kind]
+    queryset = indexer.queryset().order_by('pk')
+    if ids is not None:
+        ids = list(ids)
+        queryset = queryset.filter(pk__in=ids)
+    if filters:
+        queryset = queryset.filter(**filters)
+
+    indexed = 0
+    seen = set()
+    for chunk in _chunks(queryset.iterator(chunk_size=batch_size), batch_size):
+        documents = [SearchDocument(kind=kind, object_id=obj.pk, **indexer.document(obj)) for obj in chunk]
+        object_ids = [document.object_id for document in documents]
+        previous = {
+            object_id: (title, subtitle)
+            for object_id, title, subtitle in SearchDocument.objects.filter(kind=kind, object_id__in=object_ids)
+            .values_list('object_id', 'title', 'subtitle')
+        }
+        SearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=[*DOCUMENT_FIELDS, 'updated_at'],
+        )
+        _refresh_vectors(kind, object_ids)
+        renamed = [
+            document.object_id for document in documents
+            if document.object_id in previous and previous[document.object_id] != (document.title, document.subtitle)
+        ]
+        for dependent_kind, lookup in indexer.dependents if renamed else ():
+            index_objects(dependent_kind, filters={lookup: renamed}, batch_size=batch_size)
+        indexed += len(documents)
+        seen.update(object_ids)
+
+    if ids is not None:
+        remove_documents(kind, set(ids) - seen)
+    elif not filters:
+        SearchDocument.objects.filter(kind=kind).exclude(object_id__in=queryset.values('pk')).delete()
+    return indexed
+
+
+def remove_documents(kind: str, ids: Iterable[int]) -> None:
+    ids = list(ids)
+    if ids:
+        SearchDocument.objects.filter(kind=kind, object_id__in=ids).delete()
+
+
+def schedule_index(kind: str, ids: Iterable[int]) -> None:
+    """Index after commit, off the write path; a failing index run never breaks the save."""
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: index_objects(kind, ids), robust=True)
+
+
+def schedule_removal(kind: str, ids: Iterable[int]) -> None:
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: remove_documents(kind, ids), robust=True)
+
+
+def rebuild_index(kinds: Iterable[str] | None = None, batch_size: int = INDEX_BATCH_SIZE) -> dict[str, int]:
+    return {kind: index_objects(kind, batch_size=batch_size) for kind in (kinds or INDEXERS)}
+
+
+def _terms(query: str) -> list[str]:
+    return re.findall(r'\w+', (query or '').lower())[:8]
+
+
+def search_documents(query: str, kinds: Iterable[str] | None = None, limit: int = DEFAULT_LIMIT) -> list[SearchDocument]:
+    """Best matching documents for ``query``, highest rank first.
+
+    On PostgreSQL every term is matched as a prefix against the GIN-indexed
+    ``vector``, with trigram similarity on title and subtitle catching typos;
+    elsewhere each term must appear in the title, subtitle or body.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    documents = SearchDocument.objects.defer('body', 'vector')
+    if kinds:
+        documents = documents.filter(kind__in=list(kinds))
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    if _uses_postgres():
+        text = ' '.join(terms)
+        tsquery = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+        documents = (
+            documents.filter(Q(vector=tsquery) | Q(title__trigram_similar=text) | Q(subtitle__trigram_similar=text))
+            .annotate(rank=SearchRank(F('vector'), tsquery) + TrigramSimilarity('title', text))
+            .order_by('-rank', 'title')
+        )
+    else:
+        match = Q()
+        for term in terms:
+            match &= Q(title__icontains=term) | Q(subtitle__icontains=term) | Q(body__icontains=term)
+        documents = documents.filter(match).annotate(rank=Value(0.0, output_field=FloatField())).order_by('title')
+    return list(documents[:limit])
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customers.models import Customer
+from inventory.models import Product, ProductUnit
+from inventory.services.product_import import products_imported
+from inventory.services.serials import units_created
+from sales.models import Invoice, Quotation
+
+from .models import SearchDocument
+from .services import schedule_index, schedule_removal
+
+
+INDEXED_MODELS = {
+    Invoice: SearchDocument.KIND_INVOICE,
+    Quotation: SearchDocument.KIND_QUOTATION,
+    Customer: SearchDocument.KIND_CUSTOMER,
+    Product: SearchDocument.KIND_PRODUCT,
+    ProductUnit: SearchDocument.KIND_SERIAL,
+}
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Quotation)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductUnit)
+def on_indexed_object_saved(sender, instance, raw: bool = False, **kwargs):
+    if raw:
+        return
+    schedule_index(INDEXED_MODELS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Quotation)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductUnit)
+def on_indexed_object_deleted(sender, instance, **kwargs):
+    schedule_removal(INDEXED_MODELS[sender], [instance.pk])
+
+
+@receiver(products_imported)
+def on_products_imported(sender, product_ids, **kwargs):
+    schedule_index(SearchDocument.KIND_PRODUCT, product_ids)
+
+
+@receiver(units_created)
+def on_units_created(sender, units, **kwargs):
+    schedule_index(SearchDocument.KIND_SERIAL, [unit.pk for unit in units])
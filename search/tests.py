@@ -0,0 +1,75 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from customers.models import Customer
+from inventory.models import Category, Product
+from inventory.services import import_products, read_product_rows
+from sales.models import Invoice, Quotation
+from sales.services.conversion import convert_quotations
+
+from .models import SearchDocument
+from .services import search_documents
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer = Customer.objects.create(name='Harare Print Works', email='orders@hpw.co.zw')
+            self.toner = Product.objects.create(name='Black Toner', sku='TNR-K', category=Category.objects.create(name='Consumables'))
+            self.invoice = Invoice.objects.create(customer=self.customer)
+
+    def titles(self, query, **kwargs):
+        return [document.title for document in search_documents(query, **kwargs)]
+
+    def test_saves_and_deletes_keep_documents_current(self):
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(self.titles('harare'), ['Harare Print Works', self.invoice.number])
+        self.assertEqual(self.titles('tnr k'), ['Black Toner'])
+        self.assertEqual(self.titles('harare', kinds=['invoice']), [self.invoice.number])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.name = 'Bulawayo Print Works'
+            self.customer.save()
+        # The invoice document embeds the customer name and follows the rename.
+        self.assertEqual(self.titles('bulawayo'), ['Bulawayo Print Works', self.invoice.number])
+        self.assertEqual(self.titles('harare'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchDocument.KIND_INVOICE).exists())
+
+    def test_bulk_conversion_is_indexed_and_rebuild_repairs_drift(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            quotation = Quotation.objects.create(customer=self.customer)
+            quotation.add_product_line(self.toner, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice_id = convert_quotations([quotation.pk], reserve=False).invoices[quotation.pk]
+        document = SearchDocument.objects.get(kind=SearchDocument.KIND_QUOTATION, object_id=quotation.pk)
+        self.assertIn('Converted', document.subtitle)
+        self.assertTrue(SearchDocument.objects.filter(kind=SearchDocument.KIND_INVOICE, object_id=invoice_id).exists())
+
+        SearchDocument.objects.all().delete()
+        SearchDocument.objects.create(kind=SearchDocument.KIND_PRODUCT, object_id=999, title='Ghost')
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(SearchDocument.objects.count(), 5)
+        self.assertFalse(SearchDocument.objects.filter(title='Ghost').exists())
+
+    def test_imported_products_are_indexed(self):
+        csv = 'SKU,Name,Price\nTNR-K,Black Toner XL,45.00\nTNR-C,Cyan Toner,40.00\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            import_products(read_product_rows(io.BytesIO(csv.encode('utf-8')), filename='toner.csv'))
+        self.assertEqual(sorted(self.titles('toner', kinds=['product'])), ['Black Toner XL', 'Cyan Toner'])
+
+    def test_api_returns_ranked_results_for_staff(self):
+        url = reverse('ims:search:search_api')
+        self.assertEqual(self.client.get(url, {'q': 'toner'}).status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user('staff', 'staff@example.com', 'pass1234', is_staff=True))
+        results = self.client.get(url, {'q': 'toner'}).json()['results']
+        self.assertEqual([(row['kind'], row['title']) for row in results], [('product', 'Black Toner')])
+        self.assertEqual(results[0]['url'], reverse('ims:inventory:product_edit', args=[self.toner.pk]))
+        self.assertEqual(self.client.get(url, {'q': 'toner', 'kind': 'widget'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': ''}).json()['results'], [])
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .api import SearchAPIView
+
+app_name = 'search'
+
+urlpatterns = [
+    path('api/', SearchAPIView.as_view(), name='search_api'),
+]
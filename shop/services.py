@@ -5,10 +5,15 @@ from decimal import Decimal
 from typing import Iterable
 
 from django.db import transaction
-from django.db.models import F
 from django.utils import timezone
 
 from inventory.models import Product
+from inventory.services.stock_balances import (
+    consume_reserved,
+    release_reserved,
+    reserve_available,
+    schedule_stock_refresh,
+)
 
 from .models import Cart, Order, OrderItem
 
@@ -34,10 +39,10 @@ def generate_order_number() -> str:
 
 
 def ensure_product_available(product: Product, quantity: int) -> None:
+    # Stock itself is checked by the ledger reservation in create_order_from_cart;
+    # the derived Product.available_stock may lag behind it.
     if not product.is_active:
         raise OrderCreationError(f'{product.name} is not available for purchase.')
-    if product.track_inventory and product.available_stock < quantity:
-        raise OrderCreationError(f'Not enough stock for {product.name}.')
 
 
 @transaction.atomic
@@ -70,37 +75,46 @@ def create_order_from_cart(cart: Cart, *, email: str, full_name: str = '', notes
             line_total=line_total,
         )
         if product.track_inventory:
-            Product.objects.filter(pk=product.pk).update(reserved=F('reserved') + cart_item.quantity)
+            # Reserve on one stock stripe instead of the product row, so
+            # concurrent checkouts of a best-seller do not queue on one lock.
+            if not reserve_available(product.pk, cart_item.quantity):
+                raise OrderCreationError(f'Not enough stock for {product.name}.')
             reserved_products.append((product.pk, cart_item.quantity))
 
     order.recalculate_total()
     order.save(update_fields=['total'])
+    schedule_stock_refresh(product_id for product_id, _ in reserved_products)
     return OrderCreationResult(order=order, reserved_products=reserved_products)
 
 
 def release_reservations(reservations: Iterable[tuple[int, int]]) -> None:
+    reservations = list(reservations)
     for product_id, quantity in reservations:
-        Product.objects.filter(pk=product_id, reserved__gte=quantity).update(reserved=F('reserved') - quantity)
+        release_reserved(product_id, quantity)
+    schedule_stock_refresh(product_id for product_id, _ in reservations)
 
 
 def mark_order_as_paid(order: Order) -> None:
     order.status = Order.Status.PAID
     order.save(update_fields=['status', 'updated_at'])
+    touched = []
     for item in order.items.select_related('product'):
         product = item.product
         if not product or not product.track_inventory:
             continue
-        Product.objects.filter(pk=product.pk).update(
-            quantity=F('quantity') - item.quantity,
-            reserved=F('reserved') - item.quantity,
-        )
+        consume_reserved(product.pk, item.quantity)
+        touched.append(product.pk)
+    schedule_stock_refresh(touched)
 
 
 def mark_order_as_failed(order: Order) -> None:
     order.status = Order.Status.FAILED
     order.save(update_fields=['status', 'updated_at'])
+    touched = []
     for item in order.items.select_related('product'):
         product = item.product
         if not product or not product.track_inventory:
             continue
-        Product.objects.filter(pk=product.pk).update(reserved=F('reserved') - item.quantity)
+        release_reserved(product.pk, item.quantity)
+        touched.append(product.pk)
+    schedule_stock_refresh(touched)
@@ -19,6 +19,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 
 from inventory.models import Category, Product
+from inventory.services.stock_balances import available_quantity
 from payments import paynow
 
 from .forms import CheckoutForm
@@ -163,7 +164,7 @@ def cart_add(request):
     cart = get_or_create_cart(request)
 
     existing_qty = cart.items.filter(product=product).values_list('quantity', flat=True).first() or 0
-    if product.track_inventory and (existing_qty + quantity) > product.available_stock:
+    if product.track_inventory and (existing_qty + quantity) > available_quantity(product.pk):
         if request.headers.get('HX-Request') == 'true':
             html = render_to_string("shop/partials/cart_counter.html", {"count": cart_item_count(cart)}, request=request)
             response = HttpResponse(html)